@@ -1,12 +1,16 @@
-import polars as pl
-import py7zr
+import time
+
 import streamlit as st
 import streamlit_authenticator as stauth
 
-from planning_ai.common.utils import Paths
-from planning_ai.main import main as report_main
-from planning_ai.preprocessing.azure_doc import azure_process_pdfs
-from planning_ai.preprocessing.gcpt3 import main as preprocess_main
+from planning_ai.jobs import (
+    POLL_INTERVAL,
+    STAGES,
+    get_job,
+    job_dir,
+    start_workers,
+    submit_job,
+)
 
 auth = st.secrets.to_dict()
 
@@ -17,12 +21,27 @@ authenticator = stauth.Authenticate(
     auth["cookie"]["expiry_days"],
 )
 
-UPLOAD_DIR = Paths.RAW / "gcpt3"
-
 
-@st.cache_data
-def cached_main():
-    return report_main()
+@st.cache_resource
+def build_workers():
+    # one set of workers per server process, shared by every browser session
+    return start_workers()
+
+
+def download_button(job_id, file_name, label, heading):
+    path = job_dir(job_id) / file_name if file_name else None
+    st.markdown(heading)
+    if path is None or not path.exists():
+        st.warning(f"No file was produced for {label}.")
+        return
+    with open(path, "rb") as pdf_file:
+        st.download_button(
+            label=f"{label}",
+            data=pdf_file,
+            file_name=file_name,
+            mime="application/pdf",
+            type="primary",
+        )
 
 
 try:
@@ -30,10 +49,10 @@ try:
 except Exception as e:
     st.error(e)
 
-if "files_extracted" not in st.session_state:
-    st.session_state["files_extracted"] = False
-if "completed" not in st.session_state:
-    st.session_state["completed"] = False
+build_workers()
+
+if "job_id" not in st.session_state:
+    st.session_state["job_id"] = st.query_params.get("job")
 
 if st.session_state["authentication_status"]:
     authenticator.logout()
@@ -46,8 +65,7 @@ if st.session_state["authentication_status"]:
     st.write("Please ensure that the `.json` files follow the correct format:")
 
     with st.expander("**File Format example**"):
-        st.write(
-            r"""
+        st.write(r"""
         ```json
         {
             "id": 10008,
@@ -73,84 +91,59 @@ if st.session_state["authentication_status"]:
             ]
         }
         ```
-    """
-        )
+    """)
     if uploaded_file := st.file_uploader("Choose a `.7z` file:", type="7z"):
-        with st.spinner("Extracting files..."):
-            try:
-                # remove old files
-                _ = [file.unlink() for file in UPLOAD_DIR.glob("*.json")]
-
-                with py7zr.SevenZipFile(uploaded_file, mode="r") as archive:
-                    archive.extractall(path=UPLOAD_DIR)
-                st.session_state["files_extracted"] = True
-                st.success(
-                    f"Extracted `{len(list(UPLOAD_DIR.glob('*.json')))}` files to `{UPLOAD_DIR}`."
-                )
-            except Exception as e:
-                st.error(f"Failed to extract files {e}")
-
-    if not st.session_state["files_extracted"]:
+        st.write(
+            "Once the file is uploaded, click the button below to build the report. "
+            "Reports for an identical upload are returned without rebuilding."
+        )
+        if st.button("Build Report", type="primary"):
+            job_id = submit_job(uploaded_file.getvalue())
+            st.session_state["job_id"] = job_id
+            st.query_params["job"] = job_id
+    elif not st.session_state["job_id"]:
         st.write("No files uploaded yet.")
 
     st.write("---")
 
-    if st.session_state["files_extracted"] and not st.session_state["completed"]:
-        st.title("Build Report")
-        st.write(
-            "Once the files are extracted, click the button below to build the report."
-        )
-        if st.button("Build Report", type="primary"):
-            with st.spinner("Preprocessing files..."):
-                try:
-                    preprocess_main()
-                    st.success("Preprocessing completed successfully!")
-                except Exception as e:
-                    st.error(f"An error occurred during preprocessing: {e}")
-            with st.spinner("Extracting text from PDFs..."):
-                try:
-                    azure_process_pdfs()
-                    st.success("Text extraction completed successfully!")
-                except Exception as e:
-                    st.error(f"An error occurred during PDF text extraction: {e}")
-            with st.spinner("Building report..."):
-                representations_documents = cached_main()
-                st.session_state["completed"] = True
+    if job_id := st.session_state["job_id"]:
+        job = get_job(job_id)
+        if job is None:
+            st.error(f"Unknown job `{job_id}`.")
+        elif job["status"] in ("queued", "running"):
+            st.title("Building Report")
+            st.write(
+                f"Job `{job_id[:12]}` is {job['status']}. This page can be closed; "
+                "the build continues in the background."
+            )
+            for stage in STAGES:
+                progress = job["stages"][stage]
+                st.progress(
+                    progress["progress"], text=f"**{stage}**: {progress['status']}"
+                )
+            time.sleep(POLL_INTERVAL)
+            st.rerun()
+        elif job["status"] == "failed":
+            st.error(f"The report build failed during {job['message']}")
+        else:
+            st.success(
+                "Reports built successfully! Please click download buttons below."
+            )
+            for report in job["result"]:
+                rep = report["representations_document"]
+                col1, col2 = st.columns(2, border=True)
+                with col1:
+                    download_button(
+                        job_id, report["report"], rep, "**Executive Report Download**"
+                    )
+                with col2:
+                    download_button(
+                        job_id,
+                        report["summaries"],
+                        rep,
+                        "**Represtations Summary Download**",
+                    )
 elif st.session_state["authentication_status"] is False:
     st.error("Username/password is incorrect")
 elif st.session_state["authentication_status"] is None:
     st.warning("Please enter your username and password")
-
-if st.session_state["completed"]:
-    representations_documents = (
-        pl.read_parquet(Paths.STAGING / "gcpt3.parquet")["representations_document"]
-        .unique()
-        .to_list()
-    )
-
-    st.success("Reports built successfully! Please click download buttons below.")
-    for rep in representations_documents:
-        report_path = Paths.SUMMARY / f"Summary_Documents-{rep}.pdf"
-        summaries_path = Paths.SUMMARY / f"Summary_of_Submitted_Responses-{rep}.pdf"
-
-        col1, col2 = st.columns(2, border=True)
-        with col1:
-            with open(summaries_path, "rb") as pdf_file:
-                st.markdown("**Executive Report Download**")
-                st.download_button(
-                    label=f"{rep}",
-                    data=pdf_file,
-                    file_name=f"Summary_of_Submitted_Responses-{rep}.pdf",
-                    mime="application/pdf",
-                    type="primary",
-                )
-        with col2:
-            with open(report_path, "rb") as pdf_file:
-                st.markdown("**Represtations Summary Download**")
-                st.download_button(
-                    label=f"{rep}",
-                    data=pdf_file,
-                    file_name=f"Summary_Documents-{rep}.pdf",
-                    mime="application/pdf",
-                    type="primary",
-                )
@@ -4,6 +4,17 @@ from planning_ai.common.utils import Paths
 with open(Paths.PROMPTS / "fix_hallucination.txt", "r") as f:
     fix_template = f.read()
 
+fix_input = """Themes: {themes}
+
+- **Incorrect Summary**:
+  {summary}
+
+- **Explanation of Errors**:
+  {explanation}
+
+- **Original Response**:
+  {context}"""
+
 if __name__ == "__main__":
     test_document = """
     The Local Plan proposes a mass development north-west of Cambridge despite marked growth
@@ -12,7 +23,7 @@ if __name__ == "__main__":
     Papworth Everard has grown beyond recognition. This in itself is a matter of concern.
     """
     test_themes = {"Great Places", "Homes", "Climate Change"}
-    fix_chain = create_dynamic_map_chain(test_themes, fix_template)
+    fix_chain = create_dynamic_map_chain(test_themes, fix_template, human=fix_input)
     result = fix_chain.invoke(
         {
             "summary": "This plan is great because they are building a nuclear power plant.",
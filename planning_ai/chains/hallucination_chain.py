@@ -17,7 +17,11 @@ class HallucinationChecker(BaseModel):
 
 SLLM = GPT4o.with_structured_output(HallucinationChecker, strict=True)
 
-hallucination_prompt = ChatPromptTemplate([("system", reduce_template)])
+hallucination_input = "Assistant's Summary: {summary}\n\nSource document: {document}"
+
+hallucination_prompt = ChatPromptTemplate(
+    [("system", reduce_template), ("human", hallucination_input)]
+)
 hallucination_chain = hallucination_prompt | SLLM
 
 if __name__ == "__main__":
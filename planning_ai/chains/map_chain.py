@@ -1,16 +1,22 @@
 from enum import Enum, auto
+from functools import lru_cache
 from typing import Optional, Set, Type
 
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field, create_model
 
 from planning_ai.common.utils import Paths
 from planning_ai.llms.llm import GPT4o
+from planning_ai.logging import logger
+from planning_ai.telemetry import metrics
 from planning_ai.themes import THEMES_AND_POLICIES
 
 with open(Paths.PROMPTS / "map.txt", "r") as f:
     map_template = f.read()
 
+map_input = "Themes: {themes}\n\nContext:\n\n{context}"
+
 
 def create_policy_enum(
     policy_groups: list[str], name: str = "DynamicPolicyEnum"
@@ -52,24 +58,73 @@ def create_brief_summary_model(policy_enum: Enum) -> Type[BaseModel]:
     )
 
 
-def create_dynamic_map_chain(themes, prompt: str):
+def _policy_groups(themes) -> list[str]:
     policy_groups = []
     for theme in themes:
         if theme in THEMES_AND_POLICIES:
             policy_groups.extend(THEMES_AND_POLICIES[theme])
+    return policy_groups
+
 
-    PolicyEnum = create_policy_enum(policy_groups)
-    DynamicBriefSummary = create_brief_summary_model(PolicyEnum)
+@lru_cache
+def _summary_model() -> Type[BaseModel]:
+    PolicyEnum = create_policy_enum(_policy_groups(THEMES_AND_POLICIES))
+    return create_brief_summary_model(PolicyEnum)
 
-    SLLM = GPT4o.with_structured_output(DynamicBriefSummary, strict=True)
 
-    prompt = (
-        f"{prompt}\n\nAvailable Policies:\n\n- "
-        + "\n- ".join(policy_groups)
-        + "\n\nContext:\n\n{context}"
+def _policy_list() -> str:
+    return "\n\n".join(
+        f"{theme}:\n\n- " + "\n- ".join(policies)
+        for theme, policies in THEMES_AND_POLICIES.items()
     )
-    map_prompt = ChatPromptTemplate.from_messages([("system", prompt)])
-    return map_prompt | SLLM
+
+
+def create_dynamic_map_chain(themes, prompt: str, llm=GPT4o, human: str = map_input):
+    """
+    Create a chain that summarises a document and assigns policies from its themes.
+
+    The system message and output schema list every policy, so they are identical
+    for all documents and form a prefix the provider can cache. The document's themes
+    and content follow in the `human` message, and any policy outside `themes` is
+    dropped from the response. Dropped policies are logged and counted in
+    `metrics.dropped_policies`, so a rate high enough to lose real policies shows
+    up in the run summary.
+
+    Args:
+        themes (Iterable[str]): Themes assigned to the document.
+        prompt (str): Static task instructions, e.g. `map_template`.
+        llm (BaseChatModel): Model used for the call.
+        human (str): Template for the variable part of the prompt.
+
+    Returns:
+        Runnable: Chain returning a `DynamicBriefSummary`.
+    """
+    themes = sorted(theme for theme in themes if theme in THEMES_AND_POLICIES)
+    allowed = set(_policy_groups(themes))
+
+    SLLM = llm.with_structured_output(_summary_model(), strict=True)
+
+    system = f"{prompt}\n\nAvailable Policies:\n\n{_policy_list()}"
+    map_prompt = ChatPromptTemplate.from_messages(
+        [("system", system), ("human", human)]
+    ).partial(themes=", ".join(themes))
+
+    def drop_other_themes(response):
+        dropped = [
+            p.policy.name for p in response.policies if p.policy.name not in allowed
+        ]
+        response.policies = [p for p in response.policies if p.policy.name in allowed]
+        if dropped:
+            logger.warning(f"Dropped policies outside themes {themes}: {dropped}")
+            metrics.policies_dropped(dropped)
+        return response
+
+    return map_prompt | SLLM | RunnableLambda(drop_other_themes)
+
+
+def extractive_summary(text: str) -> BaseModel:
+    """Uses `text` verbatim as its own summary, with no policy notes."""
+    return _summary_model()(summary=text, policies=[])
 
 
 if __name__ == "__main__":
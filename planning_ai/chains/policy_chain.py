@@ -22,7 +22,11 @@ class PolicyList(BaseModel):
 SLLM = GPT4o.with_structured_output(PolicyList, strict=True)
 
 
-policy_prompt = ChatPromptTemplate([("system", policy_template)])
+policy_input = "Theme: {theme}\n\nPolicy: {policy}\n\n---\n\nDetails: \n\n{details}"
+
+policy_prompt = ChatPromptTemplate(
+    [("system", policy_template), ("human", policy_input)]
+)
 policy_chain = policy_prompt | SLLM
 
 
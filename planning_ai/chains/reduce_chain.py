@@ -10,21 +10,57 @@ with open(Paths.PROMPTS / "reduce.txt", "r") as f:
 with open(Paths.PROMPTS / "reduce_final.txt", "r") as f:
     reduce_template_final = f.read()
 
-reduce_prompt = ChatPromptTemplate([("system", reduce_template)])
+reduce_input = "Summaries:\n\n{context}\n\n# Executive Summary"
+reduce_input_final = "Documents:\n\n{context}"
+REPORT_SEPARATOR = "\n\n---\n\n"
+
+
+def encode_summaries(summaries: list[dict]) -> str:
+    """Serialises summaries for `reduce_chain`, one per line.
+
+    Each line is `[doc_id] (stance) summary`, with the summary's whitespace
+    collapsed and the stance left out when it is unknown, so a batch carries
+    each document ID once and no other framing.
+
+    Args:
+        summaries (list[dict]): Documents with a `doc_id` and a `summary`.
+
+    Returns:
+        str: The batch's context for `reduce_input`.
+    """
+    lines = []
+    for doc in summaries:
+        stance = doc["document"].metadata.get("representations_support/object")
+        label = f" ({stance})" if stance else ""
+        text = " ".join(doc["summary"].summary.split())
+        lines.append(f"[{doc['doc_id']}]{label} {text}")
+    return "\n".join(lines)
+
+
+def join_reports(reports: list[str]) -> str:
+    """Joins intermediate executive summaries into the context for `reduce_chain_final`."""
+    return REPORT_SEPARATOR.join(report.strip() for report in reports)
+
+
+reduce_prompt = ChatPromptTemplate(
+    [("system", reduce_template), ("human", reduce_input)]
+)
 reduce_chain = reduce_prompt | O3Mini | StrOutputParser()
 
 
-reduce_prompt_final = ChatPromptTemplate([("system", reduce_template_final)])
+reduce_prompt_final = ChatPromptTemplate(
+    [("system", reduce_template_final), ("human", reduce_input_final)]
+)
 reduce_chain_final = reduce_prompt_final | O3Mini | StrOutputParser()
 
 
 if __name__ == "__main__":
-    test_summary = """
-        The author expresses concern over the proposed mass development north-west of Cambridge,
-        highlighting the significant growth in the area over the past twenty years,
-        particularly with the establishment of Cambourne and the expansion of Papworth Everard.
-        [1, 2, 3]
-        """
+    test_summary = (
+        "[1] (Object) The author expresses concern over the proposed mass development "
+        "north-west of Cambridge, highlighting the significant growth in the area over "
+        "the past twenty years, particularly with the establishment of Cambourne and "
+        "the expansion of Papworth Everard."
+    )
 
     result = reduce_chain.invoke({"context": test_summary})
     result_final = reduce_chain_final.invoke({"context": test_summary})
@@ -30,7 +30,9 @@ class ThemeSelector(BaseModel):
 with open(Paths.PROMPTS / "themes.txt", "r") as f:
     themes_template = f.read()
 
-themes_prompt = ChatPromptTemplate.from_messages([("system", themes_template)])
+themes_prompt = ChatPromptTemplate.from_messages(
+    [("system", themes_template), ("human", "### **Document Content:**\n\n{document}")]
+)
 
 SLLM = GPT4o.with_structured_output(ThemeSelector, strict=True)
 
@@ -0,0 +1,97 @@
+import numpy as np
+
+KMEANS_ITERATIONS = 25
+
+
+def kmeans(
+    vectors: np.ndarray, k: int, n_iter: int = KMEANS_ITERATIONS, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Clusters `vectors` into `k` groups with k-means++ seeding.
+
+    Args:
+        vectors (np.ndarray): One row per item.
+        k (int): Number of clusters, at most the number of rows.
+        n_iter (int): Maximum number of assignment and update rounds.
+        seed (int): Seed for the k-means++ initial centroids.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The cluster label of each row and the
+        `k` centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = np.empty((k, vectors.shape[1]), dtype=vectors.dtype)
+    centroids[0] = vectors[rng.integers(len(vectors))]
+    distances = ((vectors - centroids[0]) ** 2).sum(axis=1)
+    for j in range(1, k):
+        total = distances.sum()
+        probs = distances / total if total > 0 else None
+        centroids[j] = vectors[rng.choice(len(vectors), p=probs)]
+        distances = np.minimum(distances, ((vectors - centroids[j]) ** 2).sum(axis=1))
+
+    squared_norms = (vectors**2).sum(axis=1)[:, None]
+    labels = np.full(len(vectors), -1)
+    for _ in range(n_iter):
+        distances = (
+            squared_norms - 2 * vectors @ centroids.T + (centroids**2).sum(axis=1)
+        )
+        new_labels = distances.argmin(axis=1)
+        if (new_labels == labels).all():
+            break
+        labels = new_labels
+        for j in range(k):
+            members = labels == j
+            if members.any():
+                centroids[j] = vectors[members].mean(axis=0)
+    return labels, centroids
+
+
+def cluster_batches(vectors: np.ndarray, batch_size: int) -> list[list[int]]:
+    """Splits rows into batches of at most `batch_size` that share a topic.
+
+    Rows are clustered with `kmeans` into as many clusters as plain chunking
+    would give batches. Clusters larger than `batch_size` are cut into full
+    batches, which leaves exactly enough batches for the remainders. The largest
+    remainders each start one of these. The others are packed, largest first,
+    into the batch with the most similar centroid that still has room, or split
+    across the most similar batches when none does, so there are never more
+    than `ceil(n / batch_size)` batches.
+
+    Args:
+        vectors (np.ndarray): One row per item.
+        batch_size (int): Maximum number of rows per batch.
+
+    Returns:
+        list[list[int]]: Row indices of each batch, in ascending order.
+    """
+    n_rows = len(vectors)
+    k = -(-n_rows // batch_size)
+    if k <= 1:
+        return [list(range(n_rows))]
+    labels, centroids = kmeans(vectors, k)
+
+    batches, remainders = [], []
+    for j in range(k):
+        members = np.flatnonzero(labels == j).tolist()
+        n_full = len(members) // batch_size * batch_size
+        batches.extend(
+            members[i : i + batch_size] for i in range(0, n_full, batch_size)
+        )
+        if n_full < len(members):
+            remainders.append((members[n_full:], centroids[j]))
+
+    # every remainder is smaller than a batch, so there are at least as many
+    # remainders as batches left to fill
+    remainders.sort(key=lambda r: -len(r[0]))
+    n_open = k - len(batches)
+    open_batches = [
+        (list(members), centroid) for members, centroid in remainders[:n_open]
+    ]
+    for members, centroid in remainders[n_open:]:
+        ranked = sorted(open_batches, key=lambda b: -float(b[1] @ centroid))
+        fits = [b for b in ranked if len(b[0]) + len(members) <= batch_size]
+        for batch, _ in fits[:1] or ranked:
+            n_taken = min(len(members), batch_size - len(batch))
+            batch.extend(members[:n_taken])
+            members = members[n_taken:]
+    batches.extend(members for members, _ in open_batches)
+    return [sorted(batch) for batch in batches]
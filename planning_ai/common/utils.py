@@ -12,15 +12,43 @@ pl.Config(
 )
 
 
+class TrackedDocuments(list):
+    """Document list that tracks which documents are still being processed.
+
+    `filename_reducer` keeps the filename index and the set of pending (not yet
+    `processed`) filenames up to date as it merges each update, so completion
+    checks are O(1) and dispatching pending documents does not rescan the list.
+    """
+
+    def __init__(self, docs=()):
+        super().__init__(docs)
+        self.positions = {doc["filename"]: i for i, doc in enumerate(self)}
+        self.pending = {doc["filename"] for doc in self if not doc.get("processed")}
+
+    @property
+    def complete(self) -> bool:
+        return not self.pending
+
+    def pending_documents(self) -> list:
+        return [self[i] for i in sorted(self.positions[f] for f in self.pending)]
+
+
 def filename_reducer(docs_a, docs_b):
     if docs_a == []:
-        return docs_b
-    b_dict = {d["filename"]: d for d in docs_b}
+        return TrackedDocuments(docs_b)
+    if not isinstance(docs_a, TrackedDocuments):
+        docs_a = TrackedDocuments(docs_a)
 
-    for i, dict_a in enumerate(docs_a):
-        filename = dict_a.get("filename")
-        if filename in b_dict:
-            docs_a[i] = b_dict[filename]
+    for doc in docs_b:
+        filename = doc.get("filename")
+        position = docs_a.positions.get(filename)
+        if position is None:
+            continue
+        docs_a[position] = doc
+        if doc.get("processed"):
+            docs_a.pending.discard(filename)
+        else:
+            docs_a.pending.add(filename)
     return docs_a
 
 
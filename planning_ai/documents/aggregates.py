@@ -0,0 +1,130 @@
+import polars as pl
+
+from planning_ai.preprocessing.geography import load_geography
+
+
+def documents_table(documents) -> pl.DataFrame:
+    """Flattens processed documents into one row per document.
+
+    Args:
+        documents (list[DocumentState]): Documents from `generate_final_report`.
+
+    Returns:
+        pl.DataFrame: `doc_id`, `stance`, `postcode` and a `themes` list column.
+    """
+    return pl.DataFrame(
+        {
+            "doc_id": [doc["doc_id"] for doc in documents],
+            "stance": [
+                doc["document"].metadata["representations_support/object"]
+                for doc in documents
+            ],
+            "postcode": [
+                doc["document"].metadata["respondentpostcode"] for doc in documents
+            ],
+            "themes": [
+                [theme["theme"].value for theme in doc["themes"]] for doc in documents
+            ],
+        },
+        schema={
+            "doc_id": pl.Int64,
+            "stance": pl.String,
+            "postcode": pl.String,
+            "themes": pl.List(pl.String),
+        },
+    )
+
+
+def _share(column: str, scale: float = 1.0) -> pl.Expr:
+    return (pl.col(column) / pl.col(column).sum()) * scale
+
+
+def compute_aggregates(table: pl.DataFrame, policies: pl.DataFrame) -> dict:
+    """Computes every report statistic from the per-document table in one plan.
+
+    All aggregates are built as lazy queries over the same source frames and
+    collected together with `pl.collect_all`, so shared work such as the postcode
+    join is planned once and the queries run in parallel. Every aggregate is
+    sorted on its group key, because `group_by` output order varies between
+    runs and the figure cache hashes these frames.
+
+    Args:
+        table (pl.DataFrame): Output of `documents_table`.
+        policies (pl.DataFrame): Reduced policies from `generate_final_report`.
+
+    Returns:
+        dict: `stances`, `themes`, `policies`, `postcodes`, `wards`, `oa` and
+        `imd` aggregates.
+    """
+    geography = load_geography()
+    docs = table.lazy()
+
+    stances = (
+        docs.group_by("stance")
+        .len(name="count")
+        .with_columns(_share("count").alias("percentage"))
+        .sort(["percentage", "stance"], descending=[True, False])
+    )
+    themes = (
+        docs.select(pl.col("themes").explode())
+        .drop_nulls()
+        .group_by("themes")
+        .len(name="Count")
+        .with_columns(_share("Count", 100).round(2).alias("Percentage"))
+        .sort(["Percentage", "themes"], descending=[True, False])
+        .rename({"themes": "Theme"})
+    )
+    policy_groups = policies.lazy().sort(["themes", "stance"], maintain_order=True)
+    postcodes = (
+        docs.select(pl.col("postcode").str.replace_all(" ", ""))
+        .group_by("postcode")
+        .len(name="count")
+        .join(
+            geography["postcodes"]
+            .lazy()
+            .select(["PCD", "OSWARD", "LSOA11", "OA21", "postcode"]),
+            on="postcode",
+        )
+        .sort("postcode")
+    )
+    wards = postcodes.group_by("OSWARD").agg(pl.col("count").sum()).sort("OSWARD")
+    oa = (
+        geography["oa"]
+        .lazy()
+        .join(
+            postcodes.group_by("OA21").agg(pl.col("count").sum()),
+            left_on="oa21cd",
+            right_on="OA21",
+            how="left",
+        )
+        .group_by(["supergroup", "supergroup_name"])
+        .agg(pl.col("population").sum(), pl.col("count").sum())
+        .sort("supergroup")
+        .with_columns(
+            _share("count", 100).alias("perc_count"),
+            _share("population", 100).alias("perc_pop"),
+        )
+        .with_columns((pl.col("perc_count") - pl.col("perc_pop")).alias("perc_diff"))
+    )
+    imd = (
+        geography["lsoa"]
+        .lazy()
+        .join(
+            postcodes.group_by("LSOA11").agg(pl.col("count").sum()),
+            left_on="LSOA",
+            right_on="LSOA11",
+            how="left",
+        )
+        .group_by("SOA_decile")
+        .agg(pl.col("count").sum(), pl.col("LSOA").count(), pl.col("Total").sum())
+        .sort("SOA_decile")
+        .with_columns(
+            _share("count", 100).alias("perc_count"),
+            _share("Total", 100).alias("perc_pop"),
+        )
+        .with_columns((pl.col("perc_count") - pl.col("perc_pop")).alias("perc_diff"))
+    )
+
+    names = ["stances", "themes", "policies", "postcodes", "wards", "oa", "imd"]
+    frames = [stances, themes, policy_groups, postcodes, wards, oa, imd]
+    return dict(zip(names, pl.collect_all(frames)))
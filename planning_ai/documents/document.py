@@ -1,57 +1,32 @@
+import hashlib
+import itertools
 import logging
+import os
 import re
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-
-import geopandas as gpd
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import polars as pl
 from matplotlib.patches import Patch
-from polars.dependencies import subprocess
+from pypdf import PdfReader
 
 from planning_ai.common.utils import Paths
+from planning_ai.documents.aggregates import compute_aggregates, documents_table
+from planning_ai.documents.render import merge_pdfs, render, write_markdown
+from planning_ai.preprocessing.geography import WARDS, load_geography, ward_extent
 
-mpl.rcParams["text.usetex"] = True
-mpl.rcParams["text.latex.preamble"] = r"\usepackage{libertine}"
-
-WARDS = [
-    "E05013050",
-    "E05013051",
-    "E05013052",
-    "E05013053",
-    "E05013054",
-    "E05013055",
-    "E05013056",
-    "E05013057",
-    "E05013058",
-    "E05013059",
-    "E05013060",
-    "E05013061",
-    "E05013062",
-    "E05013063",
-]
-
-
-def _process_postcodes(final):
-    documents = final["documents"]
-    postcodes = [doc["document"].metadata["respondentpostcode"] for doc in documents]
-    postcodes = (
-        pl.DataFrame({"postcode": postcodes})["postcode"]
-        .value_counts()
-        .with_columns(pl.col("postcode").str.replace_all(" ", ""))
-    )
-    onspd = pl.read_parquet(
-        Paths.RAW / "onspd_cambridge.parquet",
-        columns=["PCD", "OSWARD", "LSOA11", "OA21"],
-    ).with_columns(pl.col("PCD").str.replace_all(" ", "").alias("postcode"))
-    postcodes = postcodes.join(onspd, on="postcode")
-    return postcodes
+# `latex` shells out to LaTeX for every text element; `mathtext` renders the same
+# serif look with matplotlib's own engine and is much faster
+FIGURE_TEXT_MODE = os.getenv("FIGURE_TEXT_MODE", "mathtext")
+# split the summaries document into parts of this many documents (0 disables)
+SUMMARY_SHARD_SIZE = int(os.getenv("SUMMARY_SHARD_SIZE", "0"))
+MERGE_SHARDS = os.getenv("MERGE_SHARDS", "1") == "1"
 
 
-def _process_policies(final):
+def _process_policies(policies_df):
     def process_policy_group(policy_group, theme, stance):
         details = "".join(
             f'\n### {row["policies"]}\n\n'
@@ -63,8 +38,6 @@ def _process_policies(final):
         )
         return f"## {theme} - {stance}\n\n{details}\n"
 
-    policies_df = final["policies"]
-
     support_policies = ""
     object_policies = ""
     other_policies = ""
@@ -82,88 +55,21 @@ def _process_policies(final):
     return support_policies, object_policies, other_policies
 
 
-def _process_stances(final):
-    documents = final["documents"]
-    stances = [
-        doc["document"].metadata["representations_support/object"] for doc in documents
-    ]
-    value_counts = Counter(stances)
-    total_values = sum(value_counts.values())
-    percentages = {
-        key: {"count": count, "percentage": (count / total_values)}
-        for key, count in value_counts.items()
-    }
-    stances_top = sorted(
-        percentages.items(), key=lambda x: x[1]["percentage"], reverse=True
-    )
+def _process_stances(stances):
     return " | ".join(
         [
-            f"**{item}**: {stance['percentage']:.1%} _({stance['count']})_"
-            for item, stance in stances_top
+            f"**{row['stance']}**: {row['percentage']:.1%} _({row['count']})_"
+            for row in stances.rows(named=True)
         ]
     )
 
 
-def _process_themes(final):
-    documents = final["documents"]
-    themes = Counter(
-        [theme["theme"].value for doc in documents for theme in doc["themes"]]
-    )
-    themes = pl.DataFrame(themes).transpose(include_header=True)
-    themes_breakdown = themes.with_columns(
-        ((pl.col("column_0") / pl.sum("column_0")) * 100).round(2).alias("percentage")
-    ).sort("percentage", descending=True)
-    themes_breakdown = themes_breakdown.rename(
-        {"column": "Theme", "column_0": "Count", "percentage": "Percentage"}
-    )
+def _process_themes(themes):
     pd.set_option("display.precision", 1)
-    return themes_breakdown.to_pandas().to_markdown(index=False)
+    return themes.to_pandas().to_markdown(index=False)
 
 
-def fig_oa(postcodes):
-    oa_lookup = pl.read_csv(
-        Paths.RAW
-        / "Output_Area_to_Local_Authority_District_(April_2023)_Lookup_in_England_and_Wales.csv"
-    )
-    camb_oa = oa_lookup.filter(
-        pl.col("LAD23NM").is_in(["Cambridge", "South Cambridgeshire"])
-    )
-    oa_pop = pl.read_csv(Paths.RAW / "oa_populations.csv")
-    oa_pop = (
-        oa_pop.join(camb_oa, left_on="Output Areas Code", right_on="OA21CD")
-        .group_by(pl.col("Output Areas Code"))
-        .sum()
-        .rename({"Output Areas Code": "OA2021", "Observation": "population"})
-        .select(["OA2021", "population"])
-    )
-
-    oac = pl.read_csv(Paths.RAW / "oac21ew.csv")
-    oac_names = pl.read_csv(Paths.RAW / "classification_codes_and_names.csv")
-    oac = (
-        oac.with_columns(pl.col("supergroup").cast(str))
-        .join(oac_names, left_on="supergroup", right_on="Classification Code")
-        .select(["oa21cd", "Classification Name", "supergroup"])
-        .rename(
-            {
-                "Classification Name": "supergroup_name",
-            }
-        )
-    )
-    oac = oac.join(oa_pop, left_on="oa21cd", right_on="OA2021")
-    oac = (
-        postcodes.join(oac, left_on="OA21", right_on="oa21cd", how="right")
-        .group_by(["supergroup", "supergroup_name"])
-        .sum()
-        .select(["supergroup", "supergroup_name", "population", "count"])
-        .sort("supergroup")
-        .with_columns(
-            ((pl.col("count") / pl.col("count").sum()) * 100).alias("perc_count"),
-            ((pl.col("population") / pl.col("population").sum()) * 100).alias(
-                "perc_pop"
-            ),
-        )
-        .with_columns((pl.col("perc_count") - pl.col("perc_pop")).alias("perc_diff"))
-    )
+def fig_oa(oac, out_path):
     oa_pd = oac.to_pandas()
 
     _, ax1 = plt.subplots(figsize=(8, 8))
@@ -184,7 +90,7 @@ def fig_oa(postcodes):
     bars1 = ax1.bar(
         oa_pd["supergroup"],
         oa_pd["perc_diff"],
-        label="Percentage of Representations (\%)",
+        label=f"Percentage of Representations ({_pct()})",
         color=colors[: len(oa_pd)],
         edgecolor="black",
     )
@@ -197,7 +103,7 @@ def fig_oa(postcodes):
         height = bar.get_height()
         if height > 0:
             ax1.annotate(
-                f"{height:.0f}\%",
+                f"{height:.0f}{_pct()}",
                 xy=(bar.get_x() + bar.get_width() / 2, height),
                 xytext=(0, 3),  # 3 points vertical offset
                 textcoords="offset points",
@@ -206,7 +112,7 @@ def fig_oa(postcodes):
             )
         else:
             ax1.annotate(
-                f"{height:.0f}\%",
+                f"{height:.0f}{_pct()}",
                 xy=(bar.get_x() + bar.get_width() / 2, height),
                 xytext=(0, -6),  # 10 points vertical offset
                 textcoords="offset points",
@@ -215,7 +121,7 @@ def fig_oa(postcodes):
             )
 
     ax1.set_xlabel("Output Area Classification (OAC) Supergroup")
-    ax1.set_ylabel("Difference from national average (\%)")
+    ax1.set_ylabel(f"Difference from national average ({_pct()})")
 
     supergroup_names = [
         f"{i}: {name}"
@@ -229,17 +135,15 @@ def fig_oa(postcodes):
 
     plt.tight_layout()
 
-    plt.savefig(Paths.SUMMARY / "figs" / "oas.pdf")
+    plt.savefig(out_path)
 
 
-def fig_wards(postcodes):
-    ward_boundaries = gpd.read_file(
-        Paths.RAW / "Wards_December_2021_GB_BFE_2022_7523259277605796091.zip"
-    )
+def fig_wards(wards, out_path):
+    ward_boundaries = load_geography()["wards"]
 
     camb_ward_boundaries = ward_boundaries[ward_boundaries["WD21CD"].isin(WARDS)]
     ward_boundaries_prop = ward_boundaries.merge(
-        postcodes.to_pandas(), left_on="WD21CD", right_on="OSWARD"
+        wards.to_pandas(), left_on="WD21CD", right_on="OSWARD"
     )
 
     _, ax = plt.subplots(figsize=(8, 8))
@@ -253,49 +157,17 @@ def fig_wards(postcodes):
     ward_boundaries.plot(ax=ax, color="none", edgecolor="gray")
     camb_ward_boundaries.plot(ax=ax, color="none", edgecolor="black")
 
-    bounds = np.array([541419.8982, 253158.2036, 549420.4025, 262079.7998])
-    buffer = 20_000
-    ax.set_xlim([bounds[0] - buffer, bounds[2] + buffer])
-    ax.set_ylim([bounds[1] - buffer, bounds[3] + buffer])
+    minx, miny, maxx, maxy = ward_extent(ward_boundaries)
+    ax.set_xlim([minx, maxx])
+    ax.set_ylim([miny, maxy])
 
     plt.axis("off")
     plt.tight_layout()
 
-    plt.savefig(Paths.SUMMARY / "figs" / "wards.pdf")
-
-
-def fig_imd(postcodes):
-    imd = pl.read_csv(
-        Paths.RAW / "uk_imd2019.csv", columns=["LSOA", "SOA_decile"]
-    ).with_columns(((pl.col("SOA_decile") - 1) // 2) + 1)
-
-    oa_lookup = pl.read_csv(Paths.RAW / "lsoa_lad_lookup.csv")[
-        ["LSOA11CD", "LAD11NM"]
-    ].unique()
-    lsoa_camb = oa_lookup.filter(
-        pl.col("LAD11NM").is_in(["Cambridge", "South Cambridgeshire"])
-    )
+    plt.savefig(out_path)
 
-    imd = imd.join(lsoa_camb, left_on="LSOA", right_on="LSOA11CD")
-    pops = pl.read_excel(
-        Paths.RAW / "sapelsoabroadage20112022.xlsx",
-        sheet_name="Mid-2022 LSOA 2021",
-        read_options={"header_row": 3},
-        columns=["LSOA 2021 Code", "Total"],
-    )
-    imd = (
-        postcodes.join(imd, left_on="LSOA11", right_on="LSOA", how="right")
-        .join(pops, left_on="LSOA", right_on="LSOA 2021 Code")
-        .group_by("SOA_decile")
-        .agg(pl.col("count").sum(), pl.col("LSOA").count(), pl.col("Total").sum())
-        .sort("SOA_decile")
-        .with_columns(
-            ((pl.col("count") / pl.col("count").sum()) * 100).alias("perc_count"),
-            ((pl.col("Total") / pl.col("Total").sum()) * 100).alias("perc_pop"),
-        )
-        .with_columns((pl.col("perc_count") - pl.col("perc_pop")).alias("perc_diff"))
-    )
 
+def fig_imd(imd, out_path):
     postcodes_pd = imd.to_pandas()
     colors = [
         "#d62728",
@@ -317,7 +189,7 @@ def fig_imd(postcodes):
 
     # Set labels and ticks
     ax1.set_xlabel("Deprivation Quintile")
-    ax1.set_ylabel("Difference from national average (\%)")
+    ax1.set_ylabel(f"Difference from national average ({_pct()})")
     ax1.set_xticks(x)
     ax1.axhline(0, color="black", linewidth=1.5)
 
@@ -325,7 +197,94 @@ def fig_imd(postcodes):
     plt.tight_layout()
     ax1.set_xticklabels(["1 - Most Deprived", "2", "3", "4", "5 - Least Deprived"])
 
-    plt.savefig(Paths.SUMMARY / "figs" / "imd_decile.pdf")
+    plt.savefig(out_path)
+
+
+# figure name -> (plotting function, aggregate it draws)
+FIGURES = {
+    "wards": (fig_wards, "wards"),
+    "oas": (fig_oa, "oa"),
+    "imd_decile": (fig_imd, "imd"),
+}
+
+
+def configure_text(mode: str = FIGURE_TEXT_MODE):
+    if mode == "latex":
+        mpl.rcParams["text.usetex"] = True
+        mpl.rcParams["text.latex.preamble"] = r"\usepackage{libertine}"
+    else:
+        mpl.rcParams["text.usetex"] = False
+        mpl.rcParams["font.family"] = "serif"
+        mpl.rcParams["font.serif"] = [
+            "Linux Libertine O",
+            "Libertinus Serif",
+            "DejaVu Serif",
+        ]
+        mpl.rcParams["mathtext.fontset"] = "stix"
+
+
+def _pct():
+    return r"\%" if mpl.rcParams["text.usetex"] else "%"
+
+
+def _render_figure(name, data, out_path, mode):
+    configure_text(mode)
+    fig, _ = FIGURES[name]
+    fig(data, out_path)
+    plt.close("all")
+
+
+def figures_dir(rep):
+    return Paths.FIGS / re.sub(r"[^A-Za-z0-9]+", "_", rep)
+
+
+def render_figures(aggregates, fig_dir, mode: str = FIGURE_TEXT_MODE):
+    """Renders the report figures in parallel, skipping any that are up to date.
+
+    Each figure is written to `fig_dir` alongside a hash of the aggregate and
+    text mode it was drawn from; figures whose hash is unchanged are not redrawn.
+
+    Args:
+        aggregates (dict): Output of `compute_aggregates`.
+        fig_dir (Path): Output directory, unique to the representations document.
+        mode (str): `latex` or `mathtext` text rendering.
+
+    Returns:
+        dict: Figure names mapped to their PDF paths.
+    """
+    fig_dir.mkdir(parents=True, exist_ok=True)
+    digests = {
+        name: hashlib.sha256(
+            f"{mode}\n{aggregates[key].write_csv()}".encode()
+        ).hexdigest()
+        for name, (_, key) in FIGURES.items()
+    }
+    paths = {name: fig_dir / f"{name}.pdf" for name in FIGURES}
+    pending = [
+        name
+        for name, path in paths.items()
+        if not path.exists()
+        or not path.with_suffix(".hash").exists()
+        or path.with_suffix(".hash").read_text() != digests[name]
+    ]
+    if pending:
+        workers = min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(
+                    _render_figure,
+                    name,
+                    aggregates[FIGURES[name][1]],
+                    paths[name],
+                    mode,
+                )
+                for name in pending
+            }
+            for name, future in futures.items():
+                future.result()
+                paths[name].with_suffix(".hash").write_text(digests[name])
+    logging.info(f"Rendered {len(pending)}/{len(paths)} figures in {fig_dir}")
+    return paths
 
 
 def load_txt(file_path):
@@ -333,20 +292,22 @@ def load_txt(file_path):
         return file.read()
 
 
-def build_final_report(out, rep):
+def build_final_report(out, rep, queue=None):
     introduction_paragraph = load_txt("planning_ai/documents/introduction.txt")
     figures_paragraph = load_txt("planning_ai/documents/figures.txt")
     themes_paragraph = load_txt("planning_ai/documents/themes.txt")
     final = out["generate_final_report"]
     unused_documents = out["generate_final_report"]["unused_documents"]
-    support_policies, object_policies, other_policies = _process_policies(final)
-    postcodes = _process_postcodes(final)
-    stances = _process_stances(final)
-    themes = _process_themes(final)
+    aggregates = compute_aggregates(
+        documents_table(final["documents"]), final["policies"]
+    )
+    support_policies, object_policies, other_policies = _process_policies(
+        aggregates["policies"]
+    )
+    stances = _process_stances(aggregates["stances"])
+    themes = _process_themes(aggregates["themes"])
 
-    fig_wards(postcodes)
-    fig_oa(postcodes)
-    fig_imd(postcodes)
+    figs = render_figures(aggregates, figures_dir(rep))
 
     quarto_doc = (
         "---\n"
@@ -367,9 +328,9 @@ def build_final_report(out, rep):
         f"{introduction_paragraph}\n\n"
         "\n# Profile of Submissions\n\n"
         f"{figures_paragraph}\n\n"
-        f"![Total number of representations submitted by Ward\\label{{fig-wards}}](./data/out/summary/figs/wards.pdf)\n\n"
-        f"![Total number of representations submitted by Output Area (OA 2021)\\label{{fig-oas}}](./data/out/summary/figs/oas.pdf)\n\n"
-        f"![Percentage of representations submitted by quintile of index of multiple deprivation (2019)\\label{{fig-imd}}](./data/out/summary/figs/imd_decile.pdf)\n\n"
+        f"![Total number of representations submitted by Ward\\label{{fig-wards}}]({figs['wards']})\n\n"
+        f"![Total number of representations submitted by Output Area (OA 2021)\\label{{fig-oas}}]({figs['oas']})\n\n"
+        f"![Percentage of representations submitted by quintile of index of multiple deprivation (2019)\\label{{fig-imd}}]({figs['imd_decile']})\n\n"
         r"\newpage"
         "\n\n# Themes and Policies\n\n"
         f"{themes_paragraph}\n\n"
@@ -393,27 +354,24 @@ def build_final_report(out, rep):
 
     out_path = Paths.SUMMARY / f"Summary_of_Submitted_Responses-{rep}.md"
     out_file = Paths.SUMMARY / f"Summary_of_Submitted_Responses-{rep}.pdf"
-    with open(out_path, "w") as f:
-        f.write(quarto_doc)
-    command = ["pandoc", f"{out_path}", "-o", f"{out_file}"]
-    try:
-        subprocess.run(command, check=True, capture_output=True)
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error during Summary_of_Submitted_Responses.md render: {e}")
-
-
-def build_summaries_document(out, rep):
-    sub = r"Document ID: \[\d+\]\n\n"
-    full_text = "".join(
+    digest = write_markdown(out_path, [quarto_doc])
+    return render(out_path, out_file, digest, queue)
+
+
+def _summary_markdown(document):
+    summary = document["summary"].summary
+    return (
         f"**Document ID**: {document['doc_id']}\n\n"
         # f"**Original Document**\n\n{document['document'].page_content}\n\n"
-        f"**Summarised Document**\n\n{re.sub(sub, '', document['summary'].summary)}\n\n"
+        f"**Summarised Document**\n\n{summary}\n\n"
         # f"**Identified Entities**\n\n{document['entities']}\n\n"
-        for document in out["generate_final_report"]["documents"]
     )
-    header = (
+
+
+def _summaries_header(title):
+    return (
         "---\n"
-        f"title: 'Summary Documents: {rep}'\n"
+        f"title: '{title}'\n"
         "fontfamily: libertinus\n"
         "geometry: a4paper\n"
         "margin: 2cm\n"
@@ -422,13 +380,81 @@ def build_summaries_document(out, rep):
         "  - Scale=0.55\n"
         "---\n\n"
     )
-    out_path = Paths.SUMMARY / f"Summary_Documents-{rep}.md"
-    out_file = Paths.SUMMARY / f"Summary_Documents-{rep}.pdf"
-    with open(out_path, "w") as f:
-        f.write(f"{header}{full_text}")
-
-    command = ["pandoc", f"{out_path}", "-o", f"{out_file}"]
-    try:
-        subprocess.run(command, check=True, capture_output=True)
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error during render: {e}")
+
+
+def index_summary_shards(shard_files, shard_ids, merged_file, index_file):
+    """Records the shard and page of every document, merging shards if requested.
+
+    Pages are found by searching each rendered shard for its document IDs;
+    `page` is 1-based within the shard and `merged_page` within `merged_file`.
+    """
+    rows = []
+    offset = 0
+    for shard, (shard_file, doc_ids) in enumerate(zip(shard_files, shard_ids), 1):
+        pages = {}
+        n_pages = 0
+        if shard_file.exists():
+            reader = PdfReader(shard_file)
+            n_pages = len(reader.pages)
+            for page_number, page in enumerate(reader.pages, start=1):
+                for doc_id in re.findall(r"Document ID\W*(\d+)", page.extract_text()):
+                    pages.setdefault(int(doc_id), page_number)
+        for doc_id in doc_ids:
+            page = pages.get(doc_id)
+            rows.append(
+                {
+                    "doc_id": doc_id,
+                    "shard": shard,
+                    "shard_file": shard_file.name,
+                    "page": page,
+                    "merged_page": page + offset if page else None,
+                }
+            )
+        offset += n_pages
+    pl.DataFrame(rows).write_csv(index_file)
+    if merged_file is not None:
+        merge_pdfs([f for f in shard_files if f.exists()], merged_file)
+    logging.info(f"Indexed {len(rows)} documents across {len(shard_files)} shards")
+
+
+def build_summaries_document(out, rep, queue=None, shard_size=SUMMARY_SHARD_SIZE):
+    """Writes and renders the document summaries for `rep`.
+
+    With `shard_size` set, summaries are split into parts of that many documents
+    which render in parallel, then are indexed (and merged if `MERGE_SHARDS`) into
+    `Summary_Documents-{rep}-index.csv`.
+    """
+    # streamed one document at a time rather than joined into a single string
+    documents = out["generate_final_report"]["documents"]
+    if not shard_size or len(documents) <= shard_size:
+        out_path = Paths.SUMMARY / f"Summary_Documents-{rep}.md"
+        out_file = Paths.SUMMARY / f"Summary_Documents-{rep}.pdf"
+        header = _summaries_header(f"Summary Documents: {rep}")
+        chunks = (_summary_markdown(document) for document in documents)
+        digest = write_markdown(out_path, itertools.chain([header], chunks))
+        return render(out_path, out_file, digest, queue)
+
+    shards = [
+        documents[i : i + shard_size] for i in range(0, len(documents), shard_size)
+    ]
+    renders, shard_files = [], []
+    for part, shard in enumerate(shards, start=1):
+        out_path = Paths.SUMMARY / f"Summary_Documents-{rep}-part{part:03d}.md"
+        out_file = Paths.SUMMARY / f"Summary_Documents-{rep}-part{part:03d}.pdf"
+        header = _summaries_header(
+            f"Summary Documents: {rep} (Part {part} of {len(shards)})"
+        )
+        chunks = (_summary_markdown(document) for document in shard)
+        digest = write_markdown(out_path, itertools.chain([header], chunks))
+        renders.append(render(out_path, out_file, digest, queue))
+        shard_files.append(out_file)
+
+    args = (
+        shard_files,
+        [[document["doc_id"] for document in shard] for shard in shards],
+        Paths.SUMMARY / f"Summary_Documents-{rep}.pdf" if MERGE_SHARDS else None,
+        Paths.SUMMARY / f"Summary_Documents-{rep}-index.csv",
+    )
+    if queue is not None:
+        return queue.submit_after(renders, index_summary_shards, *args)
+    return index_summary_shards(*args)
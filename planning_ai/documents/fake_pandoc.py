@@ -0,0 +1,39 @@
+"""Minimal stand-in for `pandoc INPUT -o OUTPUT` used to render without LaTeX.
+
+Writes the markdown into a single-page placeholder PDF. Select it with
+`PANDOC="python -m planning_ai.documents.fake_pandoc"`.
+"""
+
+import sys
+from pathlib import Path
+
+
+def fake_pandoc(md_path: Path, out_file: Path):
+    text = md_path.read_text()
+    stream = f"BT /F1 10 Tf 72 720 Td ({len(text)} characters) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for idx, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (idx, obj)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    out_file.write_bytes(bytes(pdf))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    fake_pandoc(Path(args[0]), Path(args[args.index("-o") + 1]))
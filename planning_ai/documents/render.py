@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import re
+import shlex
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from pypdf import PdfWriter
+
+# e.g. `PANDOC="python -m planning_ai.documents.fake_pandoc"` to render offline
+PANDOC = os.getenv("PANDOC", "pandoc")
+# local files embedded with `![caption](path)`
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\(([^)\s]+)\)")
+
+
+def write_markdown(out_path: Path, chunks) -> str:
+    """Streams markdown chunks to `out_path`, returning the SHA-256 of the content.
+
+    The digest also covers the bytes of every image file the markdown embeds, so
+    a figure that is redrawn under the same path still triggers a new render.
+
+    Args:
+        out_path (Path): Markdown file to write.
+        chunks (Iterable[str]): Pieces of the document, written in order.
+
+    Returns:
+        str: Hex digest of the written content and its images, used to skip
+        unchanged renders.
+    """
+    sha = hashlib.sha256()
+    images = []
+    with open(out_path, "w") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            sha.update(chunk.encode())
+            images.extend(IMAGE_PATTERN.findall(chunk))
+    for image in images:
+        path = Path(image)
+        if path.is_file():
+            sha.update(hashlib.sha256(path.read_bytes()).digest())
+    return sha.hexdigest()
+
+
+def _digest_path(out_file: Path) -> Path:
+    return out_file.with_suffix(out_file.suffix + ".sha256")
+
+
+def render_markdown(md_path: Path, out_file: Path, digest: str) -> bool:
+    """Runs pandoc unless `out_file` was already rendered from identical markdown
+    and figures.
+
+    Returns:
+        bool: Whether pandoc was run.
+    """
+    digest_path = _digest_path(out_file)
+    if out_file.exists() and digest_path.exists() and digest_path.read_text() == digest:
+        logging.info(f"Skipping render of unchanged {md_path.name}")
+        return False
+
+    command = [*shlex.split(PANDOC), f"{md_path}", "-o", f"{out_file}"]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error during {md_path.name} render: {e}: {e.stderr}")
+        return True
+    digest_path.write_text(digest)
+    return True
+
+
+class RenderQueue:
+    """Runs pandoc renders in the background, at most `max_workers` at a time.
+
+    Report building submits each markdown file as soon as it is written, so pandoc
+    for one representations document overlaps with the next document's graph run.
+    Use as a context manager; leaving it waits for every queued render.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+        self.futures: list[Future] = []
+
+    def submit(self, md_path: Path, out_file: Path, digest: str) -> Future:
+        future = self.executor.submit(render_markdown, md_path, out_file, digest)
+        self.futures.append(future)
+        return future
+
+    def submit_after(self, futures: list, fn, *args) -> Future:
+        """Runs `fn(*args)` once every future in `futures` has finished.
+
+        The waiting task is queued behind `futures`, so it never holds a worker
+        that one of them still needs.
+        """
+
+        def wait_then_run():
+            for future in futures:
+                future.result()
+            return fn(*args)
+
+        future = self.executor.submit(wait_then_run)
+        self.futures.append(future)
+        return future
+
+    def join(self):
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.join()
+        self.executor.shutdown()
+
+
+def merge_pdfs(paths: list[Path], out_file: Path):
+    """Concatenates the PDFs in `paths`, in order, into `out_file`."""
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(str(path))
+    with open(out_file, "wb") as f:
+        writer.write(f)
+
+
+def render(md_path: Path, out_file: Path, digest: str, queue=None):
+    """Queues a render on `queue` if given, otherwise renders immediately."""
+    if queue is not None:
+        return queue.submit(md_path, out_file, digest)
+    return render_markdown(md_path, out_file, digest)
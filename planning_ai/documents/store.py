@@ -0,0 +1,131 @@
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+from langchain_core.documents import Document
+
+SCHEMA = pa.schema([("filename", pa.string()), ("text", pa.large_string())])
+BATCH_SIZE = 1024
+
+
+class DocumentStore:
+    """Read-only document text in a memory-mapped Arrow IPC file.
+
+    `build` writes `filename` and `text` columns once per run; opening the store
+    maps the file without reading it, so a text is only paged in when it is
+    accessed by `filename`. Texts replaced with `put` (PII-redacted text, for
+    example) are appended to an `.overlay` file next to the store and read back
+    from disk, so they are not held in memory either.
+
+    Opening a store clears its overlay, so only one `DocumentStore` per path may
+    be open at a time; `read_docs` builds a separate store for each
+    representations document.
+
+    Args:
+        path (Path): The Arrow IPC file written by `build`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.table = pa.ipc.open_file(pa.memory_map(str(self.path))).read_all()
+        self.texts = self.table.column("text")
+        self.rows = {
+            filename: row
+            for row, filename in enumerate(self.table.column("filename").to_pylist())
+        }
+        self.overlay_path = self.path.with_suffix(".overlay")
+        self.overlay_path.write_bytes(b"")
+        self.overlay = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, path: Path, documents, batch_size: int = BATCH_SIZE):
+        """Writes `(filename, text)` pairs to `path` and opens the store.
+
+        Args:
+            path (Path): Destination Arrow IPC file; parent directories are created.
+            documents (Iterable[tuple]): `(filename, text)` pairs, which may be a
+                generator so the corpus is never held in memory at once.
+            batch_size (int): Number of documents per record batch.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                batch = []
+                for filename, text in documents:
+                    batch.append((str(filename), text))
+                    if len(batch) == batch_size:
+                        writer.write_batch(_record_batch(batch))
+                        batch = []
+                if batch:
+                    writer.write_batch(_record_batch(batch))
+        # hand the write buffers back to the OS rather than keeping them pooled
+        pa.default_memory_pool().release_unused()
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def text(self, filename) -> str:
+        key = str(filename)
+        if key in self.overlay:
+            offset, length = self.overlay[key]
+            with open(self.overlay_path, "rb") as f:
+                f.seek(offset)
+                return f.read(length).decode()
+        return self.texts[self.rows[key]].as_py()
+
+    def put(self, filename, text: str):
+        data = text.encode()
+        with self.lock, open(self.overlay_path, "ab") as f:
+            self.overlay[str(filename)] = (f.tell(), len(data))
+            f.write(data)
+
+    def document(self, filename, metadata: dict | None = None) -> "StoredDocument":
+        return StoredDocument(self, filename, metadata or {})
+
+
+def _record_batch(batch: list[tuple]) -> pa.RecordBatch:
+    filenames, texts = zip(*batch)
+    return pa.record_batch(
+        [pa.array(filenames, pa.string()), pa.array(texts, pa.large_string())],
+        schema=SCHEMA,
+    )
+
+
+class StoredDocument:
+    """Stand-in for a LangChain `Document` whose text lives in a `DocumentStore`.
+
+    Only the filename and metadata are kept on the object, so copying document
+    states between nodes never copies the text. `page_content` reads the text
+    on access, and assigning it writes the new text to the store's overlay.
+    """
+
+    __slots__ = ("store", "filename", "metadata")
+
+    def __init__(self, store: DocumentStore, filename, metadata: dict):
+        self.store = store
+        self.filename = filename
+        self.metadata = metadata
+
+    @property
+    def page_content(self) -> str:
+        return self.store.text(self.filename)
+
+    @page_content.setter
+    def page_content(self, text: str):
+        self.store.put(self.filename, text)
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.page_content, metadata=self.metadata)
+
+    def model_dump(self) -> dict:
+        return self.to_document().model_dump()
+
+    def __str__(self) -> str:
+        # matches `Document`, which the prompts format directly
+        return str(self.to_document())
+
+    def __repr__(self) -> str:
+        return f"StoredDocument(filename={self.filename!r})"
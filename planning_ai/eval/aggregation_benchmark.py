@@ -0,0 +1,66 @@
+"""Times the report aggregation pass on a synthetic consultation.
+
+Run with `python -m planning_ai.eval.aggregation_benchmark` once the geography
+store has been built.
+"""
+
+import time
+
+import numpy as np
+import polars as pl
+
+from planning_ai.documents.aggregates import compute_aggregates
+from planning_ai.preprocessing.geography import load_geography
+from planning_ai.themes import THEMES_AND_POLICIES
+
+N_DOCS = [1_000, 10_000, 100_000]
+
+
+def synthetic_table(n_docs: int, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    postcodes = load_geography()["postcodes"]["PCD"].to_numpy()
+    themes = np.array(list(THEMES_AND_POLICIES))
+    return pl.DataFrame(
+        {
+            "doc_id": np.arange(n_docs),
+            "stance": rng.choice(["Support", "Object", "Comment", ""], n_docs),
+            "postcode": rng.choice(postcodes, n_docs),
+            "themes": [
+                list(rng.choice(themes, rng.integers(1, 4), replace=False))
+                for _ in range(n_docs)
+            ],
+        }
+    )
+
+
+def synthetic_policies() -> pl.DataFrame:
+    return pl.DataFrame(
+        [
+            {
+                "themes": theme,
+                "policies": policy,
+                "stance": stance,
+                "detail": ["A point raised."],
+                "doc_id": [[0]],
+            }
+            for theme, policies in THEMES_AND_POLICIES.items()
+            for policy in policies
+            for stance in ["Support", "Object"]
+        ]
+    )
+
+
+def main():
+    load_geography()
+    results = []
+    for n_docs in N_DOCS:
+        table = synthetic_table(n_docs)
+        policies = synthetic_policies()
+        tic = time.perf_counter()
+        compute_aggregates(table, policies)
+        results.append({"documents": n_docs, "seconds": time.perf_counter() - tic})
+    print(pl.DataFrame(results).to_pandas().to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
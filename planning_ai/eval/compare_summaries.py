@@ -1,10 +1,24 @@
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+
 import polars as pl
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field
 
 from planning_ai.common.utils import Paths
-from planning_ai.llms.llm import GPT4o
+from planning_ai.logging import logger
+from planning_ai.preprocessing.gcpt3 import scan_gcpt3
+
+CHECKPOINT_DIR = Paths.OUT / "eval"
+MAX_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", 16))
+BATCH_SIZE = 64
+# simulated per-call latency of the fake chains, in seconds
+FAKE_LATENCY = 0.05
 
 
 class SummaryEvaluator(BaseModel):
@@ -20,6 +34,8 @@ def load_templates():
 
 
 def initialize_chains(compare_template, summary_template):
+    from planning_ai.llms.llm import GPT4o
+
     SLLM = GPT4o.with_structured_output(SummaryEvaluator, strict=True)
     compare_prompt = ChatPromptTemplate([("system", compare_template)])
     compare_chain = compare_prompt | SLLM
@@ -30,44 +46,205 @@ def initialize_chains(compare_template, summary_template):
     return compare_chain, summary_chain
 
 
-def process_summaries(compare_chain, summary_chain):
-    original = pl.read_parquet(Paths.STAGING / "gcpt3.parquet").filter(
-        pl.col("attachments_id").is_null()
+def fake_chains(latency: float = FAKE_LATENCY):
+    """Deterministic stand-ins for the eval chains, for running offline.
+
+    The summary is the first 30 words of the document and the comparison prefers
+    the longer summary. Each call sleeps for `latency` seconds to mimic an API.
+    """
+
+    def summarise(inputs):
+        time.sleep(latency)
+        return " ".join(inputs["content"].split()[:30])
+
+    def compare(inputs):
+        time.sleep(latency)
+        longer = len(inputs["summary_1"]) >= len(inputs["summary_2"])
+        return SummaryEvaluator(score=1 if longer else 2)
+
+    return RunnableLambda(compare), RunnableLambda(summarise)
+
+
+def _key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def config_key(model: str, template: str = "") -> str:
+    """Identifies a chain's model and prompt, so checkpoints from another
+    configuration are not reused."""
+    return _key(model, template)
+
+
+def run_stage(
+    chain,
+    inputs: pl.DataFrame,
+    column: str,
+    dtype: pl.DataType,
+    stage_dir: Path,
+    parse=lambda output: output,
+    max_concurrency: int = MAX_CONCURRENCY,
+    batch_size: int = BATCH_SIZE,
+) -> pl.DataFrame:
+    """Runs `chain` over every row of `inputs`, checkpointing each batch.
+
+    Rows whose `key` already has a result in `stage_dir` are skipped, so an
+    interrupted run resumes where it stopped. Each batch is sent with
+    `chain.batch`, running at most `max_concurrency` calls at once, and written
+    to its own parquet file as soon as it completes. Transient errors are retried
+    by a `RetryPolicy` whose budget scales with the pending rows. Calls that still
+    fail are logged and left out of the checkpoint so they are retried on the
+    next run.
+
+    Args:
+        chain (Runnable): Chain invoked with each row, minus `key`, as input.
+        inputs (pl.DataFrame): Chain inputs with a unique `key` column.
+        column (str): Name of the output column.
+        dtype (pl.DataType): Type of the output column.
+        stage_dir (Path): Directory holding this stage's checkpoint files.
+        parse (Callable): Maps a chain output to the stored value.
+        max_concurrency (int): Maximum number of calls in flight.
+        batch_size (int): Rows per checkpointed batch.
+
+    Returns:
+        pl.DataFrame: `key` and `column` for every row that succeeded.
+    """
+    # imported here like `GPT4o`: it builds the OpenAI clients, which need a key
+    from planning_ai.llms.retry import RetryPolicy, with_retry_policy
+
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    schema = {"key": pl.String, column: dtype}
+    done = pl.concat(
+        [pl.DataFrame(schema=schema)]
+        + [pl.read_parquet(path) for path in sorted(stage_dir.glob("*.parquet"))]
     )
-    summaries1 = original[["text", "representations_summary"]].unique()
-
-    summaries2 = summaries1[["text"]]
-    summaries2 = summaries2.with_columns(
-        pl.col("text")
-        .map_elements(
-            lambda x: summary_chain.invoke({"content": x}), return_dtype=pl.String
+    pending = inputs.join(done, on="key", how="anti")
+    logger.info(f"{stage_dir.name}: {len(done)} checkpointed, {len(pending)} pending")
+
+    policy = RetryPolicy()
+    policy.reset(len(pending))
+    retrying_chain = with_retry_policy(chain, policy)
+    failed = 0
+    for batch in pending.iter_slices(batch_size):
+        rows = batch.to_dicts()
+        outputs = retrying_chain.batch(
+            [{k: v for k, v in row.items() if k != "key"} for row in rows],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
         )
-        .alias("summary")
+        results = []
+        for row, output in zip(rows, outputs):
+            if isinstance(output, Exception):
+                failed += 1
+                logger.warning(f"{stage_dir.name}: {row['key'][:12]} failed: {output}")
+                continue
+            results.append({"key": row["key"], column: parse(output)})
+        if results:
+            out = pl.DataFrame(results, schema=schema)
+            out.write_parquet(stage_dir / f"{time.time_ns()}.parquet")
+            done = pl.concat([done, out])
+    if failed:
+        logger.warning(f"{stage_dir.name}: {failed} rows failed; rerun to retry")
+    return done
+
+
+def load_original() -> pl.DataFrame:
+    return (
+        scan_gcpt3()
+        .filter(pl.col("attachments_id").is_null())
+        .select("text", "representations_summary")
+        .unique()
+        .collect()
     )
 
-    summaries = summaries1.join(summaries2, on="text")
+
+def process_summaries(
+    compare_chain,
+    summary_chain,
+    summaries1: pl.DataFrame | None = None,
+    checkpoint_dir: Path = CHECKPOINT_DIR,
+    max_concurrency: int = MAX_CONCURRENCY,
+    batch_size: int = BATCH_SIZE,
+    *,
+    summary_config: str,
+    compare_config: str,
+):
+    """Summarises each text with `summary_chain` and scores it with `compare_chain`.
+
+    Checkpoint keys include `summary_config` and `compare_config` (see
+    `config_key`), so changing either model or prompt reruns that stage instead
+    of reusing results from the old configuration.
+    """
+    if summaries1 is None:
+        summaries1 = load_original()
+    options = {"max_concurrency": max_concurrency, "batch_size": batch_size}
+
+    texts = summaries1[["text"]].unique()
+    texts = texts.with_columns(
+        pl.Series("key", [_key(summary_config, text) for text in texts["text"]])
+    )
+    summaries2 = run_stage(
+        summary_chain,
+        texts.select("key", pl.col("text").alias("content")),
+        "summary",
+        pl.String,
+        checkpoint_dir / "summary",
+        **options,
+    )
+    summaries = summaries1.join(texts.join(summaries2, on="key").drop("key"), on="text")
+
     summaries = summaries.with_columns(
-        pl.struct(["text", "representations_summary", "summary"])
-        .map_elements(
-            lambda x: compare_chain.invoke(
-                {
-                    "document": x["text"],
-                    "summary_1": x["representations_summary"],
-                    "summary_2": x["summary"],
-                }
-            ).score,
-            return_dtype=pl.Int8,
+        pl.Series(
+            "key",
+            [
+                _key(compare_config, *row)
+                for row in summaries[
+                    ["text", "representations_summary", "summary"]
+                ].iter_rows()
+            ],
+            dtype=pl.String,
         )
-        .alias("score")
     )
-    return summaries
+    scores = run_stage(
+        compare_chain,
+        summaries.select(
+            "key",
+            pl.col("text").alias("document"),
+            pl.col("representations_summary").alias("summary_1"),
+            pl.col("summary").alias("summary_2"),
+        ),
+        "score",
+        pl.Int8,
+        checkpoint_dir / "score",
+        parse=lambda output: output.score,
+        **options,
+    )
+    return summaries.join(scores, on="key").drop("key")
 
 
 def main():
-    compare_template, summary_template = load_templates()
-    compare_chain, summary_chain = initialize_chains(compare_template, summary_template)
-    summaries = process_summaries(compare_chain, summary_chain)
-    summaries.write_parquet(Paths.OUT / "eval.parquet")
+    if "--fake" in sys.argv:
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        compare_chain, summary_chain = fake_chains()
+        summary_config = compare_config = config_key("fake")
+        checkpoint_dir, out_file = CHECKPOINT_DIR / "fake", "eval_fake.parquet"
+    else:
+        from planning_ai.llms.llm import GPT4o
+
+        compare_template, summary_template = load_templates()
+        compare_chain, summary_chain = initialize_chains(
+            compare_template, summary_template
+        )
+        summary_config = config_key(GPT4o.model_name, summary_template)
+        compare_config = config_key(GPT4o.model_name, compare_template)
+        checkpoint_dir, out_file = CHECKPOINT_DIR, "eval.parquet"
+    summaries = process_summaries(
+        compare_chain,
+        summary_chain,
+        checkpoint_dir=checkpoint_dir,
+        summary_config=summary_config,
+        compare_config=compare_config,
+    )
+    summaries.write_parquet(Paths.OUT / out_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""Measures how much deduplicating policy notes shrinks `policy_chain` prompts.
+
+Run with `python -m planning_ai.eval.dedup_benchmark`. No API calls are made.
+Each synthetic (theme, policy, stance) group draws its notes from `N_POINTS`
+distinct points, written with the small wording changes summaries tend to
+make. Notes are embedded with the local `hashing` backend unless
+`EMBEDDINGS_BACKEND` is set.
+"""
+
+import hashlib
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("EMBEDDINGS_BACKEND", "hashing")
+
+import polars as pl
+
+from planning_ai.llms.router import estimate_tokens
+from planning_ai.policies import dedupe_notes, format_notes
+
+GROUP_SIZES = [100, 1_000, 5_000]
+N_POINTS = 40
+OPENINGS = [
+    "The response emphasizes",
+    "The response stresses",
+    "the response emphasizes",
+    "The response highlights",
+]
+SUBJECTS = [
+    "protecting the Cambridge Green Belt",
+    "new cycle routes into the city centre",
+    "affordable homes for key workers",
+    "flood risk on the river corridors",
+    "more school places in new settlements",
+]
+CONCERNS = [
+    "from further development around the villages",
+    "before any new housing is approved",
+    "given the pressure on water supply",
+    "as traffic on local roads keeps growing",
+    "to keep the character of the area",
+    "for families who already live nearby",
+    "in line with the net zero commitments",
+    "across the whole of the plan period",
+]
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 1_000
+
+
+def synthetic_notes(n_notes: int) -> list[dict]:
+    notes = []
+    for idx in range(n_notes):
+        point = _bucket(n_notes, idx) % N_POINTS
+        subject = SUBJECTS[point % len(SUBJECTS)]
+        concern = CONCERNS[point // len(SUBJECTS) % len(CONCERNS)]
+        opening = OPENINGS[_bucket(idx) % len(OPENINGS)]
+        stop = "." if _bucket(idx, "stop") % 2 else ""
+        notes.append(
+            {
+                "detail": f"{opening} the need for {subject} {concern}{stop}",
+                "doc_id": [idx],
+            }
+        )
+    return notes
+
+
+def _tokens(notes: list[dict]) -> int:
+    return sum(estimate_tokens(detail) for detail in format_notes(notes))
+
+
+def benchmark(n_notes: int) -> dict:
+    notes = synthetic_notes(n_notes)
+    tic = time.perf_counter()
+    deduped = dedupe_notes(notes)
+    toc = time.perf_counter()
+    cited = {id for note in deduped for id in note["doc_id"]}
+    return {
+        "notes": len(notes),
+        "deduped_notes": len(deduped),
+        "input_tokens": _tokens(notes),
+        "deduped_tokens": _tokens(deduped),
+        "doc_ids_kept": len(cited) / len(notes),
+        "dedupe_s": toc - tic,
+    }
+
+
+def main():
+    results = pl.DataFrame([benchmark(n) for n in GROUP_SIZES])
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".3f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Reports the prompt size of each reduce call, before and after lean encoding.
+
+Run with `python -m planning_ai.eval.encoding_benchmark`. No API calls are made.
+The legacy columns rebuild the previous prompts: every summary carried the
+`Document ID: [id]` prefix from `add_doc_id` plus a second `Document ID: [[id]]`
+header, and each batch was passed to the prompt as a Python list repr, which
+quotes every summary and escapes its newlines. Tokens are counted on the full
+formatted prompt, system message included, as words plus punctuation marks,
+since BPE tokenisers split brackets, quotes and escapes into tokens of their own
+that a word count misses.
+"""
+
+import hashlib
+import os
+import re
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.chains.reduce_chain import (
+    encode_summaries,
+    join_reports,
+    reduce_prompt,
+    reduce_prompt_final,
+)
+from planning_ai.nodes.reduce_node import REDUCE_BATCH_SIZE
+
+N_DOCS = 1_000
+STANCES = ["Support", "Object", "Comment"]
+SENTENCES = [
+    "The respondent is concerned about the scale of new housing on the edge of the village.",
+    "They argue that local roads cannot absorb the additional traffic.",
+    "The response asks for a new primary school before homes are occupied.",
+    "They support more affordable homes for key workers in the area.",
+    "The representation highlights flooding on the lower fields after heavy rain.",
+    "They want the green belt around the city protected from further development.",
+]
+# intermediate reports are the same for both encodings, so a fixed length is used
+REPORT_WORDS = 400
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 1_000
+
+
+def fixture_summaries(n_docs: int = N_DOCS) -> list[dict]:
+    docs = []
+    for idx in range(n_docs):
+        sentences = [
+            SENTENCES[_bucket(idx, n) % len(SENTENCES)]
+            for n in range(2 + _bucket(idx) % 3)
+        ]
+        stance = STANCES[_bucket(idx, "stance") % len(STANCES)]
+        docs.append(
+            {
+                "doc_id": idx,
+                "document": Document(
+                    page_content="",
+                    metadata={"representations_support/object": stance},
+                ),
+                "summary": SimpleNamespace(summary="\n\n".join(sentences)),
+            }
+        )
+    return docs
+
+
+def legacy_context(batch: list[dict]) -> list[str]:
+    return [
+        f"Document ID: {[doc['doc_id']]}\n\n"
+        f"Document ID: [{doc['doc_id']}]\n\n{doc['summary'].summary}"
+        for doc in batch
+    ]
+
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def _prompt_tokens(prompt, context) -> int:
+    messages = prompt.format_messages(context=context)
+    return sum(len(TOKEN_PATTERN.findall(message.content)) for message in messages)
+
+
+def main():
+    docs = fixture_summaries()
+    batches = [
+        docs[i : i + REDUCE_BATCH_SIZE] for i in range(0, len(docs), REDUCE_BATCH_SIZE)
+    ]
+    rows = [
+        {
+            "call": f"reduce {i}",
+            "legacy_tokens": _prompt_tokens(reduce_prompt, legacy_context(batch)),
+            "lean_tokens": _prompt_tokens(reduce_prompt, encode_summaries(batch)),
+        }
+        for i, batch in enumerate(batches, start=1)
+    ]
+    reports = [" ".join(["word"] * REPORT_WORDS)] * len(batches)
+    rows.append(
+        {
+            "call": "reduce final",
+            "legacy_tokens": _prompt_tokens(
+                reduce_prompt_final, "Executive Report:\n\n".join(reports)
+            ),
+            "lean_tokens": _prompt_tokens(reduce_prompt_final, join_reports(reports)),
+        }
+    )
+    report = pl.DataFrame(rows)
+    report = pl.concat(
+        [
+            report,
+            report.select(pl.lit("total").alias("call"), pl.exclude("call").sum()),
+        ]
+    ).with_columns(
+        saved=1 - pl.col("lean_tokens") / pl.col("legacy_tokens"),
+    )
+    print(report.to_pandas().to_markdown(index=False, floatfmt=".1%"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Times the summary evaluation harness offline using the fake chains.
+
+Run with `python -m planning_ai.eval.eval_benchmark`. No API calls are made. The
+serial run sends one call at a time, like the original `map_elements` loop; the
+resumed run repeats the concurrent run against its own checkpoints.
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+
+from planning_ai.eval.compare_summaries import (
+    MAX_CONCURRENCY,
+    config_key,
+    fake_chains,
+    process_summaries,
+)
+
+N_DOCS = 200
+
+
+def synthetic_summaries(n_docs: int = N_DOCS) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "text": [
+                f"response {idx} " + "word " * (idx % 80) for idx in range(n_docs)
+            ],
+            "representations_summary": [f"summary {idx}" for idx in range(n_docs)],
+        }
+    )
+
+
+def timed(name: str, checkpoint_dir: Path, max_concurrency: int) -> dict:
+    compare_chain, summary_chain = fake_chains()
+    tic = time.perf_counter()
+    out = process_summaries(
+        compare_chain,
+        summary_chain,
+        synthetic_summaries(),
+        checkpoint_dir=checkpoint_dir,
+        max_concurrency=max_concurrency,
+        summary_config=config_key("fake"),
+        compare_config=config_key("fake"),
+    )
+    return {
+        "run": name,
+        "concurrency": max_concurrency,
+        "rows": len(out),
+        "seconds": time.perf_counter() - tic,
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            timed("serial", Path(tmp) / "serial", 1),
+            timed("concurrent", Path(tmp) / "concurrent", MAX_CONCURRENCY),
+            timed("resumed", Path(tmp) / "concurrent", MAX_CONCURRENCY),
+        ]
+    print(pl.DataFrame(results).to_pandas().to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
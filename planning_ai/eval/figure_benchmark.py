@@ -0,0 +1,39 @@
+"""Times report figure rendering with LaTeX and mathtext text.
+
+Run with `python -m planning_ai.eval.figure_benchmark` once the geography store has
+been built. Each mode is timed cold (empty output directory) and warm (inputs
+unchanged, so every figure is skipped).
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from planning_ai.documents.aggregates import compute_aggregates
+from planning_ai.documents.document import render_figures
+from planning_ai.eval.aggregation_benchmark import (
+    synthetic_policies,
+    synthetic_table,
+)
+
+N_RESPONSES = 5_000
+
+
+def main():
+    aggregates = compute_aggregates(synthetic_table(N_RESPONSES), synthetic_policies())
+    results = []
+    for mode in ["latex", "mathtext"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in ["cold", "warm"]:
+                tic = time.perf_counter()
+                render_figures(aggregates, Path(tmp), mode=mode)
+                results.append(
+                    {"mode": mode, "run": run, "seconds": time.perf_counter() - tic}
+                )
+    print(pl.DataFrame(results).to_pandas().to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
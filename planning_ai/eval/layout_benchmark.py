@@ -0,0 +1,137 @@
+"""Compares loading OCR output from searchable PDFs and from stored layouts.
+
+Run with `python -m planning_ai.eval.layout_benchmark`. No Azure calls are made.
+`N_PDFS` synthetic PDFs of `PAGES` pages are rendered with matplotlib. The
+layouts are built with `layout_from_azure` from a stand-in `AnalyzeResult`
+holding the known paragraphs, as Azure would return them. The previous path
+re-extracts text from the PDFs with `PyPDFDirectoryLoader`. `word_recall` is
+the share of each page's words, in order, that the loaded text recovers, and
+`paragraphs_per_page` counts the blank-line separated blocks kept for chunking
+(each page has `PARAGRAPHS`).
+"""
+
+import difflib
+import hashlib
+import shutil
+import time
+from types import SimpleNamespace
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+from langchain_community.document_loaders import PyPDFDirectoryLoader
+from matplotlib.backends.backend_pdf import PdfPages
+
+from planning_ai.common.utils import Paths
+from planning_ai.preprocessing.layout import (
+    layout_from_azure,
+    layout_path,
+    load_layouts,
+    write_layout,
+)
+
+N_PDFS = 40
+PAGES = 5
+PARAGRAPHS = 4
+BENCH_DIR = Paths.OUT / "layout_benchmark"
+WORDS = (
+    "the council should protect the green belt and improve bus routes before "
+    "new homes are built on land north of the village where flooding is common"
+).split()
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 1_000
+
+
+def paragraphs(pdf: int, page: int) -> list[str]:
+    return [
+        " ".join(WORDS[_bucket(pdf, page, p, n) % len(WORDS)] for n in range(12))
+        for p in range(PARAGRAPHS)
+    ]
+
+
+def render_pdfs():
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    (BENCH_DIR / "pdfs").mkdir(parents=True)
+    for pdf in range(N_PDFS):
+        with PdfPages(BENCH_DIR / "pdfs" / f"{pdf}.pdf") as pages:
+            for page in range(PAGES):
+                fig = plt.figure(figsize=(8.27, 11.69))
+                for p, text in enumerate(paragraphs(pdf, page)):
+                    fig.text(0.05, 0.9 - 0.1 * p, text, fontsize=9)
+                pages.savefig(fig)
+                plt.close(fig)
+
+
+def fake_analyze_result(pdf: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        paragraphs=[
+            SimpleNamespace(
+                content=text,
+                role=None,
+                bounding_regions=[SimpleNamespace(page_number=page + 1)],
+            )
+            for page in range(PAGES)
+            for text in paragraphs(pdf, page)
+        ],
+        pages=[],
+    )
+
+
+def word_recall(docs) -> float:
+    scores = []
+    for doc in docs:
+        pdf = int(doc.metadata["source"].rsplit("/", 1)[-1].removesuffix(".pdf"))
+        expected = " ".join(paragraphs(pdf, doc.metadata["page"])).split()
+        matcher = difflib.SequenceMatcher(None, expected, doc.page_content.split())
+        scores.append(
+            sum(b.size for b in matcher.get_matching_blocks()) / len(expected)
+        )
+    return float(np.mean(scores))
+
+
+def main():
+    render_pdfs()
+    for pdf in range(N_PDFS):
+        write_layout(
+            layout_from_azure(fake_analyze_result(pdf)),
+            layout_path(BENCH_DIR / "pdfs" / f"{pdf}.pdf", BENCH_DIR / "layouts"),
+        )
+
+    rows = []
+    tic = time.perf_counter()
+    docs = PyPDFDirectoryLoader(BENCH_DIR / "pdfs", silent_errors=True).load()
+    rows.append(
+        {
+            "source": "searchable pdf",
+            "pages": len(docs),
+            "load_s": time.perf_counter() - tic,
+            "word_recall": word_recall(docs),
+            "paragraphs_per_page": np.mean(
+                [len(doc.page_content.split("\n\n")) for doc in docs]
+            ),
+        }
+    )
+    tic = time.perf_counter()
+    docs = load_layouts(BENCH_DIR / "layouts")
+    rows.append(
+        {
+            "source": "stored layout",
+            "pages": len(docs),
+            "load_s": time.perf_counter() - tic,
+            "word_recall": word_recall(docs),
+            "paragraphs_per_page": np.mean(
+                [len(doc.page_content.split("\n\n")) for doc in docs]
+            ),
+        }
+    )
+    print(pl.DataFrame(rows).to_pandas().to_markdown(index=False, floatfmt=".3f"))
+
+
+if __name__ == "__main__":
+    main()
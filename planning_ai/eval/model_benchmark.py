@@ -0,0 +1,194 @@
+"""Compares summary quality against cost for each model configuration.
+
+Run with `python -m planning_ai.eval.model_benchmark [MODEL ...]`, naming
+configurations from `planning_ai.llms.llm.MODELS` (default: the offline `fake`
+tiers). Each model summarises the fixture corpus through the `compare_summaries`
+harness. The summaries are then judged for hallucination and compared with the
+reference summaries. By default the judges are deterministic word-overlap
+heuristics. Pass `--llm-judge` to use `hallucination_chain` and the GPT-4o-mini
+compare chain instead (requires `OPENAI_API_KEY`).
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import numpy as np
+import polars as pl
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from planning_ai.chains.hallucination_chain import HallucinationChecker
+from planning_ai.common.utils import Paths
+from planning_ai.eval.compare_summaries import (
+    SummaryEvaluator,
+    config_key,
+    initialize_chains,
+    load_templates,
+    process_summaries,
+)
+from planning_ai.eval.theme_prefilter_benchmark import FIXTURES
+from planning_ai.llms.llm import MODELS, estimate_cost, get_llm
+from planning_ai.llms.retry import RetryPolicy, with_retry_policy
+from planning_ai.telemetry import MetricsCallback, metrics
+
+DEFAULT_MODELS = [
+    name for name, config in MODELS.items() if config["backend"] == "fake"
+]
+GROUNDED_SHARE = 0.95
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+REFERENCES = [
+    "Wants net zero carbon homes with heat pumps and solar panels.",
+    "Raises flooding on the site and asks for renewable energy on all buildings.",
+    "Asks for open spaces, river corridors and tree canopy to be protected.",
+    "Objects to the loss of green infrastructure and wildlife habitats.",
+    "Notes a lack of youth facilities and pollution from the new road.",
+    "Wants healthcare and community facilities in new developments.",
+    "Objects to harm to the Green Belt, village character and heritage assets.",
+    "Supports Green Belt protection and high quality design.",
+    "Asks for business space, the rural economy and farmland to be protected.",
+    "Supports affordable workspace, retail centres and visitor attractions.",
+    "Wants affordable family homes and homes for older people.",
+    "Objects to high density, HMOs and build to rent replacing family homes.",
+    "Asks for buses, cycle routes and EV parking before development.",
+    "Asks for digital, energy and freight infrastructure to be planned.",
+]
+
+
+def fixture_corpus() -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "text": [text for _, text in FIXTURES],
+            "representations_summary": REFERENCES,
+        }
+    )
+
+
+def _tokens(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _grounded_share(summary: str, document: str) -> float:
+    tokens = _tokens(summary)
+    source = set(_tokens(document))
+    return sum(token in source for token in tokens) / len(tokens) if tokens else 0.0
+
+
+def _coverage(summary: str, document: str) -> float:
+    source = set(_tokens(document))
+    return len(source & set(_tokens(summary))) / len(source) if source else 0.0
+
+
+def heuristic_judges():
+    """Offline stand-ins for `hallucination_chain` and the compare chain.
+
+    A summary counts as hallucinated if fewer than `GROUNDED_SHARE` of its words
+    appear in the document. The compare judge prefers the summary that covers more
+    of the document's vocabulary, minus its share of ungrounded words. Its
+    `config_key` is returned with the judges, as `llm_judges` does.
+    """
+
+    def check(inputs):
+        share = _grounded_share(inputs["summary"], inputs["document"])
+        return HallucinationChecker(
+            score=int(share >= GROUNDED_SHARE),
+            explanation=f"{share:.0%} of summary words appear in the document",
+        )
+
+    def compare(inputs):
+        scores = [
+            _coverage(inputs[key], inputs["document"])
+            - (1 - _grounded_share(inputs[key], inputs["document"]))
+            for key in ["summary_1", "summary_2"]
+        ]
+        return SummaryEvaluator(score=1 if scores[0] >= scores[1] else 2)
+
+    return RunnableLambda(check), RunnableLambda(compare), config_key("heuristic")
+
+
+def llm_judges():
+    from planning_ai.chains.hallucination_chain import hallucination_chain
+    from planning_ai.llms.llm import GPT4o
+
+    compare_template, summary_template = load_templates()
+    compare_chain, _ = initialize_chains(compare_template, summary_template)
+    return (
+        hallucination_chain,
+        compare_chain,
+        config_key(GPT4o.model_name, compare_template),
+    )
+
+
+def benchmark(
+    name: str, hallucination_judge, compare_judge, compare_config, checkpoint_dir
+) -> dict:
+    _, summary_template = load_templates()
+    summary_chain = (
+        ChatPromptTemplate([("system", summary_template)])
+        | get_llm(name)
+        | StrOutputParser()
+    ).with_config(callbacks=[MetricsCallback()])
+
+    metrics.reset(name)
+    tic = time.perf_counter()
+    summaries = process_summaries(
+        compare_judge,
+        summary_chain,
+        fixture_corpus(),
+        checkpoint_dir=checkpoint_dir,
+        summary_config=config_key(name, summary_template),
+        compare_config=compare_config,
+    )
+    elapsed = time.perf_counter() - tic
+    latencies = np.array(metrics.llm_latencies or [0.0])
+    tokens = dict(metrics.tokens)
+
+    policy = RetryPolicy()
+    policy.reset(len(summaries))
+    checks = with_retry_policy(hallucination_judge, policy).batch(
+        [
+            {"summary": row["summary"], "document": row["text"]}
+            for row in summaries.iter_rows(named=True)
+        ]
+    )
+    return {
+        "model": name,
+        "backend": MODELS[name]["backend"],
+        "docs": len(summaries),
+        "seconds": elapsed,
+        "p50_latency_s": float(np.percentile(latencies, 50)),
+        "p95_latency_s": float(np.percentile(latencies, 95)),
+        "input_tokens": tokens.get("input_tokens", tokens.get("prompt_tokens", 0)),
+        "output_tokens": tokens.get(
+            "output_tokens", tokens.get("completion_tokens", 0)
+        ),
+        "cached_ratio": metrics.cached_ratio(),
+        "cost_usd": estimate_cost(name, tokens),
+        "hallucination_rate": sum(check.score == 0 for check in checks) / len(checks),
+        "win_rate": (summaries["score"] == 2).mean(),
+    }
+
+
+def main():
+    models = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    judges = llm_judges() if "--llm-judge" in sys.argv else heuristic_judges()
+    with tempfile.TemporaryDirectory() as tmp:
+        results = pl.DataFrame(
+            [
+                benchmark(name, *judges, checkpoint_dir=Path(tmp) / name)
+                for name in models or DEFAULT_MODELS
+            ]
+        )
+    results.write_parquet(Paths.OUT / "model_benchmark.parquet")
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".3f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Measures page-range OCR of a PDF over Azure's upload limit.
+
+Run with `python -m planning_ai.eval.ocr_benchmark`. No Azure calls are made;
+`analyze_part` is replaced by a fake whose latency grows with the pages sent
+and which returns one paragraph per page. The synthetic PDF mixes pages with a
+text layer and scanned pages (noise images without text). Before this change a
+PDF over 1 MB was skipped, so none of its pages reached the report.
+"""
+
+import shutil
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+from pypdf import PdfReader, PdfWriter
+
+from planning_ai.common.utils import Paths
+from planning_ai.preprocessing import azure_doc
+
+N_PAGES = 60
+SCANNED_EVERY = 3
+BENCH_DIR = Paths.OUT / "ocr_benchmark"
+PDF_PATH = BENCH_DIR / "large.pdf"
+# fake call latency: a fixed overhead plus a cost per page
+BASE_LATENCY = 0.5
+PAGE_LATENCY = 0.1
+TEXT = (
+    "The parish council objects to the allocation of land north of the village "
+    "because the access road floods every winter and the school is full. "
+) * 4
+
+
+def render_pdf():
+    """Renders each page on its own and merges them, so pages keep their own
+    resources as scanned PDFs do (matplotlib shares one resource dictionary
+    across the pages of a multi-page PDF)."""
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    BENCH_DIR.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    writer = PdfWriter()
+    for page in range(N_PAGES):
+        fig = plt.figure(figsize=(8.27, 11.69))
+        if page % SCANNED_EVERY:
+            for line in range(0, len(TEXT), 90):
+                fig.text(0.05, 0.9 - line / 2000, TEXT[line : line + 90])
+        else:
+            fig.figimage(rng.integers(0, 255, (400, 300), dtype=np.uint8))
+        buffer = BytesIO()
+        fig.savefig(buffer, format="pdf")
+        plt.close(fig)
+        writer.add_page(PdfReader(buffer).pages[0])
+    with open(PDF_PATH, "wb") as f:
+        writer.write(f)
+
+
+def fake_analyze_part(data: bytes):
+    n_pages = len(PdfReader(BytesIO(data)).pages)
+    time.sleep(BASE_LATENCY + PAGE_LATENCY * n_pages)
+    return SimpleNamespace(
+        paragraphs=[
+            SimpleNamespace(
+                content=f"ocr text of page {page + 1}",
+                role=None,
+                bounding_regions=[SimpleNamespace(page_number=page + 1)],
+            )
+            for page in range(n_pages)
+        ],
+        pages=[],
+    )
+
+
+def benchmark(name: str, min_page_chars: int, workers: int) -> dict:
+    azure_doc.MIN_PAGE_CHARS = min_page_chars
+    azure_doc.OCR_WORKERS = workers
+    calls = []
+    azure_doc.analyze_part = lambda data: calls.append(data) or fake_analyze_part(data)
+    out_layout = BENCH_DIR / f"{name}.parquet"
+    tic = time.perf_counter()
+    azure_doc.analyze_document_with_azure(
+        PdfReader(PDF_PATH), out_layout, BENCH_DIR / f"{name}.txt"
+    )
+    wall = time.perf_counter() - tic
+    layout = pl.read_parquet(out_layout)
+    return {
+        "mode": name,
+        "ocr_calls": len(calls),
+        "ocr_pages": sum(len(PdfReader(BytesIO(data)).pages) for data in calls),
+        "largest_part_mb": max((len(data) for data in calls), default=0) / 1024**2,
+        "pages_recovered": layout["page"].n_unique(),
+        "in_page_order": layout["page"].is_sorted(),
+        "wall_s": wall,
+    }
+
+
+def main():
+    render_pdf()
+    size_mb = PDF_PATH.stat().st_size / 1024**2
+    print(f"{N_PAGES} pages, {size_mb:.1f} MB; skipped entirely before this change")
+    min_page_chars, workers = azure_doc.MIN_PAGE_CHARS, azure_doc.OCR_WORKERS
+    results = pl.DataFrame(
+        [
+            benchmark("ocr all pages, serial", 10**9, 1),
+            benchmark("ocr all pages, parallel", 10**9, workers),
+            benchmark("density-selected, parallel", min_page_chars, workers),
+        ]
+    )
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".2f"))
+
+
+if __name__ == "__main__":
+    main()
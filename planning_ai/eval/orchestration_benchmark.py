@@ -0,0 +1,141 @@
+"""Measures the graph's per-wave orchestration cost as the corpus grows.
+
+Run with `python -m planning_ai.eval.orchestration_benchmark`. No chains are
+called. Each wave dispatches the pending documents (`map_check`), merges one
+fake check result per document into the state as LangGraph does, one write at a
+time through the `documents` reducer, and then checks for completion
+(`generate_final_report`). A `HALLUCINATION_RATE` share of documents stays
+pending after each wave.
+
+The legacy columns copy the previous reducer and completion check, which
+rescanned the whole list on every write and every wave. That is quadratic per
+wave, so they are only run up to `LEGACY_MAX_DOCS`.
+"""
+
+import hashlib
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+
+from planning_ai.common.utils import filename_reducer
+from planning_ai.nodes import hallucination_node, reduce_node
+
+SIZES = [1_000, 5_000, 50_000]
+LEGACY_MAX_DOCS = 5_000
+WAVES = 3
+HALLUCINATION_RATE = 30
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 100
+
+
+def legacy_reducer(docs_a, docs_b):
+    if docs_a == []:
+        return docs_b
+    b_dict = {d["filename"]: d for d in docs_b}
+
+    for i, dict_a in enumerate(docs_a):
+        filename = dict_a.get("filename")
+        if filename in b_dict:
+            docs_a[i] = b_dict[filename]
+    return docs_a
+
+
+def legacy_map_check(state):
+    pending = [doc for doc in state["documents"] if not doc["processed"]]
+    if not pending:
+        return "generate_final_report"
+    return pending
+
+
+def legacy_final_report(state):
+    final_docs = [doc for doc in state["documents"] if doc["processed"]]
+    return len(final_docs) == state["n_docs"]
+
+
+def tracked_map_check(state):
+    sends = hallucination_node.map_check(state)
+    if sends == "generate_final_report":
+        return sends
+    return [send.arg for send in sends]
+
+
+def tracked_final_report(state):
+    return reduce_node.generate_final_report(state) is not None
+
+
+def make_documents(n_docs: int) -> list[dict]:
+    return [
+        {"filename": idx, "processed": False, "is_hallucinated": True}
+        for idx in range(n_docs)
+    ]
+
+
+def run_waves(n_docs: int, reducer, map_check, final_report) -> dict:
+    state = {"documents": reducer([], make_documents(n_docs)), "n_docs": n_docs}
+    timings = {"dispatch": 0.0, "merge": 0.0, "complete": 0.0}
+    dispatched = 0
+    for wave in range(WAVES):
+        tic = time.perf_counter()
+        pending = map_check(state)
+        timings["dispatch"] += time.perf_counter() - tic
+        if pending == "generate_final_report":
+            break
+        dispatched += len(pending)
+
+        last = wave == WAVES - 1
+        results = [
+            {
+                **doc,
+                "processed": last
+                or _bucket(doc["filename"], wave) >= HALLUCINATION_RATE,
+            }
+            for doc in pending
+        ]
+        tic = time.perf_counter()
+        for result in results:
+            state["documents"] = reducer(state["documents"], [result])
+        timings["merge"] += time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        final_report(state)
+        timings["complete"] += time.perf_counter() - tic
+    return {
+        "dispatched": dispatched,
+        **{f"{k}_s_per_wave": v / WAVES for k, v in timings.items()},
+        "total_s_per_wave": sum(timings.values()) / WAVES,
+    }
+
+
+def main():
+    reduce_node.final_output = lambda docs: {"documents": docs}
+    rows = []
+    for n_docs in SIZES:
+        if n_docs <= LEGACY_MAX_DOCS:
+            rows.append(
+                {
+                    "mode": "legacy",
+                    "documents": n_docs,
+                    **run_waves(
+                        n_docs, legacy_reducer, legacy_map_check, legacy_final_report
+                    ),
+                }
+            )
+        rows.append(
+            {
+                "mode": "tracked",
+                "documents": n_docs,
+                **run_waves(
+                    n_docs, filename_reducer, tracked_map_check, tracked_final_report
+                ),
+            }
+        )
+    print(pl.DataFrame(rows).to_pandas().to_markdown(index=False, floatfmt=".4f"))
+
+
+if __name__ == "__main__":
+    main()
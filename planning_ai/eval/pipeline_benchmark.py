@@ -0,0 +1,136 @@
+"""Compares the stage and per-document graphs on a skewed synthetic corpus.
+
+Run with `python -m planning_ai.eval.pipeline_benchmark`. No API calls are made.
+The chains are replaced with fakes whose latency grows with document length. A
+few very long documents stand in for multi-page PDFs among short comments. PII
+removal and the theme prefilter are replaced by fakes with the same latency
+model, and the final reduce is skipped. Completion time is when a document's
+processed result is streamed from the graph.
+"""
+
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import numpy as np
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.chains.themes_chain import Theme
+from planning_ai.graph import create_graph
+from planning_ai.nodes import hallucination_node, map_node, reduce_node
+
+N_DOCS = 1_000
+LONG_EVERY = 100
+SHORT_WORDS = 60
+LONG_WORDS = 20_000
+MAX_CONCURRENCY = 16
+# fake call latency: a fixed overhead plus a cost per document word
+BASE_LATENCY = 0.01
+WORD_LATENCY = 5e-5
+HALLUCINATION_RATE = 30
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 100
+
+
+def _sleep_for(text) -> None:
+    text = getattr(text, "page_content", text)
+    time.sleep(BASE_LATENCY + WORD_LATENCY * len(text.split()))
+
+
+class FakeClassifier:
+    def classify(self, texts):
+        for text in texts:
+            _sleep_for(text)
+        return [[{"theme": Theme.homes, "score": 4}] for _ in texts]
+
+
+def fake_remove_pii(text):
+    _sleep_for(text)
+    return text
+
+
+class FakeMapper:
+    def invoke(self, inputs, config=None):
+        _sleep_for(inputs["context"])
+        return SimpleNamespace(summary=f"summary of {inputs['context'][:20]}")
+
+
+class FakeChecker:
+    def invoke(self, inputs, config=None):
+        _sleep_for(inputs["document"])
+        score = int(_bucket(inputs["summary"]) >= HALLUCINATION_RATE)
+        return SimpleNamespace(
+            score=score, explanation=f"{inputs['summary']} is ungrounded"
+        )
+
+
+class FakeFixer:
+    def invoke(self, inputs, config=None):
+        _sleep_for(inputs["context"])
+        return SimpleNamespace(summary=f"{inputs['summary']} fixed")
+
+
+def skewed_corpus(n_docs: int = N_DOCS) -> list[dict]:
+    docs = []
+    for idx in range(n_docs):
+        n_words = LONG_WORDS if idx % LONG_EVERY == 0 else SHORT_WORDS
+        docs.append(
+            {
+                "document": Document(page_content=f"doc{idx} " + "word " * n_words),
+                "filename": idx,
+            }
+        )
+    return docs
+
+
+def use_fakes():
+    map_node.THEME_PREFILTER = True
+    map_node.get_theme_classifier = FakeClassifier
+    map_node.remove_pii = fake_remove_pii
+    map_node.create_dynamic_map_chain = lambda *_, **__: FakeMapper()
+    hallucination_node.hallucination_chain = FakeChecker()
+    hallucination_node.create_dynamic_map_chain = lambda *_, **__: FakeFixer()
+    reduce_node.final_output = lambda docs: {"documents": docs}
+
+
+def benchmark(mode: str) -> dict:
+    docs = skewed_corpus()
+    app = create_graph(mode)
+    finished = {}
+    tic = time.perf_counter()
+    for update in app.stream(
+        {"documents": docs, "n_docs": len(docs)},
+        config={"max_concurrency": MAX_CONCURRENCY},
+        stream_mode="updates",
+    ):
+        now = time.perf_counter() - tic
+        for output in update.values():
+            for doc in (output or {}).get("documents", []):
+                if doc.get("processed"):
+                    finished.setdefault(doc["filename"], now)
+    wall = time.perf_counter() - tic
+    completion = np.array(list(finished.values()))
+    return {
+        "mode": mode,
+        "documents": len(finished),
+        "wall_s": wall,
+        "p50_completion_s": float(np.percentile(completion, 50)),
+        "p95_completion_s": float(np.percentile(completion, 95)),
+        "max_completion_s": float(completion.max()),
+    }
+
+
+def main():
+    use_fakes()
+    results = pl.DataFrame([benchmark("stage"), benchmark("document")])
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".2f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compares the end-of-run policy reduction with online aggregation.
+
+Run with `python -m planning_ai.eval.policy_benchmark`. No API calls are made.
+Synthetic documents with policy notes finish at a steady rate over
+`MAP_SECONDS`, standing in for the map stage, and `policy_chain` is replaced by a
+fake whose latency grows with the number of notes. The tail is the time from the
+last document finishing to the policy table being ready.
+"""
+
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai import policies
+from planning_ai.nodes import reduce_node
+from planning_ai.policies import PolicyAggregator
+from planning_ai.themes import THEMES_AND_POLICIES
+
+N_DOCS = 2_000
+NOTES_PER_DOC = 2
+N_POLICIES = 12
+STANCES = ["Support", "Object", "Comment"]
+MAP_SECONDS = 10.0
+# fake call latency: a fixed overhead plus a cost per note
+BASE_LATENCY = 0.2
+NOTE_LATENCY = 0.01
+# the fake merges this many notes into one condensed detail
+MERGE_EVERY = 5
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 100
+
+
+class FakePolicyChain:
+    def invoke(self, inputs, config=None):
+        details = inputs["details"]
+        time.sleep(BASE_LATENCY + NOTE_LATENCY * len(details))
+        merged = []
+        for i in range(0, len(details), MERGE_EVERY):
+            chunk = details[i : i + MERGE_EVERY]
+            ids = [
+                int(id)
+                for detail in chunk
+                for id in detail.rsplit("Doc ID: ", 1)[1].split(", ")
+            ]
+            merged.append(SimpleNamespace(detail=f"condensed {i}", doc_id=ids))
+        return SimpleNamespace(
+            dict=lambda: {"policies": [vars(policy) for policy in merged]}
+        )
+
+
+def synthetic_documents(n_docs: int = N_DOCS) -> list[dict]:
+    names = [
+        (theme, policy)
+        for theme, policies in THEMES_AND_POLICIES.items()
+        for policy in policies
+    ][:N_POLICIES]
+    docs = []
+    for idx in range(n_docs):
+        notes = [
+            SimpleNamespace(
+                policy=SimpleNamespace(name=names[_bucket(idx, n) % N_POLICIES][1]),
+                note=f"note {n} from document {idx}",
+            )
+            for n in range(NOTES_PER_DOC)
+        ]
+        stance = STANCES[_bucket(idx) % len(STANCES)]
+        docs.append(
+            {
+                "document": Document(
+                    page_content="",
+                    metadata={"representations_support/object": stance},
+                ),
+                "filename": f"doc{idx}",
+                "summary": SimpleNamespace(policies=notes),
+                "doc_id": idx,
+            }
+        )
+    return docs
+
+
+def _covered(table: pl.DataFrame) -> int:
+    return table.explode("doc_id").explode("doc_id")["doc_id"].n_unique()
+
+
+def benchmark(mode: str, docs: list[dict]) -> dict:
+    aggregator = PolicyAggregator()
+    tic = time.perf_counter()
+    for doc in docs:
+        time.sleep(MAP_SECONDS / len(docs))
+        if mode == "online":
+            aggregator.add(doc)
+    map_done = time.perf_counter()
+    if mode == "online":
+        table = aggregator.result(docs)
+    else:
+        table = reduce_node.generate_policy_output(
+            reduce_node.extract_policies_from_docs(docs)
+        )
+    toc = time.perf_counter()
+    return {
+        "mode": mode,
+        "groups": table.height,
+        "documents_cited": _covered(table),
+        "wall_s": toc - tic,
+        "tail_s": toc - map_done,
+    }
+
+
+def main():
+    policies.policy_chain = FakePolicyChain()
+    reduce_node.policy_chain = FakePolicyChain()
+    docs = synthetic_documents()
+    results = pl.DataFrame([benchmark("batch", docs), benchmark("online", docs)])
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".2f"))
+
+
+if __name__ == "__main__":
+    main()
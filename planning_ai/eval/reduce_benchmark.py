@@ -0,0 +1,113 @@
+"""Compares `doc_id`-order and topic-clustered batching for the executive reduce.
+
+Run with `python -m planning_ai.eval.reduce_benchmark`. No API calls are made.
+The fixture corpus has summaries on the `TOPICS` in random order. Summaries are
+embedded with the local `hashing` backend unless `EMBEDDINGS_BACKEND` is set.
+
+`topics_per_batch` and `reduce_calls` measure the batching itself, and the run
+fails if topic batching needs more reduce calls than `doc_id` order. The token
+columns do not measure a real reduce. The fake `reduce_chain` is built to write
+one paragraph per topic in its batch, so fewer topics per batch give shorter
+intermediate reports by construction. How much a real reduce shrinks has to be
+measured against the API.
+"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("EMBEDDINGS_BACKEND", "hashing")
+
+import numpy as np
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.chains.reduce_chain import join_reports
+from planning_ai.llms.router import estimate_tokens
+from planning_ai.nodes import reduce_node
+
+N_DOCS = 2_000
+TOPICS = {
+    "green belt": "the loss of green belt land to housing estates on the village edge",
+    "transport": "congested roads buses that do not run and unsafe cycle lanes",
+    "water": "water supply from the chalk aquifer and low flows in the chalk streams",
+    "housing": "affordable homes for key workers and rents that young people can pay",
+    "schools": "primary school places and secondary schools in the new towns",
+    "flooding": "flood risk surface water drainage and building on the flood plain",
+    "heritage": "listed buildings conservation areas and views of the historic centre",
+    "employment": "science park jobs office space and the balance with homes",
+    "biodiversity": "hedgerows wildlife corridors and biodiversity net gain",
+    "health": "gp surgeries hospital capacity and healthy new neighbourhoods",
+}
+STANCES = ["supports", "objects to", "comments on"]
+PARAGRAPH_WORDS = 40
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 1_000
+
+
+def fixture_corpus(n_docs: int = N_DOCS) -> list[dict]:
+    topics = list(TOPICS)
+    docs = []
+    for idx in range(n_docs):
+        topic = topics[_bucket(idx) % len(topics)]
+        stance = STANCES[_bucket(idx, "stance") % len(STANCES)]
+        summary = f"The respondent {stance} the plan because of {TOPICS[topic]}."
+        docs.append(
+            {
+                "doc_id": idx,
+                "document": Document(page_content="", metadata={}),
+                "summary": SimpleNamespace(summary=summary),
+            }
+        )
+    return docs
+
+
+class FakeReduce:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, inputs, config=None):
+        context = inputs["context"]
+        self.prompts.append(estimate_tokens(context))
+        covered = [topic for topic, text in TOPICS.items() if text in context]
+        return "\n\n".join(
+            f"## {topic.title()}\n\n" + " ".join([topic] * PARAGRAPH_WORDS)
+            for topic in covered
+        )
+
+
+def benchmark(mode: str, docs: list[dict]) -> dict:
+    reduce_node.TOPIC_BATCHING = mode == "topic"
+    reduce_node.reduce_chain = fake = FakeReduce()
+    batches = reduce_node.topic_batches([doc["summary"].summary for doc in docs])
+    reports = reduce_node.batch_generate_executive_summaries(docs)
+    topics_per_batch = [
+        len({_bucket(idx) % len(TOPICS) for idx in batch}) for batch in batches
+    ]
+    return {
+        "batching": mode,
+        "reduce_calls": len(reports),
+        "topics_per_batch": float(np.mean(topics_per_batch)),
+        "reduce_prompt_tokens": sum(fake.prompts),
+        "intermediate_tokens": sum(estimate_tokens(r) for r in reports),
+        "final_prompt_tokens": estimate_tokens(join_reports(reports)),
+    }
+
+
+def main():
+    docs = fixture_corpus()
+    results = pl.DataFrame([benchmark("doc_id", docs), benchmark("topic", docs)])
+    print(results.to_pandas().to_markdown(index=False, floatfmt=".1f"))
+    calls = dict(results.select("batching", "reduce_calls").iter_rows())
+    if calls["topic"] > calls["doc_id"]:
+        raise SystemExit(
+            f"Topic batching made {calls['topic']} reduce calls, "
+            f"more than the {calls['doc_id']} of doc_id order."
+        )
+
+
+if __name__ == "__main__":
+    main()
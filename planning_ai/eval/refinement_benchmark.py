@@ -0,0 +1,128 @@
+"""Counts LLM calls made by the hallucination check/fix loop using fake chains.
+
+Run with `python -m planning_ai.eval.refinement_benchmark`. No API calls are made.
+The fake checker scores a summary by its text alone, so `failed` shows whether
+stopping on a fix that made no progress loses any document that more attempts
+would have grounded.
+"""
+
+import hashlib
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.common.utils import TrackedDocuments, filename_reducer
+from planning_ai.nodes import hallucination_node
+from planning_ai.nodes.hallucination_node import (
+    check_hallucination,
+    fix_hallucination,
+    map_check,
+    map_fix,
+)
+
+N_DOCS = 1_000
+HALLUCINATION_RATE = 30
+UNCHANGED_FIX_RATE = 20
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 100
+
+
+class FakeChecker:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def invoke(self, inputs, config=None):
+        self.calls["check"] += 1
+        score = int(_bucket(inputs["summary"]) >= HALLUCINATION_RATE)
+        return SimpleNamespace(
+            score=score, explanation=f"{inputs['summary']} is ungrounded"
+        )
+
+
+class FakeFixer:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def invoke(self, inputs, config=None):
+        self.calls["fix"] += 1
+        if _bucket(inputs["context"].page_content) < UNCHANGED_FIX_RATE:
+            return SimpleNamespace(summary=inputs["summary"])
+        return SimpleNamespace(summary=f"{inputs['summary']} fixed")
+
+
+def make_documents(n_docs: int) -> list[dict]:
+    docs = []
+    for idx in range(n_docs):
+        n_words = 30 if idx % 2 else 400
+        docs.append(
+            {
+                "document": Document(page_content=f"doc{idx} " + "word " * n_words),
+                "filename": idx,
+                "themes": [],
+                "summary": SimpleNamespace(summary=f"summary {idx}"),
+                "refinement_attempts": 0,
+                "is_hallucinated": True,
+                "failed": False,
+                "processed": False,
+            }
+        )
+    return docs
+
+
+def run_refinement(documents: list[dict]) -> tuple[list[dict], int]:
+    """Replays the graph's check/fix supersteps, returning documents and waves."""
+    waves = 0
+    routed = map_check({"documents": documents})
+    while routed != "generate_final_report":
+        waves += 1
+        checked = [check_hallucination(send.arg)["documents"][0] for send in routed]
+        documents = filename_reducer(documents, checked)
+        fixes = map_fix({"documents": documents})
+        if fixes == "generate_final_report":
+            break
+        fixed = [fix_hallucination(send.arg)["documents"][0] for send in fixes]
+        documents = filename_reducer(documents, fixed)
+        routed = map_check({"documents": documents})
+    return documents, waves
+
+
+def benchmark(name: str, stop_early: bool) -> dict:
+    calls = Counter()
+    hallucination_node.hallucination_chain = FakeChecker(calls)
+    hallucination_node.create_dynamic_map_chain = lambda *_, **__: FakeFixer(calls)
+    original_no_progress = hallucination_node.no_progress
+    if not stop_early:
+        hallucination_node.no_progress = lambda state, response: False
+    try:
+        documents, waves = run_refinement(TrackedDocuments(make_documents(N_DOCS)))
+    finally:
+        hallucination_node.no_progress = original_no_progress
+    return {
+        "policy": name,
+        "check_calls": calls["check"],
+        "fix_calls": calls["fix"],
+        "total_calls": calls["check"] + calls["fix"],
+        "waves": waves,
+        "failed": sum(doc["failed"] for doc in documents),
+    }
+
+
+def main():
+    results = pl.DataFrame(
+        [
+            benchmark("every attempt", stop_early=False),
+            benchmark("stop on unchanged fix", stop_early=True),
+        ]
+    )
+    print(results.to_pandas().to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
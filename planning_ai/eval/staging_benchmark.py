@@ -0,0 +1,121 @@
+"""Compares loading one consultation document from monolithic and partitioned parquet.
+
+Run with `python -m planning_ai.eval.staging_benchmark`. A synthetic
+consultation of `N_ROWS` representations across `N_DOCUMENTS` documents is
+written both as a single `gcpt3.parquet`, read eagerly and filtered as before,
+and partitioned by `representations_document`, read with `scan_gcpt3`. Each load
+runs in a fresh process so peak memory is its own.
+"""
+
+import multiprocessing
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from planning_ai.common.utils import Paths
+from planning_ai.preprocessing import gcpt3
+
+N_ROWS = 400_000
+N_DOCUMENTS = 40
+TEXT_WORDS = 40
+BENCH_DIR = Paths.OUT / "staging_benchmark"
+MONOLITHIC = BENCH_DIR / "gcpt3.parquet"
+PARTITIONED = BENCH_DIR / "gcpt3"
+
+
+def _peak_rss_mb() -> float:
+    # `ru_maxrss` carries over the parent's peak across exec; `VmHWM` does not
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def synthetic_consultation(n_rows: int = N_ROWS) -> pl.DataFrame:
+    rng = np.random.default_rng(0)
+    words = np.array([f"word{i}" for i in range(2_000)])
+    text = [
+        " ".join(row)
+        for row in words[rng.integers(0, len(words), (n_rows, TEXT_WORDS))]
+    ]
+    return pl.DataFrame(
+        {
+            "id": np.arange(n_rows),
+            "text": text,
+            "respondentpostcode": rng.choice(["CB1 1AA", "CB2 2BB", "CB3 3CC"], n_rows),
+            "attachments_id": pl.Series([None] * n_rows, dtype=pl.Int64),
+            "representations_document": [
+                f"Consultation Document {i}"
+                for i in rng.integers(0, N_DOCUMENTS, n_rows)
+            ],
+            "representations_support/object": rng.choice(
+                ["Support", "Object", "Comment"], n_rows
+            ),
+        }
+    )
+
+
+def write_layouts():
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    BENCH_DIR.mkdir(parents=True)
+    df = synthetic_consultation()
+    df.write_parquet(MONOLITHIC)
+    df.write_parquet(
+        PARTITIONED,
+        partition_by="representations_document",
+        statistics=True,
+        row_group_size=gcpt3.ROW_GROUP_SIZE,
+    )
+
+
+def load(layout: str, rep: str, results):
+    tic = time.perf_counter()
+    if layout == "monolithic":
+        reps = pl.read_parquet(MONOLITHIC)["representations_document"].unique()
+        df = (
+            pl.read_parquet(MONOLITHIC)
+            .drop_nulls(subset="text")
+            .filter(pl.col("representations_document") == rep)
+        )
+    else:
+        gcpt3.GCPT3_DIR = PARTITIONED
+        reps = gcpt3.representations_documents()
+        df = (
+            gcpt3.scan_gcpt3()
+            .filter(pl.col("representations_document") == rep)
+            .drop_nulls(subset="text")
+            .collect()
+        )
+    results.put(
+        {
+            "layout": layout,
+            "documents_listed": len(reps),
+            "rows_loaded": df.height,
+            "load_s": time.perf_counter() - tic,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    )
+
+
+def main():
+    write_layouts()
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for layout in ["monolithic", "partitioned"]:
+        results = ctx.Queue()
+        process = ctx.Process(
+            target=load, args=(layout, "Consultation Document 7", results)
+        )
+        process.start()
+        rows.append(results.get())
+        process.join()
+    size_mb = MONOLITHIC.stat().st_size / 1024**2
+    print(f"{N_ROWS} rows, {N_DOCUMENTS} documents, {size_mb:.0f} MB parquet")
+    print(pl.DataFrame(rows).to_pandas().to_markdown(index=False, floatfmt=".2f"))
+
+
+if __name__ == "__main__":
+    main()
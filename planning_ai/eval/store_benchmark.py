@@ -0,0 +1,139 @@
+"""Compares resident memory of in-state `Document`s with the mapped document store.
+
+Run with `python -m planning_ai.eval.store_benchmark`. Each mode runs in its own
+process on a synthetic corpus of `N_DOCS` documents. The documents are copied
+into new states `HOPS` times, as the graph does between nodes, and then a
+working set of `WORKING_SET` documents is read and redacted. Memory is the
+process's resident set size above its size before the corpus was created, at the
+end (`rss_mb`) and at its highest (`peak_mb`).
+
+`store_build` builds the store in the measured process from a generator, so
+its memory includes what the allocators keep after writing; `store_open` opens
+the store that run wrote, which is the steady state of the graph's nodes.
+`read_docs` runs `planning_ai.main.read_docs` on the same corpus written as
+partitioned staging parquet, so it also counts reading and filtering the
+representations before they are streamed into the store.
+"""
+
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.common.utils import Paths
+from planning_ai.documents.store import DocumentStore
+from planning_ai.preprocessing import gcpt3
+
+N_DOCS = 20_000
+WORDS = 1_000
+HOPS = 3
+WORKING_SET = 500
+STORE_PATH = Paths.OUT / "store_benchmark" / "documents.arrow"
+GCPT3_DIR = Paths.OUT / "store_benchmark" / "gcpt3"
+REP = "Consultation Document"
+
+
+def _rss_mb(field: str = "VmRSS") -> float:
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def corpus(n_docs: int = N_DOCS):
+    for idx in range(n_docs):
+        yield idx, f"document {idx} " + " ".join(
+            f"word{(idx * 7 + n) % 5000}" for n in range(WORDS)
+        )
+
+
+def write_staging():
+    pl.DataFrame(
+        [
+            {
+                "id": idx,
+                "text": text,
+                "respondentpostcode": "CB1 1AA",
+                "attachments_id": None,
+                "representations_document": REP,
+                "representations_support/object": "Object",
+            }
+            for idx, text in corpus()
+        ],
+        schema_overrides={"attachments_id": pl.Int64},
+    ).write_parquet(GCPT3_DIR, partition_by="representations_document")
+
+
+def run(mode: str, results):
+    if mode == "read_docs":
+        from planning_ai import main as pipeline
+
+        gcpt3.GCPT3_DIR = GCPT3_DIR
+        pipeline.iter_layouts = lambda: iter(())
+    baseline = _rss_mb()
+    tic = time.perf_counter()
+    if mode == "read_docs":
+        states = pipeline.read_docs(REP)
+    elif mode == "documents":
+        states = [
+            {
+                "document": Document(page_content=text, metadata={"filename": idx}),
+                "filename": idx,
+            }
+            for idx, text in corpus()
+        ]
+    else:
+        if mode == "store_build":
+            store = DocumentStore.build(STORE_PATH, corpus())
+        else:
+            store = DocumentStore(STORE_PATH)
+        states = [
+            {"document": store.document(idx, {"filename": idx}), "filename": idx}
+            for idx in range(N_DOCS)
+        ]
+    build = time.perf_counter() - tic
+
+    for hop in range(HOPS):
+        states = [{**state, "hop": hop} for state in states]
+
+    tic = time.perf_counter()
+    for state in states[:WORKING_SET]:
+        text = state["document"].page_content
+        state["document"].page_content = text.replace("word1 ", "[REDACTED] ")
+        len(state["document"].page_content.split())
+    read = time.perf_counter() - tic
+
+    results.put(
+        {
+            "mode": mode,
+            "documents": len(states),
+            "build_s": build,
+            "read_ms_per_doc": 1000 * read / WORKING_SET,
+            "rss_mb": _rss_mb() - baseline,
+            "peak_mb": _rss_mb("VmHWM") - baseline,
+        }
+    )
+
+
+def main():
+    write_staging()
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for mode in ["documents", "store_build", "store_open", "read_docs"]:
+        results = ctx.Queue()
+        process = ctx.Process(target=run, args=(mode, results))
+        process.start()
+        rows.append(results.get())
+        process.join()
+    corpus_mb = sum(len(text) for _, text in corpus()) / 1024**2
+    print(f"Corpus text: {corpus_mb:.0f} MB")
+    print(pl.DataFrame(rows).to_pandas().to_markdown(index=False, floatfmt=".2f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Compares the theme index pre-filter with `themes_chain` on labelled fixtures.
+
+Run with `python -m planning_ai.eval.theme_prefilter_benchmark`. The index is built
+offline from the policy names in `THEMES_AND_POLICIES` using `HashingEmbeddings`;
+pass `--llm` to also time `themes_chain` (requires `OPENAI_API_KEY`).
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import polars as pl
+from langchain_core.documents import Document
+
+from planning_ai.llms.embeddings import HashingEmbeddings
+from planning_ai.retrievers.theme_classifier import ThemeClassifier
+from planning_ai.retrievers.theme_retriever import create_db
+from planning_ai.themes import THEMES_AND_POLICIES
+
+FIXTURES = [
+    (
+        "Climate Change",
+        "New homes must be built to net zero carbon standards with heat pumps and "
+        "solar panels so that the plan meets its carbon emissions targets.",
+    ),
+    (
+        "Climate Change",
+        "The site floods every winter. Flooding and water management need to be "
+        "addressed, and renewable energy should be required on every building.",
+    ),
+    (
+        "Biodiversity and Green Spaces",
+        "Please protect the open spaces and river corridors. The meadows support "
+        "biodiversity and the tree canopy cover should be improved, not felled.",
+    ),
+    (
+        "Biodiversity and Green Spaces",
+        "Green infrastructure and habitats for wildlife will be lost. We need more "
+        "parks and providing and enhancing open spaces for residents.",
+    ),
+    (
+        "Wellbeing and Social Inclusion",
+        "There are no community, sports and leisure facilities for young people, and "
+        "pollution from the new road will harm health and safety.",
+    ),
+    (
+        "Wellbeing and Social Inclusion",
+        "Creating healthy new developments means doctors surgeries and community "
+        "facilities so that everyone benefits and no one is excluded.",
+    ),
+    (
+        "Great Places",
+        "The development would harm the Green Belt and the landscape character of the "
+        "village, and the conservation area heritage assets must be protected.",
+    ),
+    (
+        "Great Places",
+        "Protection and enhancement of the Cambridge Green Belt matters. High quality "
+        "design and public realm should respect the historic character.",
+    ),
+    (
+        "Jobs",
+        "Business space and employment parks should be protected, and the rural "
+        "economy and the best agricultural land supported for local jobs.",
+    ),
+    (
+        "Jobs",
+        "Affordable workspace for creative industries and support for retail centres "
+        "and visitor attractions will bring new employment.",
+    ),
+    (
+        "Homes",
+        "We need affordable housing for local families, a better housing mix and homes "
+        "for older people rather than more student accommodation.",
+    ),
+    (
+        "Homes",
+        "Housing density is too high, and houses in multiple occupation and build to "
+        "rent homes are replacing family homes with gardens.",
+    ),
+    (
+        "Infrastructure",
+        "Sustainable transport is missing: buses, cycle routes and parking for electric "
+        "vehicles are needed before any development is delivered.",
+    ),
+    (
+        "Infrastructure",
+        "Digital infrastructure, energy infrastructure and freight delivery need to be "
+        "planned, and important infrastructure safeguarded.",
+    ),
+]
+
+
+def index_documents() -> list[Document]:
+    return [
+        Document(page_content=f"{theme}: {policy}", metadata={"theme": theme})
+        for theme, policies in THEMES_AND_POLICIES.items()
+        for policy in policies
+    ]
+
+
+def top_theme(themes):
+    if not themes:
+        return None
+    return max(themes, key=lambda theme: theme["score"])["theme"].value
+
+
+def benchmark_classifier(classifier, texts, labels) -> dict:
+    tic = time.perf_counter()
+    votes = classifier.classify(texts)
+    elapsed = time.perf_counter() - tic
+    confident = [(top_theme(v), label) for v, label in zip(votes, labels) if v]
+    return {
+        "method": "theme index",
+        "coverage": len(confident) / len(texts),
+        "accuracy": (
+            sum(pred == label for pred, label in confident) / len(confident)
+            if confident
+            else None
+        ),
+        "ms_per_doc": 1000 * elapsed / len(texts),
+    }
+
+
+def benchmark_llm(texts, labels) -> dict:
+    from planning_ai.chains.themes_chain import themes_chain
+
+    tic = time.perf_counter()
+    results = themes_chain.batch([{"document": text} for text in texts])
+    elapsed = time.perf_counter() - tic
+    preds = [
+        top_theme([theme.model_dump() for theme in result.themes or []])
+        for result in results
+    ]
+    return {
+        "method": "themes_chain",
+        "coverage": 1.0,
+        "accuracy": sum(p == l for p, l in zip(preds, labels)) / len(labels),
+        "ms_per_doc": 1000 * elapsed / len(texts),
+    }
+
+
+def main():
+    labels, texts = zip(*FIXTURES)
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = create_db(
+            embedding_function=HashingEmbeddings(),
+            persist_directory=Path(tmp) / "themes",
+            docs=index_documents(),
+        )
+        results = [benchmark_classifier(ThemeClassifier(vectorstore), texts, labels)]
+    if "--llm" in sys.argv:
+        results.append(benchmark_llm(texts, labels))
+    print(pl.DataFrame(results).to_pandas().to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,88 @@
+import os
+from functools import partial
+
 from langgraph.constants import START
 from langgraph.graph import END, StateGraph
 
 from planning_ai.nodes.hallucination_node import (
     check_hallucination,
     fix_hallucination,
+    join_wave,
     map_check,
     map_fix,
 )
 from planning_ai.nodes.map_node import add_entities, generate_summary, map_documents
+from planning_ai.nodes.pipeline_node import process_document
 from planning_ai.nodes.reduce_node import generate_final_report
 from planning_ai.states import OverallState
+from planning_ai.telemetry import instrument_node
+
+# `document` runs each document through summary, check and fix independently;
+# `stage` runs each step for all documents as one superstep
+GRAPH_MODE = os.getenv("GRAPH_MODE", "document")
 
 
-def create_graph():
+def create_graph(mode: str = GRAPH_MODE):
+    if mode == "document":
+        return create_pipeline_graph()
     graph = StateGraph(OverallState)
     # graph.add_node("add_entities", add_entities)
-    graph.add_node("generate_summary", generate_summary)
-    graph.add_node("check_hallucination", check_hallucination)
-    graph.add_node("fix_hallucination", fix_hallucination)
-    graph.add_node("generate_final_report", generate_final_report)
+    graph.add_node(
+        "generate_summary", instrument_node("generate_summary", generate_summary)
+    )
+    graph.add_node(
+        "check_hallucination",
+        instrument_node("check_hallucination", check_hallucination),
+    )
+    graph.add_node(
+        "fix_hallucination", instrument_node("fix_hallucination", fix_hallucination)
+    )
+    graph.add_node(
+        "generate_final_report",
+        instrument_node("generate_final_report", generate_final_report),
+    )
+    graph.add_node("check_wave", join_wave)
+    graph.add_node("fix_wave", join_wave)
 
     # graph.add_edge(START, "add_entities")
     graph.add_conditional_edges(START, map_documents, ["generate_summary"])
     # graph.add_conditional_edges("add_entities", map_documents, ["generate_summary"])
-    graph.add_conditional_edges("generate_summary", map_check, ["check_hallucination"])
-    graph.add_conditional_edges("check_hallucination", map_fix, ["fix_hallucination"])
-    graph.add_conditional_edges("fix_hallucination", map_check, ["check_hallucination"])
-
-    graph.add_edge("check_hallucination", "generate_final_report")
+    graph.add_edge("generate_summary", "check_wave")
+    graph.add_conditional_edges(
+        "check_wave", map_check, ["check_hallucination", "generate_final_report"]
+    )
+    graph.add_edge("check_hallucination", "fix_wave")
+    graph.add_conditional_edges(
+        "fix_wave", map_fix, ["fix_hallucination", "generate_final_report"]
+    )
+    graph.add_edge("fix_hallucination", "check_wave")
     graph.add_edge("generate_final_report", END)
 
     return graph.compile()
 
 
+def create_pipeline_graph():
+    """Builds the graph that summarises documents without per-step barriers.
+
+    Each document runs through its own `process_document` task, and the final
+    report is generated once the last one finishes.
+    """
+    graph = StateGraph(OverallState)
+    graph.add_node(
+        "process_document", instrument_node("process_document", process_document)
+    )
+    graph.add_node(
+        "generate_final_report",
+        instrument_node("generate_final_report", generate_final_report),
+    )
+    graph.add_conditional_edges(
+        START, partial(map_documents, node="process_document"), ["process_document"]
+    )
+    graph.add_edge("process_document", "generate_final_report")
+    graph.add_edge("generate_final_report", END)
+    return graph.compile()
+
+
 def plot_mermaid():
     graph = create_graph()
     print(graph.get_graph().draw_mermaid())
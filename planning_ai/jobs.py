@@ -0,0 +1,356 @@
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import py7zr
+
+from planning_ai.common.utils import Paths
+from planning_ai.logging import logger
+
+JOBS_DIR = Paths.OUT / "jobs"
+JOBS_DB = JOBS_DIR / "jobs.db"
+UPLOAD_DIR = Paths.RAW / "gcpt3"
+
+STAGES = ["extract", "preprocess", "ocr", "report"]
+# the pipeline reads and writes shared staging directories, so builds must not
+# overlap; extra workers only help once staging is isolated per job.
+N_WORKERS = 1
+POLL_INTERVAL = 2
+# running jobs refresh their heartbeat this often; a job whose worker has exited,
+# or whose heartbeat is older than the timeout, is requeued
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 60
+
+
+def hash_archive(data: bytes) -> str:
+    """Returns the SHA-256 hex digest of an uploaded archive, used as the job id."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stages TEXT NOT NULL,
+            message TEXT,
+            result TEXT,
+            created REAL NOT NULL,
+            updated REAL NOT NULL,
+            worker_host TEXT,
+            worker_pid INTEGER,
+            heartbeat REAL
+        )
+        """)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, kind in [
+        ("worker_host", "TEXT"),
+        ("worker_pid", "INTEGER"),
+        ("heartbeat", "REAL"),
+    ]:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+    return conn
+
+
+def _empty_stages() -> dict:
+    return {stage: {"status": "pending", "progress": 0.0} for stage in STAGES}
+
+
+def _row_to_job(row: sqlite3.Row | None) -> dict | None:
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "stages": json.loads(row["stages"]),
+        "message": row["message"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "created": row["created"],
+        "updated": row["updated"],
+    }
+
+
+def job_dir(job_id: str):
+    return JOBS_DIR / job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row)
+
+
+def submit_job(archive: bytes) -> str:
+    """Queues a report build for an uploaded `.7z` archive.
+
+    Jobs are keyed on the archive hash, so resubmitting an identical upload returns
+    the existing job (and its finished reports) instead of building again. Failed
+    jobs are requeued.
+
+    Args:
+        archive (bytes): Raw contents of the uploaded archive.
+
+    Returns:
+        str: The job id.
+    """
+    job_id = hash_archive(archive)
+    existing = get_job(job_id)
+    if existing and existing["status"] != "failed":
+        logger.info(f"Reusing job {job_id} ({existing['status']})")
+        return job_id
+
+    job_dir(job_id).mkdir(parents=True, exist_ok=True)
+    with open(job_dir(job_id) / "upload.7z", "wb") as f:
+        f.write(archive)
+
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, stages, created, updated) "
+            "VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, json.dumps(_empty_stages()), now, now),
+        )
+    logger.info(f"Queued job {job_id}")
+    return job_id
+
+
+def update_stage(job_id: str, stage: str, status: str, progress: float) -> None:
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        stages = json.loads(row["stages"])
+        stages[stage] = {"status": status, "progress": progress}
+        conn.execute(
+            "UPDATE jobs SET stages = ?, updated = ? WHERE id = ?",
+            (json.dumps(stages), time.time(), job_id),
+        )
+        conn.execute("COMMIT")
+
+
+def _finish_job(job_id: str, status: str, message=None, result=None) -> None:
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, message = ?, result = ?, updated = ? "
+            "WHERE id = ?",
+            (
+                status,
+                message,
+                json.dumps(result) if result is not None else None,
+                time.time(),
+                job_id,
+            ),
+        )
+
+
+def _worker_alive(host: str | None, pid: int | None) -> bool:
+    """Whether the process that claimed a job still exists.
+
+    Only workers on this host can be checked; others are judged by heartbeat alone.
+    """
+    if host != socket.gethostname() or pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _requeue_abandoned(conn: sqlite3.Connection) -> None:
+    """Requeues `running` jobs whose worker has exited or stopped heartbeating.
+
+    Jobs still owned by a live worker are left alone, so starting another worker
+    never causes a job to run twice.
+    """
+    now = time.time()
+    rows = conn.execute(
+        "SELECT id, worker_host, worker_pid, heartbeat FROM jobs "
+        "WHERE status = 'running'"
+    ).fetchall()
+    for row in rows:
+        stale = row["heartbeat"] is None or now - row["heartbeat"] > HEARTBEAT_TIMEOUT
+        if stale or not _worker_alive(row["worker_host"], row["worker_pid"]):
+            logger.warning(f"Requeuing job {row['id']} abandoned by its worker")
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+
+
+def claim_next_job() -> str | None:
+    """Atomically marks the oldest queued job as running and returns its id.
+
+    Jobs abandoned by a dead worker are requeued first, in the same transaction.
+    """
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _requeue_abandoned(conn)
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'running', updated = ?, worker_host = ?, "
+            "worker_pid = ?, heartbeat = ? WHERE id = ?",
+            (now, socket.gethostname(), os.getpid(), now, row["id"]),
+        )
+        conn.execute("COMMIT")
+    return row["id"]
+
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        with closing(_connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id)
+            )
+
+
+def run_job(job_id: str) -> None:
+    """Runs a job while a background thread keeps its heartbeat fresh."""
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        _run_stages(job_id)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def _run_stages(job_id: str) -> None:
+    """Runs every build stage for a job, recording progress as it goes."""
+    from planning_ai.main import main as report_main
+    from planning_ai.preprocessing.azure_doc import azure_process_pdfs
+    from planning_ai.preprocessing.gcpt3 import main as preprocess_main
+
+    out_dir = job_dir(job_id)
+
+    def extract():
+        _ = [file.unlink() for file in UPLOAD_DIR.glob("*.json")]
+        with py7zr.SevenZipFile(out_dir / "upload.7z", mode="r") as archive:
+            archive.extractall(path=UPLOAD_DIR)
+
+    def report_progress(rep, done, total):
+        update_stage(job_id, "report", "running", done / total)
+
+    stage_fns = {
+        "extract": extract,
+        "preprocess": preprocess_main,
+        "ocr": azure_process_pdfs,
+        "report": lambda: report_main(on_progress=report_progress),
+    }
+
+    results = None
+    for stage in STAGES:
+        logger.info(f"Job {job_id}: starting {stage}")
+        update_stage(job_id, stage, "running", 0.0)
+        try:
+            results = stage_fns[stage]()
+        except Exception as e:
+            logger.error(f"Job {job_id} failed during {stage}: {e}")
+            update_stage(job_id, stage, "failed", 0.0)
+            _finish_job(job_id, "failed", message=f"{stage}: {e}")
+            return
+        update_stage(job_id, stage, "done", 1.0)
+
+    try:
+        reports = _collect_reports(job_id, results)
+        _finish_job(job_id, "completed", result=reports)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed while saving its reports: {e}")
+        _finish_job(job_id, "failed", message=f"results: {e}")
+        return
+    logger.info(f"Job {job_id} completed")
+
+
+def _collect_reports(job_id: str, results) -> list[dict]:
+    """Copies each representation's PDFs into the job directory."""
+    reports = []
+    for rep in results:
+        files = {
+            "report": f"Summary_of_Submitted_Responses-{rep}.pdf",
+            "summaries": f"Summary_Documents-{rep}.pdf",
+        }
+        for kind, name in files.items():
+            if (Paths.SUMMARY / name).exists():
+                shutil.copy(Paths.SUMMARY / name, job_dir(job_id) / name)
+            else:
+                logger.warning(f"Job {job_id}: {name} was not written")
+                files[kind] = None
+        reports.append({"representations_document": rep, **files})
+    return reports
+
+
+def worker_loop(poll_interval: float = POLL_INTERVAL) -> None:
+    """Claims and runs queued jobs until the process is stopped.
+
+    An error that escapes a job, e.g. from the job database, marks that job
+    failed where possible and the worker moves on to the next one.
+    """
+    while True:
+        job_id = claim_next_job()
+        if job_id is None:
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(job_id)
+        except Exception as e:
+            logger.error(f"Job {job_id} stopped unexpectedly: {e}")
+            try:
+                _finish_job(job_id, "failed", message=str(e))
+            except sqlite3.Error as db_error:
+                logger.error(f"Could not mark job {job_id} failed: {db_error}")
+
+
+def stop_workers(workers: list[multiprocessing.Process]) -> None:
+    """Terminates the workers and waits for them to exit.
+
+    A job interrupted here is requeued by the next worker to claim a job.
+    """
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in workers:
+        worker.join()
+    logger.info(f"Stopped {len(workers)} build worker(s)")
+
+
+def start_workers(n_workers: int = N_WORKERS) -> list[multiprocessing.Process]:
+    """Starts build workers that are stopped when this process exits.
+
+    Workers are not daemonic, because the report stage starts its own processes
+    to render figures and daemonic processes may not have children.
+    """
+    workers = [
+        multiprocessing.Process(target=worker_loop, name=f"worker-{i}")
+        for i in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    # registered after multiprocessing's own exit handler, so it runs first and
+    # the workers have exited by the time non-daemonic children are joined
+    atexit.register(stop_workers, workers)
+    logger.info(f"Started {n_workers} build worker(s)")
+    return workers
+
+
+if __name__ == "__main__":
+    worker_loop()
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from planning_ai.common.utils import Paths
+from planning_ai.logging import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+EMBEDDINGS_DIR = Paths.STAGING / "embeddings"
+# `openai` is installed with the pipeline's dependencies; `local` additionally
+# needs `sentence-transformers` (`pip install sentence-transformers`)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "openai")
+LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BATCH_SIZE = 256
+
+
+class HashingEmbeddings(Embeddings):
+    """Local, deterministic bag-of-words embeddings using the hashing trick.
+
+    Unigrams and bigrams are hashed into `dimensions` buckets, weighted by
+    sublinear term frequency and L2 normalised. No model download or network
+    access is needed, so this is used for offline runs and benchmarks.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+
+    def _bucket(self, token: str) -> int:
+        return int.from_bytes(hashlib.md5(token.encode()).digest()[:4], "little")
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for gram in grams:
+                vectors[row, self._bucket(gram) % self.dimensions] += 1
+        np.log1p(vectors, out=vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Local sentence embeddings, run on CPU or GPU without an API."""
+
+    def __init__(self, model_name: str = LOCAL_MODEL, batch_size: int = BATCH_SIZE):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embeddings backend requires `sentence-transformers`."
+            ) from e
+        self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings backend with a persistent content-hash to vector cache.
+
+    Vectors are appended to a raw `float32` file which is memory-mapped for reads,
+    and the SHA-256 of each text is appended to a key file in the same order. The
+    vector dimension is stored in a sidecar file when the cache is created. Only
+    texts missing from the cache are sent to the backend, `batch_size` at a time, so
+    representations, topic papers and summaries are embedded once across runs.
+
+    Args:
+        embeddings (Embeddings): The backend used for cache misses.
+        namespace (str): Cache directory name; must differ between backends.
+        batch_size (int): Number of texts sent to the backend per request.
+    """
+
+    def __init__(self, embeddings, namespace: str, batch_size: int = BATCH_SIZE):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.cache_dir = EMBEDDINGS_DIR / namespace
+        self.keys_path = self.cache_dir / "keys.txt"
+        self.vectors_path = self.cache_dir / "vectors.f32"
+        self.dim_path = self.cache_dir / "dim.txt"
+        self.lock = threading.Lock()
+        self.index = {}
+        self.dim = None
+        self._memmap = None
+        self._load()
+
+    def _load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if not self.keys_path.exists():
+            return
+        if not self.dim_path.exists():
+            logger.warning(f"No vector dimension in {self.cache_dir}, clearing cache.")
+            self.keys_path.unlink()
+            self.vectors_path.unlink(missing_ok=True)
+            return
+        self.dim = int(self.dim_path.read_text())
+        text = self.keys_path.read_text()
+        keys = text.splitlines()
+        if keys and not text.endswith("\n"):
+            keys.pop()  # a key line cut off mid-write
+        # keep only rows with both a key and a complete vector; an interrupted
+        # append can leave either file ahead of the other
+        n_rows = min(len(keys), self.vectors_path.stat().st_size // (4 * self.dim))
+        keys = keys[:n_rows]
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(n_rows * self.dim * 4)
+        self.keys_path.write_text("".join(f"{key}\n" for key in keys))
+        self.index = {key: row for row, key in enumerate(keys)}
+
+    def _vectors(self) -> np.memmap:
+        n_rows = len(self.index)
+        if self._memmap is None or self._memmap.shape[0] != n_rows:
+            self._memmap = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim)
+            )
+        return self._memmap
+
+    def _append(self, keys: list[str], vectors: np.ndarray):
+        # another caller may have embedded the same texts while the lock was free
+        rows = [row for row, key in enumerate(keys) if key not in self.index]
+        if not rows:
+            return
+        keys, vectors = [keys[row] for row in rows], vectors[rows]
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.dim_path.write_text(str(self.dim))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Backend returned {vectors.shape[1]}-d vectors for a "
+                f"{self.dim}-d cache in {self.cache_dir}"
+            )
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.keys_path, "a") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+        for key in keys:
+            self.index[key] = len(self.index)
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        keys = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        with self.lock:
+            missing = {
+                key: text for key, text in zip(keys, texts) if key not in self.index
+            }
+        # the backend is called without the lock, so concurrent callers, such as
+        # documents classified as they are dispatched, do not wait on each other
+        missing_keys = list(missing)
+        for i in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[i : i + self.batch_size]
+            vectors = self.embeddings.embed_documents([missing[k] for k in batch])
+            with self.lock:
+                self._append(batch, np.asarray(vectors, dtype=np.float32))
+        if missing:
+            logger.info(f"Embedded {len(missing)}/{len(texts)} uncached texts.")
+        with self.lock:
+            if not keys:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            return np.asarray(self._vectors()[[self.index[key] for key in keys]])
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+@lru_cache
+def get_embeddings(backend: str = EMBEDDINGS_BACKEND) -> CachedEmbeddings:
+    """Returns the shared, cached embeddings for `backend`.
+
+    Backends are `openai` (default), `local` (sentence-transformers) and `hashing`.
+    """
+    if backend == "local":
+        embeddings = SentenceTransformerEmbeddings()
+    elif backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings()
+    elif backend == "hashing":
+        embeddings = HashingEmbeddings()
+    else:
+        raise ValueError(f"Unknown embeddings backend: {backend}")
+    return CachedEmbeddings(embeddings, namespace=backend)
+
+
+def available_embeddings(
+    feature: str, backend: str = EMBEDDINGS_BACKEND
+) -> CachedEmbeddings | None:
+    """Returns `get_embeddings(backend)`, or `None` if it cannot be loaded.
+
+    For optional steps that can run without embeddings. The fallback is logged as
+    a warning naming `feature`, and a failed load is retried on the next call.
+    """
+    try:
+        return get_embeddings(backend)
+    except Exception as e:
+        logger.warning(f"Embeddings backend {backend} unavailable, {feature} off: {e}")
+        return None
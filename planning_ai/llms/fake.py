@@ -0,0 +1,47 @@
+import hashlib
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class ExtractiveChatModel(BaseChatModel):
+    """Deterministic local chat model for running chains offline.
+
+    Replies with the first `max_words` words of the last paragraph of the final
+    message, which for the summary and map prompts is the document. A `drift` share of
+    the words is replaced with text that is not in the document, so fake tiers
+    differ in hallucination rate. Token usage is reported as word counts.
+    """
+
+    max_words: int = 40
+    drift: float = 0.0
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "extractive-fake"
+
+    def _reply(self, text: str) -> str:
+        words = text.rsplit("\n\n", 1)[-1].split()[: self.max_words]
+        return " ".join(
+            "unverified" if _bucket(idx, word) < self.drift * 100 else word
+            for idx, word in enumerate(words)
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[-1].content
+        reply = self._reply(prompt)
+        usage = {
+            "input_tokens": sum(len(m.content.split()) for m in messages),
+            "output_tokens": len(reply.split()),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(content=reply, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _bucket(*keys) -> int:
+    return int(hashlib.md5(str(keys).encode()).hexdigest(), 16) % 100
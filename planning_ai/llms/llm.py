@@ -1,7 +1,79 @@
+from functools import lru_cache
+
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
-GPT4o = ChatOpenAI(temperature=0, model="gpt-4o-mini")
-O3Mini = ChatOpenAI(model="o3-mini")
+# the SDK's own retries are off, so transient errors are only retried by
+# `planning_ai.llms.retry.RetryPolicy`, against its per-run budget
+GPT4o = ChatOpenAI(temperature=0, model="gpt-4o-mini", max_retries=0)
+O3Mini = ChatOpenAI(model="o3-mini", max_retries=0)
+
+# model configurations compared by `planning_ai.eval.model_benchmark`; `price` is
+# USD per million input and output tokens
+MODELS = {
+    "gpt-4.1-nano": {"backend": "openai", "model": "gpt-4.1-nano", "price": (0.1, 0.4)},
+    "gpt-4o-mini": {"backend": "openai", "model": "gpt-4o-mini", "price": (0.15, 0.6)},
+    "gpt-4o": {"backend": "openai", "model": "gpt-4o", "price": (2.5, 10.0)},
+    "o3-mini": {"backend": "openai", "model": "o3-mini", "price": (1.1, 4.4)},
+    "llama3.1-8b": {"backend": "ollama", "model": "llama3.1:8b", "price": (0, 0)},
+    "fake-small": {"backend": "fake", "max_words": 15, "drift": 0.05, "price": (0, 0)},
+    "fake-large": {"backend": "fake", "max_words": 60, "drift": 0.0, "price": (0, 0)},
+}
+
+# share of the input price saved on prompt tokens read from the provider's cache
+CACHED_DISCOUNT = 0.5
+
+
+@lru_cache
+def get_llm(name: str):
+    """Builds the chat model for a configuration in `MODELS`.
+
+    `openai` models call the API, `ollama` models run on a local Ollama server and
+    `fake` models are deterministic and run offline.
+    """
+    config = MODELS[name]
+    if config["backend"] == "openai":
+        temperature = None if config["model"].startswith("o") else 0
+        return ChatOpenAI(model=config["model"], temperature=temperature, max_retries=0)
+    if config["backend"] == "ollama":
+        try:
+            from langchain_ollama import ChatOllama
+        except ImportError as e:
+            raise ImportError(
+                "The ollama backend requires `langchain-ollama` and a running "
+                "Ollama server."
+            ) from e
+        return ChatOllama(model=config["model"], temperature=0)
+    if config["backend"] == "fake":
+        from planning_ai.llms.fake import ExtractiveChatModel
+
+        return ExtractiveChatModel(max_words=config["max_words"], drift=config["drift"])
+    raise ValueError(f"Unknown backend: {config['backend']}")
+
+
+def estimate_cost(name: str, tokens: dict) -> float:
+    """Estimated USD cost of `tokens`, as counted by `MetricsCallback`.
+
+    Cached prompt tokens are charged at `1 - CACHED_DISCOUNT` of the input price.
+    """
+    input_price, output_price = MODELS[name]["price"]
+    input_tokens = tokens.get("input_tokens", tokens.get("prompt_tokens", 0))
+    output_tokens = tokens.get("output_tokens", tokens.get("completion_tokens", 0))
+    cached_tokens = tokens.get(
+        "input_token_details.cache_read",
+        tokens.get("prompt_tokens_details.cached_tokens", 0),
+    )
+    input_cost = (input_tokens - CACHED_DISCOUNT * cached_tokens) * input_price
+    return (input_cost + output_tokens * output_price) / 1e6
+
+
+def model_key(model_name: str) -> str | None:
+    """Maps a provider model name, e.g. `gpt-4o-mini-2024-07-18`, to its `MODELS` key."""
+    matches = [
+        name
+        for name, config in MODELS.items()
+        if "model" in config and model_name.startswith(config["model"])
+    ]
+    return max(matches, key=lambda name: len(MODELS[name]["model"]), default=None)
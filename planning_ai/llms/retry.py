@@ -0,0 +1,150 @@
+import os
+import random
+import threading
+import time
+
+import openai
+from langchain_core.runnables import RunnableLambda
+
+from planning_ai.logging import logger
+from planning_ai.telemetry import metrics
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# retries allowed per run: `RETRY_BUDGET` per document, but at least `MIN_RETRIES`
+RETRY_BUDGET = float(os.getenv("RETRY_BUDGET", 0.5))
+MIN_RETRIES = 20
+# consecutive transient failures that pause all calls for `BREAKER_COOLDOWN` seconds
+BREAKER_THRESHOLD = 10
+BREAKER_COOLDOWN = 30.0
+
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,  # includes timeouts
+    openai.RateLimitError,
+    openai.InternalServerError,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+def error_kind(error: Exception) -> str:
+    """Classifies a chain error as `transient` (worth retrying) or `validation`.
+
+    Rate limits, timeouts, dropped connections and 5xx responses are transient.
+    Everything else is treated as a validation error, e.g. a response that does
+    not match the output schema or a request the API rejects, and is not retried.
+    """
+    return "transient" if isinstance(error, TRANSIENT_ERRORS) else "validation"
+
+
+class RetryPolicy:
+    """Shared retry policy for chain calls made by the graph nodes.
+
+    Transient errors are retried up to `max_attempts` times. Each retry waits a
+    random time between zero and an exponentially growing cap (full jitter).
+    Retries come out of a per-run budget, so a failing API cannot multiply the
+    run's calls. After `breaker_threshold` consecutive transient failures the
+    circuit opens, and every caller waits out `breaker_cooldown` before calling
+    again.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_cooldown: float = BREAKER_COOLDOWN,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, n_docs: int = 0):
+        with self.lock:
+            self.retries_left = max(MIN_RETRIES, int(RETRY_BUDGET * n_docs))
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def _wait_for_breaker(self):
+        with self.lock:
+            wait = self.open_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures < self.breaker_threshold:
+                return
+            self.consecutive_failures = 0
+            self.open_until = time.monotonic() + self.breaker_cooldown
+        logger.warning(f"Circuit open: pausing calls for {self.breaker_cooldown}s")
+        metrics.breaker_opened()
+
+    def _take_retry(self) -> bool:
+        with self.lock:
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    def invoke(self, chain, inputs, config=None):
+        """Invokes `chain`, retrying transient errors.
+
+        Raises:
+            Exception: The last error, once it is not transient, the attempts are
+                used up or the run's retry budget is spent.
+        """
+        tic = time.perf_counter()
+        for attempt in range(self.max_attempts):
+            self._wait_for_breaker()
+            try:
+                output = chain.invoke(inputs, config=config)
+            except Exception as e:
+                if error_kind(e) != "transient":
+                    raise
+                self._record(ok=False)
+                if attempt + 1 == self.max_attempts or not self._take_retry():
+                    if attempt:
+                        metrics.retried_call(time.perf_counter() - tic, ok=False)
+                    raise
+                cap = min(self.max_delay, self.base_delay * 2**attempt)
+                delay = random.uniform(0, cap)
+                logger.warning(
+                    f"{type(e).__name__}; retry {attempt + 1} in {delay:.1f}s"
+                )
+                metrics.retried()
+                time.sleep(delay)
+                continue
+            self._record(ok=True)
+            if attempt:
+                metrics.retried_call(time.perf_counter() - tic, ok=True)
+            return output
+
+
+retry_policy = RetryPolicy()
+
+
+def invoke_with_retry(chain, inputs, config=None):
+    """Invokes `chain` with `inputs` under the shared `retry_policy`."""
+    return retry_policy.invoke(chain, inputs, config=config)
+
+
+def with_retry_policy(chain, policy: RetryPolicy = retry_policy) -> RunnableLambda:
+    """Wraps `chain` so each call, even from `.batch`, goes through `policy`.
+
+    The chat clients have the SDK's own retries turned off, so chains run outside
+    the graph nodes, such as the eval harness, use this to retry transient errors.
+    """
+    return RunnableLambda(
+        lambda inputs, config: policy.invoke(chain, inputs, config=config)
+    )
@@ -0,0 +1,58 @@
+import os
+
+from planning_ai.logging import logger
+
+# off by default: the saving and the quality of the cheaper tier have not been
+# measured against `DEFAULT_TIER` on a real consultation yet
+ROUTER_ENABLED = os.getenv("MODEL_ROUTER", "0") == "1"
+
+# summary models from cheapest to strongest; a failed hallucination check moves a
+# document one tier up for its fix. Escalation stops at `DEFAULT_TIER`, the model
+# used without routing, so routing never costs more than not routing.
+TIERS = ["gpt-4.1-nano", "gpt-4o-mini"]
+DEFAULT_TIER = "gpt-4o-mini"
+# documents under `SMALL_TOKENS` touching at most `SMALL_THEMES` themes start on the
+# cheapest tier
+SMALL_TOKENS = 300
+SMALL_THEMES = 2
+# documents under this many words are used verbatim as their own summary, with no
+# policy notes; 0 disables the extractive path
+EXTRACTIVE_WORDS = int(os.getenv("EXTRACTIVE_WORDS", 0))
+EXTRACTIVE = "extractive"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of English text, at about 3/4 of a word per token."""
+    return len(text.split()) * 4 // 3
+
+
+def route_summary(state) -> str:
+    """Picks the tier that writes a document's first summary.
+
+    Args:
+        state (DocumentState): Document with its themes assigned.
+
+    Returns:
+        str: `EXTRACTIVE` or a `MODELS` key from `TIERS`.
+    """
+    if not ROUTER_ENABLED:
+        return DEFAULT_TIER
+    text = state["document"].page_content
+    if len(text.split()) < EXTRACTIVE_WORDS:
+        return EXTRACTIVE
+    if estimate_tokens(text) < SMALL_TOKENS and len(state["themes"]) <= SMALL_THEMES:
+        return TIERS[0]
+    return DEFAULT_TIER
+
+
+def route_fix(state) -> str:
+    """Escalates to the tier above the one that wrote the hallucinated summary."""
+    if not ROUTER_ENABLED:
+        return DEFAULT_TIER
+    current = state.get("model", DEFAULT_TIER)
+    if current not in TIERS:
+        return DEFAULT_TIER
+    tier = TIERS[min(TIERS.index(current) + 1, len(TIERS) - 1)]
+    if tier != current:
+        logger.info(f"Escalating document {state['filename']} to {tier}")
+    return tier
@@ -1,98 +1,168 @@
+import hashlib
+import os
 import time
 from pathlib import Path
 
 import polars as pl
 from dotenv import load_dotenv
-from langchain_community.document_loaders import (
-    PolarsDataFrameLoader,
-    PyPDFDirectoryLoader,
-)
+from langchain_core.documents import Document
 
 from planning_ai.common.utils import Paths
 from planning_ai.documents.document import build_final_report, build_summaries_document
+from planning_ai.documents.render import RenderQueue
+from planning_ai.documents.store import DocumentStore
 from planning_ai.graph import create_graph
+from planning_ai.llms.retry import retry_policy
 from planning_ai.logging import logger
+from planning_ai.policies import policy_aggregator
+from planning_ai.preprocessing.gcpt3 import representations_documents, scan_gcpt3
+from planning_ai.preprocessing.layout import iter_layouts
+from planning_ai.telemetry import MetricsCallback, metrics
 
 load_dotenv()
 
+# serve document text from a memory-mapped Arrow file instead of holding it in state
+DOCUMENT_STORE = os.getenv("DOCUMENT_STORE", "1") == "1"
 
-def read_docs(representations_document: str):
-    logger.warning("Reading documents...")
-    df = (
-        pl.read_parquet(Paths.STAGING / "gcpt3.parquet")
-        .drop_nulls(subset="text")
-        .filter(pl.col("representations_document") == representations_document)
-    )
-    pdf_loader = PyPDFDirectoryLoader(
-        (Paths.STAGING / "pdfs_azure"), silent_errors=True
-    )
 
-    logger.warning("Loading PDFs...")
-    pdfs = pdf_loader.load()
-
-    for pdf in pdfs:
-        pdf.metadata["id"] = Path(pdf.metadata["source"]).stem
-        meta = (
-            df.filter(pl.col("attachments_id") == int(pdf.metadata["id"]))
-            .select(["respondentpostcode", "representations_support/object"])
-            .to_dict(as_series=False)
+def _attachment_metadata(df: pl.DataFrame) -> dict:
+    """Maps each attachment id to the postcode and stance of its representation."""
+    metadata = {}
+    for row in (
+        df.drop_nulls(subset="attachments_id")
+        .select(
+            ["attachments_id", "respondentpostcode", "representations_support/object"]
         )
-        pdf.metadata = pdf.metadata | {
-            "respondentpostcode": (
-                meta["respondentpostcode"][0] if meta["respondentpostcode"] else ""
-            ),
+        .iter_rows(named=True)
+    ):
+        metadata.setdefault(row.pop("attachments_id"), row)
+    return metadata
+
+
+def iter_docs(df: pl.DataFrame):
+    """Yields the text of each representation and PDF page with its metadata.
+
+    Documents are produced one at a time, so the corpus is never held as a list
+    of `Document`s. Documents of 25 words or fewer are dropped, as are documents
+    whose text repeats an earlier one; only a digest of each text is kept to
+    find repeats.
+
+    Args:
+        df (pl.DataFrame): Representations of one consultation document.
+
+    Yields:
+        tuple[int, str, dict]: The document's filename, text and metadata.
+    """
+    seen = set()
+
+    def keep(text: str) -> bool:
+        if not text or len(text.split(" ")) <= 25:
+            return False
+        digest = hashlib.md5(text.encode()).digest()
+        if digest in seen:
+            return False
+        seen.add(digest)
+        return True
+
+    logger.warning("Loading text files...")
+    for row in (
+        df.unique("id").with_columns(filename=pl.col("id")).iter_rows(named=True)
+    ):
+        text = row.pop("text")
+        if keep(text):
+            yield row["filename"], text, row
+
+    logger.warning("Loading PDFs...")
+    attachments = _attachment_metadata(df)
+    for pdf in iter_layouts():
+        if not keep(pdf.page_content):
+            continue
+        pdf_id = Path(pdf.metadata["source"]).stem
+        meta = attachments.get(int(pdf_id), {})
+        # for now I concat page number to keep all pdf pages separate. I might want
+        # to instead combine pdfs somehow
+        filename = int(f"{pdf_id}999{pdf.metadata['page']}")
+        yield filename, pdf.page_content, pdf.metadata | {
+            "id": pdf_id,
+            "respondentpostcode": meta.get("respondentpostcode") or "",
             "representations_support/object": (
-                meta["representations_support/object"][0]
-                if meta["representations_support/object"]
-                else ""
+                meta.get("representations_support/object") or ""
             ),
+            "filename": filename,
         }
-        # for now I concat page number to keep all pdf pages separate. I might want
-        # to instead combine pdfs somehow
-        pdf.metadata["filename"] = int(f"{pdf.metadata['id']}999{pdf.metadata['page']}")
 
-    df = df.unique("id").with_columns(filename=pl.col("id"))
 
-    loader = PolarsDataFrameLoader(df, page_content_column="text")
-    logger.warning("Loading text files...")
-    text = loader.load()
-    out = text + pdfs
-
-    # removes duplicates documents based on page_content
-    docs = list(
-        {
-            doc.page_content: doc
-            for doc in out
-            if doc.page_content and len(doc.page_content.split(" ")) > 25
-        }.values()
+def read_docs(representations_document: str):
+    logger.warning("Reading documents...")
+    df = (
+        scan_gcpt3()
+        .filter(pl.col("representations_document") == representations_document)
+        .drop_nulls(subset="text")
+        .collect()
+    )
+    docs = iter_docs(df)
+    if not DOCUMENT_STORE:
+        return [
+            {
+                "document": Document(page_content=text, metadata=metadata),
+                "filename": filename,
+            }
+            for filename, text, metadata in docs
+        ]
+
+    # keep only metadata in the graph state; text is streamed into the mapped
+    # store and read back from it
+    metadata = []
+
+    def texts():
+        for filename, text, meta in docs:
+            metadata.append(meta)
+            yield filename, text
+
+    store_name = hashlib.md5(representations_document.encode()).hexdigest()
+    store = DocumentStore.build(
+        Paths.STAGING / "documents" / f"{store_name}.arrow", texts()
     )
-    return [{"document": doc, "filename": doc.metadata["filename"]} for doc in docs]
+    return [
+        {
+            "document": store.document(meta["filename"], meta),
+            "filename": meta["filename"],
+        }
+        for meta in metadata
+    ]
 
 
-def main():
-    representations_documents = (
-        pl.read_parquet(Paths.STAGING / "gcpt3.parquet")["representations_document"]
-        .unique()
-        .to_list()
-    )
-    for rep in representations_documents:
-        docs = read_docs(rep)
-        n_docs = len(docs)
+def main(on_progress=None):
+    rep_documents = representations_documents()
+    with RenderQueue() as queue:
+        for idx, rep in enumerate(rep_documents, start=1):
+            docs = read_docs(rep)
+            n_docs = len(docs)
+
+            logger.info(f"{n_docs} documents being processed!")
+            app = create_graph()
 
-        logger.info(f"{n_docs} documents being processed!")
-        app = create_graph()
+            metrics.reset(rep, n_docs)
+            retry_policy.reset(n_docs)
+            policy_aggregator.reset()
+            step = None
+            for step in app.stream(
+                {"documents": docs, "n_docs": n_docs},
+                config={"callbacks": [MetricsCallback()]},
+            ):
+                logger.debug(f"Completed step: {list(step.keys())}")
+            metrics.log_summary()
 
-        step = None
-        for step in app.stream({"documents": docs, "n_docs": n_docs}):
-            print(step.keys())
+            if step is None:
+                raise ValueError("No steps were processed!")
 
-        if step is None:
-            raise ValueError("No steps were processed!")
+            build_final_report(step, rep, queue)
+            build_summaries_document(step, rep, queue)
 
-        build_final_report(step, rep)
-        build_summaries_document(step, rep)
+            if on_progress is not None:
+                on_progress(rep, idx, len(rep_documents))
 
-    return representations_documents
+    return rep_documents
 
 
 if __name__ == "__main__":
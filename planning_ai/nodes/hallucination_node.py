@@ -1,20 +1,36 @@
 from langgraph.types import Send
 
-from planning_ai.chains.fix_chain import fix_template
+from planning_ai.chains.fix_chain import fix_input, fix_template
 from planning_ai.chains.hallucination_chain import hallucination_chain
 from planning_ai.chains.map_chain import create_dynamic_map_chain
+from planning_ai.llms.llm import get_llm
+from planning_ai.llms.retry import error_kind, invoke_with_retry
+from planning_ai.llms.router import route_fix
 from planning_ai.logging import logger
+from planning_ai.policies import policy_aggregator
 from planning_ai.states import DocumentState, OverallState
+from planning_ai.telemetry import metrics
 
 MAX_ATTEMPTS = 3
 
 
+def no_progress(state: DocumentState, response) -> bool:
+    """Whether a fix made no measurable progress on a hallucinated summary.
+
+    A fix that returns the summary unchanged would get the same check result, so
+    the remaining attempts cannot help and the document is stopped early.
+    """
+    return response.summary == state["summary"].summary
+
+
 def check_hallucination(state: DocumentState):
     """Checks for hallucinations in the summary of a document.
 
     This function uses the `hallucination_chain` to evaluate the summary of a document.
     If the hallucination score is 1, it indicates no hallucination, and the summary is
-    considered fixed. If the iteration count exceeds 5, the process is terminated.
+    considered fixed and its policy notes are passed to `policy_aggregator`. A
+    hallucinated summary is sent for fixing until `MAX_ATTEMPTS` checks have been
+    made; the document is then marked as failed.
 
     Args:
         state (DocumentState): The current state of the document, including its summary
@@ -26,21 +42,24 @@ def check_hallucination(state: DocumentState):
     """
     logger.info(f"Checking hallucinations for document {state['filename']}")
 
-    if state["processed"] or (state["refinement_attempts"] >= MAX_ATTEMPTS):
+    if state["refinement_attempts"] >= MAX_ATTEMPTS:
         logger.error(f"Max attempts exceeded for document: {state['filename']}")
         return {"documents": [{**state, "failed": True, "processed": True}]}
     elif not state["is_hallucinated"]:
         logger.info(f"Finished processing document: {state['filename']}")
+        policy_aggregator.add(state)
         return {"documents": [{**state, "processed": True}]}
 
     try:
-        response = hallucination_chain.invoke(
-            {"document": state["document"], "summary": state["summary"].summary}
+        response = invoke_with_retry(
+            hallucination_chain,
+            {"document": state["document"], "summary": state["summary"].summary},
         )
         is_hallucinated = response.score == 0
         refinement_attempts = state["refinement_attempts"] + 1
     except Exception as e:
-        logger.error(f"Failed to decode JSON {state['filename']}: {e}")
+        logger.error(f"Failed to check document {state['filename']}: {e}")
+        metrics.failed_call("check_hallucination", error_kind(e))
         return {
             "documents": [
                 {
@@ -61,18 +80,22 @@ def check_hallucination(state: DocumentState):
         "is_hallucinated": is_hallucinated,
     }
     logger.info(f"Hallucination for {state['filename']}: {is_hallucinated}")
-    return (
-        {"documents": [{**out, "processed": False}]}
-        if is_hallucinated
-        else {"documents": [{**out, "processed": True}]}
-    )
+    if not is_hallucinated:
+        policy_aggregator.add(out)
+        return {"documents": [{**out, "processed": True}]}
+
+    if refinement_attempts >= MAX_ATTEMPTS:
+        logger.error(f"Stopping refinement for document: {state['filename']}")
+        return {"documents": [{**out, "failed": True, "processed": True}]}
+    return {"documents": [{**out, "processed": False}]}
 
 
 def fix_hallucination(state: DocumentState):
     """Attempts to fix hallucinations in a document's summary.
 
-    This function uses the `fix_chain` to correct hallucinations identified in a summary.
-    The corrected summary is then updated in the document state.
+    This function uses the `fix_chain` to correct hallucinations identified in a summary,
+    on the model tier above the one that wrote it (see `route_fix`). The corrected
+    summary is then updated in the document state.
 
     Args:
         state (DocumentState): The current state of the document, including its summary
@@ -84,17 +107,23 @@ def fix_hallucination(state: DocumentState):
     """
     logger.warning(f"Fixing hallucinations for document {state['filename']}")
     themes = [theme["theme"].value for theme in state["themes"]]
-    fix_chain = create_dynamic_map_chain(themes, fix_template)
+    model = route_fix(state)
+    metrics.routed(model)
+    fix_chain = create_dynamic_map_chain(
+        themes, fix_template, llm=get_llm(model), human=fix_input
+    )
     try:
-        response = fix_chain.invoke(
+        response = invoke_with_retry(
+            fix_chain,
             {
                 "context": state["document"],
                 "summary": state["summary"].summary,
                 "explanation": state["hallucination"].explanation,
-            }
+            },
         )
     except Exception as e:
-        logger.error(f"Failed to decode JSON {state['filename']}: {e}.")
+        logger.error(f"Failed to fix document {state['filename']}: {e}")
+        metrics.failed_call("fix_hallucination", error_kind(e))
         return {
             "documents": [
                 {
@@ -107,16 +136,40 @@ def fix_hallucination(state: DocumentState):
                 }
             ]
         }
-    return {"documents": [{**state, "summary": response}]}
+    if no_progress(state, response):
+        logger.error(f"Fix left summary unchanged for document: {state['filename']}")
+        return {"documents": [{**state, "failed": True, "processed": True}]}
+    return {"documents": [{**state, "summary": response, "model": model}]}
 
 
 def map_check(state: OverallState):
-    return [Send("check_hallucination", doc) for doc in state["documents"]]
+    """Sends only unfinished documents to be checked.
+
+    Routes straight to `generate_final_report` once every document is processed,
+    which can happen when all summaries fail or every fix stops early.
+    """
+    documents = state["documents"]
+    if documents.complete:
+        return "generate_final_report"
+    return [Send("check_hallucination", doc) for doc in documents.pending_documents()]
 
 
 def map_fix(state: OverallState):
+    """Sends hallucinated documents to be fixed, or finishes once all are processed."""
+    documents = state["documents"]
+    if documents.complete:
+        return "generate_final_report"
     return [
         Send("fix_hallucination", doc)
-        for doc in state["documents"]
-        if doc["is_hallucinated"] and not doc["processed"]
+        for doc in documents.pending_documents()
+        if doc["is_hallucinated"]
     ]
+
+
+def join_wave(state: OverallState) -> dict:
+    """Waits for a superstep to finish so the next routing sees every document.
+
+    A conditional edge on a fanned-out node only sees that task's own writes, so
+    the stage graph routes from this node instead.
+    """
+    return {}
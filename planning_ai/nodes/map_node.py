@@ -1,13 +1,24 @@
+import os
+
 import numpy as np
 import spacy
 from langgraph.types import Send
 from presidio_analyzer import AnalyzerEngine
 from presidio_anonymizer import AnonymizerEngine
 
-from planning_ai.chains.map_chain import create_dynamic_map_chain, map_template
+from planning_ai.chains.map_chain import (
+    create_dynamic_map_chain,
+    extractive_summary,
+    map_template,
+)
 from planning_ai.chains.themes_chain import themes_chain
+from planning_ai.llms.llm import get_llm
+from planning_ai.llms.retry import error_kind, invoke_with_retry
+from planning_ai.llms.router import EXTRACTIVE, estimate_tokens, route_summary
 from planning_ai.logging import logger
+from planning_ai.retrievers.theme_classifier import get_theme_classifier
 from planning_ai.states import DocumentState, OverallState
+from planning_ai.telemetry import metrics
 
 analyzer = AnalyzerEngine()
 anonymizer = AnonymizerEngine()
@@ -15,16 +26,27 @@ anonymizer = AnonymizerEngine()
 nlp = spacy.load("en_core_web_lg")
 
 
+# assign confident themes from the theme index before calling `themes_chain`
+THEME_PREFILTER = os.getenv("THEME_PREFILTER", "1") == "1"
+
+
 def retrieve_themes(state: DocumentState) -> DocumentState:
-    try:
-        result = themes_chain.invoke({"document": state["document"].page_content})
-        if not result.themes:
-            state["themes"] = []
-            return state
-        themes = [theme.model_dump() for theme in result.themes]
-    except Exception as e:
-        logger.error(f"Theme selection error: {e}")
-        themes = []
+    if state.get("themes"):
+        # confidently assigned by `prefilter_themes`
+        themes = state["themes"]
+    else:
+        try:
+            result = invoke_with_retry(
+                themes_chain, {"document": state["document"].page_content}
+            )
+            if not result.themes:
+                state["themes"] = []
+                return state
+            themes = [theme.model_dump() for theme in result.themes]
+        except Exception as e:
+            logger.error(f"Theme selection error: {e}")
+            metrics.failed_call("retrieve_themes", error_kind(e))
+            themes = []
     state["themes"] = [d for d in themes if d["score"] > 2]
     score = np.mean([theme["score"] for theme in state["themes"]])
     if score < 3:
@@ -70,7 +92,10 @@ def generate_summary(state: DocumentState) -> dict:
     """Generates a summary for a document after removing PII.
 
     This function first anonymizes the document to remove PII, then generates a summary
-    using the `map_chain`. The summary is added to the document state.
+    using the `map_chain` on the model picked by `route_summary`. The summary and the
+    model used are added to the document state. Themes come from `prefilter_themes`
+    where the theme index is confident, and from `themes_chain` otherwise; both only
+    see the anonymized text.
 
     Args:
         state (DocumentState): The current state of the document, including its text
@@ -82,7 +107,15 @@ def generate_summary(state: DocumentState) -> dict:
     logger.info(f"Generating summary for document: {state['filename']}")
 
     logger.info(f"Starting PII removal for: {state['filename']}")
-    state["document"].page_content = remove_pii(state["document"].page_content)
+    document = state["document"]
+    state = {
+        **state,
+        "document": document.model_copy(
+            update={"page_content": remove_pii(document.page_content)}
+        ),
+    }
+    if THEME_PREFILTER:
+        state = prefilter_themes(state)
     logger.info(f"Retrieving themes for: {state['filename']}")
     state = retrieve_themes(state)
 
@@ -102,11 +135,33 @@ def generate_summary(state: DocumentState) -> dict:
         }
 
     themes = [theme["theme"].value for theme in state["themes"]]
-    map_chain = create_dynamic_map_chain(themes=themes, prompt=map_template)
+    model = route_summary(state)
+    metrics.routed(model, estimate_tokens(state["document"].page_content))
+    if model == EXTRACTIVE:
+        logger.info(f"Using document {state['filename']} as its own summary")
+        return {
+            "documents": [
+                {
+                    **state,
+                    "summary": extractive_summary(state["document"].page_content),
+                    "model": model,
+                    "refinement_attempts": 0,
+                    "is_hallucinated": False,  # verbatim, so nothing to check
+                    "failed": False,
+                    "processed": False,
+                }
+            ]
+        }
+    map_chain = create_dynamic_map_chain(
+        themes=themes, prompt=map_template, llm=get_llm(model)
+    )
     try:
-        response = map_chain.invoke({"context": state["document"].page_content})
+        response = invoke_with_retry(
+            map_chain, {"context": state["document"].page_content}
+        )
     except Exception as e:
-        logger.error(f"Failed to decode JSON {state['document']}: {e}")
+        logger.error(f"Failed to summarise document {state['filename']}: {e}")
+        metrics.failed_call("generate_summary", error_kind(e))
         return {
             "documents": [
                 {
@@ -126,6 +181,7 @@ def generate_summary(state: DocumentState) -> dict:
             {
                 **state,
                 "summary": response,
+                "model": model,
                 "refinement_attempts": 0,
                 "is_hallucinated": True,  # start true to ensure cycle begins
                 "failed": False,
@@ -135,6 +191,26 @@ def generate_summary(state: DocumentState) -> dict:
     }
 
 
-def map_documents(state: OverallState) -> list[Send]:
-    logger.info("Mapping documents to generate summaries.")
-    return [Send("generate_summary", document) for document in state["documents"]]
+def prefilter_themes(state: DocumentState) -> DocumentState:
+    """Assigns themes from the theme index where the neighbour vote is confident.
+
+    Runs inside `generate_summary` after PII removal, so no raw text is embedded
+    and each document is classified as soon as it is dispatched. Documents that
+    are not confidently classified, or any document when the index is
+    unavailable, are left without themes and `retrieve_themes` falls back to
+    `themes_chain`.
+    """
+    if state.get("themes"):
+        return state
+    classifier = get_theme_classifier()
+    if classifier is None:
+        return state
+    themes = classifier.classify([state["document"].page_content])[0]
+    if themes is not None:
+        state["themes"] = themes
+    return state
+
+
+def map_documents(state: OverallState, node: str = "generate_summary") -> list[Send]:
+    logger.info(f"Mapping documents to {node}.")
+    return [Send(node, document) for document in state["documents"]]
@@ -0,0 +1,30 @@
+from planning_ai.nodes.hallucination_node import check_hallucination, fix_hallucination
+from planning_ai.nodes.map_node import generate_summary
+from planning_ai.states import DocumentState
+from planning_ai.telemetry import instrument_node
+
+# instrumented like the stage graph's nodes, so per-stage timings are comparable
+_generate_summary = instrument_node("generate_summary", generate_summary)
+_check_hallucination = instrument_node("check_hallucination", check_hallucination)
+_fix_hallucination = instrument_node("fix_hallucination", fix_hallucination)
+
+
+def process_document(state: DocumentState) -> dict:
+    """Runs one document through summary, check and fix until it is processed.
+
+    Unlike the stage graph, where every document waits for the slowest one at
+    each superstep, a document moves to its next step as soon as its own
+    previous step finishes.
+
+    Args:
+        state (DocumentState): The document to summarise.
+
+    Returns:
+        dict: The finished document, as returned by `check_hallucination`.
+    """
+    doc = _generate_summary(state)["documents"][0]
+    while not doc["processed"]:
+        doc = _check_hallucination(doc)["documents"][0]
+        if not doc["processed"] and doc["is_hallucinated"]:
+            doc = _fix_hallucination(doc)["documents"][0]
+    return {"documents": [doc]}
@@ -1,14 +1,29 @@
 import json
+import os
 from pathlib import Path
 
 import polars as pl
 
 from planning_ai.chains.policy_chain import policy_chain
-from planning_ai.chains.reduce_chain import reduce_chain, reduce_chain_final
+from planning_ai.chains.reduce_chain import (
+    encode_summaries,
+    join_reports,
+    reduce_chain,
+    reduce_chain_final,
+)
+from planning_ai.common.clustering import cluster_batches
+from planning_ai.llms.embeddings import available_embeddings
+from planning_ai.llms.retry import error_kind, invoke_with_retry
 from planning_ai.logging import logger
+from planning_ai.policies import dedupe_notes, format_notes, policy_aggregator
 from planning_ai.states import OverallState
+from planning_ai.telemetry import metrics
 from planning_ai.themes import THEMES_AND_POLICIES
 
+REDUCE_BATCH_SIZE = 50
+# batch summaries for `reduce_chain` by embedding clusters instead of `doc_id` order
+TOPIC_BATCHING = os.getenv("TOPIC_BATCHING", "1") == "1"
+
 
 def save_summaries_to_json(docs):
     """Saves summaries to JSON files.
@@ -60,12 +75,32 @@ def extract_policies_from_docs(docs):
 def add_doc_id(final_docs):
     out_docs = []
     for id, doc in enumerate(final_docs):
-        doc["summary"].summary = f"Document ID: [{id}]\n\n{doc['summary'].summary}"
         doc["doc_id"] = id
         out_docs.append(doc)
     return out_docs
 
 
+def topic_batches(texts: list[str], batch_size: int = REDUCE_BATCH_SIZE):
+    """Groups texts into reduce batches by topic, falling back to input order.
+
+    Args:
+        texts (list[str]): Summary texts, in `doc_id` order.
+        batch_size (int): Maximum number of summaries per `reduce_chain` call.
+
+    Returns:
+        list[list[int]]: Indices into `texts` for each batch.
+    """
+    embeddings = None
+    if TOPIC_BATCHING and len(texts) > batch_size:
+        embeddings = available_embeddings("topic batching")
+    if embeddings is None:
+        return [
+            list(range(i, min(i + batch_size, len(texts))))
+            for i in range(0, len(texts), batch_size)
+        ]
+    return cluster_batches(embeddings.embed_array(texts), batch_size)
+
+
 def batch_generate_executive_summaries(summaries):
     """Processes summaries to generate final responses.
 
@@ -75,17 +110,12 @@ def batch_generate_executive_summaries(summaries):
     Returns:
         list: A list of final responses.
     """
-    summaries_text = [
-        f"Document ID: {[s['doc_id']]}\n\n{s['summary'].summary}" for s in summaries
-    ]
+    batches = topic_batches([s["summary"].summary for s in summaries])
     final_responses = []
-    batch_size = 50
-    for i in range(0, len(summaries_text), batch_size):
-        logger.info(
-            f"Processing batches... {int(i/50)+1}/{(len(summaries_text)//batch_size)+1}"
-        )
-        batch = summaries_text[i : i + batch_size]
-        response = reduce_chain.invoke({"context": batch})
+    for i, batch in enumerate(batches, start=1):
+        logger.info(f"Processing batches... {i}/{len(batches)}")
+        context = encode_summaries([summaries[idx] for idx in batch])
+        response = invoke_with_retry(reduce_chain, {"context": context})
         final_responses.append(response)
     return final_responses
 
@@ -98,21 +128,24 @@ def generate_policy_output(policy_groups):
         .rows(named=True)
     ):
         logger.info(f"Processing policies: {policy['policies']}...")
-        zipped = [
-            f"{bullet} Doc ID: {id}"
+        notes = [
+            {"detail": bullet, "doc_id": [id]}
             for (bullet, id) in zip(policy["details"], policy["doc_id"], strict=True)
         ]
+        zipped = format_notes(dedupe_notes(notes))
         try:
-            reduced = policy_chain.invoke(
+            reduced = invoke_with_retry(
+                policy_chain,
                 {
                     "theme": policy["themes"],
                     "policy": policy["policies"],
                     "details": zipped,
-                }
+                },
             )
             out.extend(policy | p for p in reduced.dict()["policies"])
         except Exception as e:
             logger.error(f"Failed to generate policies for {policy['policies']}: {e}")
+            metrics.failed_call("generate_policy_output", error_kind(e))
             continue
     return (
         pl.DataFrame(out)
@@ -122,10 +155,16 @@ def generate_policy_output(policy_groups):
 
 
 def generate_final_report(state: OverallState):
-    final_docs = [doc for doc in state["documents"] if doc["processed"]]
-    if len(final_docs) == state["n_docs"]:
-        logger.info(f"Generating final report... ({len(final_docs)} documents)")
-        return final_output(final_docs)
+    """Reduces the processed documents, once all of them have finished.
+
+    The graph only routes here when `state["documents"]` has no pending
+    documents, so the check is O(1) and the reduce runs once per run.
+    """
+    documents = state["documents"]
+    if not documents.complete or len(documents) != state["n_docs"]:
+        return
+    logger.info(f"Generating final report... ({len(documents)} documents)")
+    return final_output(list(documents))
 
 
 def final_output(final_docs):
@@ -137,12 +176,17 @@ def final_output(final_docs):
     ]
     docs = add_doc_id(docs)
 
-    policy_groups = extract_policies_from_docs(docs)
-    policies = generate_policy_output(policy_groups)
+    if policy_aggregator.active:
+        # notes were grouped, and mostly reduced, while documents finished
+        policies = policy_aggregator.result(docs)
+    else:
+        policy_groups = extract_policies_from_docs(docs)
+        policies = generate_policy_output(policy_groups)
 
     batch_executive = batch_generate_executive_summaries(docs)
-    executive = reduce_chain_final.invoke(
-        {"context": "Executive Report:\n\n".join(batch_executive)}
+    executive = invoke_with_retry(
+        reduce_chain_final,
+        {"context": join_reports(batch_executive)},
     )
     return {
         "executive": executive,
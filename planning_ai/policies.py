@@ -0,0 +1,214 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from planning_ai.chains.policy_chain import policy_chain
+from planning_ai.llms.embeddings import available_embeddings
+from planning_ai.llms.retry import error_kind, invoke_with_retry
+from planning_ai.logging import logger
+from planning_ai.telemetry import metrics
+from planning_ai.themes import THEMES_AND_POLICIES
+
+ONLINE_POLICIES = os.getenv("ONLINE_POLICIES", "1") == "1"
+# notes a (theme, policy, stance) group collects before a partial reduction starts
+PARTIAL_SIZE = 50
+POLICY_WORKERS = 4
+DEDUP_NOTES = os.getenv("DEDUP_NOTES", "1") == "1"
+# cosine similarity above which two notes are treated as the same point
+DEDUP_THRESHOLD = 0.9
+DEDUP_BLOCK = 1024
+
+
+def format_notes(notes: list[dict]) -> list[str]:
+    """Formats notes as `policy_chain` details, each followed by its doc_ids."""
+    return [
+        f"{note['detail']} Doc ID: {', '.join(str(id) for id in note['doc_id'])}"
+        for note in notes
+    ]
+
+
+def dedupe_notes(notes: list[dict], threshold: float = DEDUP_THRESHOLD) -> list[dict]:
+    """Collapses near-identical policy notes into one note with all their doc_ids.
+
+    Notes are embedded in one batch and clustered greedily: each note joins the
+    first earlier representative it is at least `threshold` similar to, or becomes
+    a representative itself. Similarities are computed `DEDUP_BLOCK` notes at a
+    time, against the representatives so far and within the block.
+
+    Args:
+        notes (list[dict]): Notes with a `detail` and a `doc_id` list.
+        threshold (float): Cosine similarity needed to merge two notes.
+
+    Returns:
+        list[dict]: One note per cluster, keeping the first note's `detail` and
+        the doc_ids of every note in the cluster, in order.
+    """
+    if not DEDUP_NOTES or len(notes) < 2:
+        return notes
+    embeddings = available_embeddings("note dedup")
+    if embeddings is None:
+        return notes
+    notes = list(notes)
+    vectors = embeddings.embed_array([note["detail"] for note in notes])
+
+    reps = []
+    for start in range(0, len(notes), DEDUP_BLOCK):
+        block = vectors[start : start + DEDUP_BLOCK]
+        to_reps = block @ vectors[reps].T if reps else None
+        within = block @ block.T
+        block_reps = []
+        for i in range(len(block)):
+            if to_reps is not None and to_reps[i].max() >= threshold:
+                target = reps[int(to_reps[i].argmax())]
+            elif block_reps and within[i, block_reps].max() >= threshold:
+                target = start + block_reps[int(within[i, block_reps].argmax())]
+            else:
+                block_reps.append(i)
+                continue
+            note = notes[start + i]
+            notes[target] = {
+                **notes[target],
+                "doc_id": notes[target]["doc_id"] + note["doc_id"],
+            }
+        reps.extend(start + i for i in block_reps)
+
+    deduped = [
+        {**notes[rep], "doc_id": list(dict.fromkeys(notes[rep]["doc_id"]))}
+        for rep in reps
+    ]
+    if len(deduped) < len(notes):
+        logger.info(f"Deduplicated {len(notes)} policy notes to {len(deduped)}.")
+    return deduped
+
+
+class PolicyAggregator:
+    """Groups policy notes as documents finish and reduces them in the background.
+
+    Each successfully processed document adds its notes to a (theme, policy,
+    stance) group. Once a group holds `partial_size` notes they are handed to
+    `policy_chain` on a worker thread, so most of the reduction overlaps with the
+    map stage. `result` then only merges each group's partial reductions and
+    leftover notes.
+
+    Documents are numbered as they arrive, since their final `doc_id` is only
+    assigned by `add_doc_id` once every document is processed; `result` maps the
+    numbers back.
+    """
+
+    def __init__(
+        self, partial_size: int = PARTIAL_SIZE, max_workers: int = POLICY_WORKERS
+    ):
+        self.partial_size = partial_size
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.executor = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ThreadPoolExecutor(self.max_workers)
+            self.ids = {}
+            self.notes = {}
+            self.partials = {}
+
+    @property
+    def active(self) -> bool:
+        return ONLINE_POLICIES and bool(self.ids)
+
+    def add(self, doc: dict):
+        """Adds the policy notes of a successfully processed document."""
+        policies = getattr(doc["summary"], "policies", None)
+        if not ONLINE_POLICIES or not policies:
+            return
+        stance = doc["document"].metadata.get("representations_support/object")
+        with self.lock:
+            id = self.ids.setdefault(doc["filename"], len(self.ids))
+            for policy in policies:
+                for theme, p in THEMES_AND_POLICIES.items():
+                    if policy.policy.name not in p:
+                        continue
+                    key = (theme, policy.policy.name, stance)
+                    notes = self.notes.setdefault(key, [])
+                    notes.append({"detail": policy.note, "doc_id": [id]})
+                    if len(notes) >= self.partial_size:
+                        self.partials.setdefault(key, []).append(
+                            self.executor.submit(self._reduce, key, notes)
+                        )
+                        self.notes[key] = []
+
+    def _reduce(self, key, notes: list[dict]) -> list[dict]:
+        theme, policy, _ = key
+        notes = dedupe_notes(notes)
+        logger.info(f"Processing policies: {policy} ({len(notes)} notes)...")
+        try:
+            reduced = invoke_with_retry(
+                policy_chain,
+                {"theme": theme, "policy": policy, "details": format_notes(notes)},
+            )
+        except Exception as e:
+            logger.error(f"Failed to generate policies for {policy}: {e}")
+            metrics.failed_call("generate_policy_output", error_kind(e))
+            return notes
+        return reduced.dict()["policies"]
+
+    def _merge(self, key, partials, notes: list[dict]) -> list[dict]:
+        reduced = [note for partial in partials for note in partial.result()]
+        if len(partials) == 1 and not notes:
+            return reduced
+        return self._reduce(key, reduced + notes)
+
+    def result(self, docs: list[dict]) -> pl.DataFrame:
+        """Merges every group into the same table as `generate_policy_output`.
+
+        Args:
+            docs (list[dict]): The documents in the final report, with their
+                `doc_id` assigned.
+
+        Returns:
+            pl.DataFrame: `themes`, `policies`, `stance` and lists of `detail` and
+            `doc_id`, one row per group.
+        """
+        doc_ids = {
+            self.ids[doc["filename"]]: doc["doc_id"]
+            for doc in docs
+            if doc["filename"] in self.ids
+        }
+        with self.lock:
+            keys = set(self.notes) | set(self.partials)
+            merges = {
+                key: self.executor.submit(
+                    self._merge,
+                    key,
+                    self.partials.get(key, []),
+                    self.notes.get(key, []),
+                )
+                for key in keys
+            }
+            self.notes, self.partials = {}, {}
+
+        out = []
+        for (theme, policy, stance), merge in merges.items():
+            for note in merge.result():
+                ids = [doc_ids[id] for id in note["doc_id"] if id in doc_ids]
+                if ids:
+                    out.append(
+                        {
+                            "themes": theme,
+                            "policies": policy,
+                            "stance": stance,
+                            "detail": note["detail"],
+                            "doc_id": ids,
+                        }
+                    )
+        return (
+            pl.DataFrame(out)
+            .group_by(["themes", "policies", "stance"])
+            .agg(["detail", "doc_id"])
+        )
+
+
+policy_aggregator = PolicyAggregator()
@@ -1,15 +1,36 @@
+import json
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import polars as pl
 from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeOutputOption, AnalyzeResult
+from azure.ai.documentintelligence.models import AnalyzeResult
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import (
+    HttpResponseError,
+    ServiceRequestError,
+    ServiceResponseError,
+)
 from dotenv import load_dotenv
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader
 from pypdf.errors import PdfReadError
 from tqdm import tqdm
 
 from planning_ai.common.utils import Paths
+from planning_ai.preprocessing.layout import (
+    LAYOUT_DIR,
+    layout_from_azure,
+    layout_from_pdf,
+    layout_path,
+    migrate_searchable_pdfs,
+    page_text_density,
+    split_page_ranges,
+    stitch_layouts,
+    write_layout,
+)
 
 load_dotenv()
 
@@ -17,77 +38,152 @@ endpoint = os.getenv("AZURE_API_ENDPOINT") or ""
 credential = AzureKeyCredential(os.getenv("AZURE_API_KEY") or "")
 document_intelligence_client = DocumentIntelligenceClient(endpoint, credential)
 
+# pages with less embedded text than this are OCR'd; the rest use their text layer
+MIN_PAGE_CHARS = 200
+# Azure's upload limit on the tier in use; larger PDFs are OCR'd in parts
+MAX_PART_BYTES = 1_000_000
+OCR_WORKERS = 4
+# attempts per part; the client already retries each request, so these cover a
+# part that still fails, e.g. under sustained throttling with parts in flight
+OCR_ATTEMPTS = 4
+OCR_BASE_DELAY = 5.0
+
 
 def read_pdf(pdf_path):
     try:
-        reader = PdfReader(pdf_path)
-        text = "\n\n".join([page.extract_text() for page in reader.pages])
-        return text, reader
+        return PdfReader(pdf_path)
     except PdfReadError:
         print("Not a pdf file...")
-        return None, None
-
-
-def write_pdf(reader, out_pdf):
-    writer = PdfWriter()
-    for page in reader.pages:
-        writer.add_page(page)
-    with open(out_pdf, "wb") as f:
-        writer.write(f)
-    print("Written PDF text to file.")
-
-
-def analyze_document_with_azure(pdf_path, out_pdf, failed_txt):
-    with open(pdf_path, "rb") as f:
-        poller = document_intelligence_client.begin_analyze_document(
-            "prebuilt-read",
-            body=f,
-            output=[AnalyzeOutputOption.PDF],
-        )
-    try:
-        result: AnalyzeResult = poller.result()
-        operation_id = poller.details["operation_id"]
-
-        response = document_intelligence_client.get_analyze_result_pdf(
-            model_id=result.model_id, result_id=operation_id
+        return None
+
+
+def analyze_part(data: bytes) -> AnalyzeResult:
+    """OCRs one part of a PDF, given as the bytes of a PDF of its pages, with Azure."""
+    poller = document_intelligence_client.begin_analyze_document(
+        "prebuilt-read", body=data
+    )
+    return poller.result()
+
+
+def _transient(error: Exception) -> bool:
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    status = getattr(error, "status_code", None) or 0
+    return isinstance(error, HttpResponseError) and (status == 429 or status >= 500)
+
+
+def analyze_part_with_retry(data: bytes) -> AnalyzeResult:
+    """Runs `analyze_part`, retrying throttling, 5xx and connection errors.
+
+    Each retry waits a random time up to an exponentially growing cap, or the
+    `Retry-After` the service asks for if that is longer.
+
+    Raises:
+        Exception: The last error, once it is not transient or `OCR_ATTEMPTS`
+            are used up.
+    """
+    for attempt in range(OCR_ATTEMPTS):
+        try:
+            return analyze_part(data)
+        except Exception as e:
+            if not _transient(e) or attempt + 1 == OCR_ATTEMPTS:
+                raise
+            response = getattr(e, "response", None)
+            retry_after = None
+            if response is not None:
+                retry_after = response.headers.get("Retry-After")
+            delay = random.uniform(0, OCR_BASE_DELAY * 2**attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            print(f"{type(e).__name__}; retrying part in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def pending_path(out_layout: Path) -> Path:
+    """Lists the pages of a stored layout whose OCR failed, to retry next run."""
+    return out_layout.with_suffix(".pending.json")
+
+
+def analyze_document_with_azure(reader, out_layout, failed_txt):
+    """OCRs the pages of a PDF without a usable text layer and stores its layout.
+
+    Pages with at least `MIN_PAGE_CHARS` characters of embedded text use that
+    text. The rest are split into parts under `MAX_PART_BYTES`, OCR'd
+    `OCR_WORKERS` at a time and stitched back in page order, so PDFs over
+    Azure's upload size are no longer skipped. The structured `AnalyzeResult` is
+    kept with `write_layout`, so `read_docs` loads it directly instead of
+    extracting text from a searchable PDF.
+
+    A part that still fails after `analyze_part_with_retry` uses whatever
+    embedded text its pages have, and its pages are listed in `pending_path`.
+    When that file exists, only the listed pages are OCR'd and merged into the
+    stored layout.
+    """
+    pending = pending_path(out_layout)
+    if out_layout.exists() and pending.exists():
+        ocr_pages = json.loads(pending.read_text())
+        stored = pl.read_parquet(out_layout)
+        layouts = [stored.filter(~pl.col("page").is_in(ocr_pages))]
+    else:
+        density = page_text_density(reader)
+        text_pages = [page for page, n in enumerate(density) if n >= MIN_PAGE_CHARS]
+        ocr_pages = [page for page, n in enumerate(density) if n < MIN_PAGE_CHARS]
+        layouts = [layout_from_pdf(reader, text_pages)]
+
+    parts = split_page_ranges(reader, ocr_pages, MAX_PART_BYTES)
+    if parts:
+        print(
+            f"OCR for {len(ocr_pages)}/{len(reader.pages)} pages in {len(parts)} parts"
         )
-        with open(out_pdf, "wb") as writer:
-            writer.writelines(response)
-        print("Written Azure text to file.")
-    except Exception as e:
+    failed_pages = []
+    with ThreadPoolExecutor(OCR_WORKERS) as executor:
+        results = [executor.submit(analyze_part_with_retry, data) for _, data in parts]
+        for (pages, _), result in zip(parts, results):
+            try:
+                layouts.append(layout_from_azure(result.result(), pages))
+            except Exception as e:
+                print(f"Error occurred in result for pages {pages}. {e}")
+                failed_pages.extend(pages)
+                layouts.append(layout_from_pdf(reader, pages))
+
+    layout = stitch_layouts(layouts)
+    if layout.is_empty() and not failed_pages:
         with open(failed_txt, "w") as f:
             f.write("")
-        print(f"Error occurred in result. {e}")
+        print("No text found.")
+        return
+    # the page list is written before the layout, so a layout never exists
+    # without the record of its missing pages
+    if failed_pages:
+        pending.write_text(json.dumps(failed_pages))
+        print(f"OCR failed for {len(failed_pages)} pages; retried on the next run.")
+    write_layout(layout, out_layout)
+    if not failed_pages:
+        pending.unlink(missing_ok=True)
+    print("Written Azure layout to file.")
 
 
 def azure_process_pdfs():
+    # PDFs OCR'd by earlier runs only need their layout written
+    migrate_searchable_pdfs()
     pdfs = (Paths.RAW / "pdfs").glob("*.pdf")
 
     for pdf_path in tqdm(pdfs):
         print(f"Processing {pdf_path}")
 
-        out_pdf = Path(f"./data/staging/pdfs_azure/{pdf_path.stem}.pdf")
-        failed_txt = Path(f"./data/staging/pdfs_azure/{pdf_path.stem}.txt")
-
-        text, reader = read_pdf(pdf_path)
-        if text is None:
-            with open(failed_txt, "w") as f:
-                f.write("")
-            continue
-
-        if len(text) > 10_000:
-            write_pdf(reader, out_pdf)
-
-        if out_pdf.exists() or failed_txt.exists():
+        out_layout = layout_path(pdf_path)
+        failed_txt = LAYOUT_DIR / f"{pdf_path.stem}.txt"
+        done = out_layout.exists() and not pending_path(out_layout).exists()
+        if done or failed_txt.exists():
             continue
 
-        if pdf_path.stat().st_size > 1_000_000:
+        reader = read_pdf(pdf_path)
+        if reader is None:
             with open(failed_txt, "w") as f:
                 f.write("")
-            print("PDF too large!")
             continue
 
-        analyze_document_with_azure(pdf_path, out_pdf, failed_txt)
+        analyze_document_with_azure(reader, out_layout, failed_txt)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import logging
+import shutil
 import textwrap
 from io import BytesIO
 from pathlib import Path
@@ -11,6 +12,10 @@ from tqdm import tqdm
 
 from planning_ai.common.utils import Paths
 
+# staging data, one hive partition (directory) per `representations_document`
+GCPT3_DIR = Paths.STAGING / "gcpt3"
+ROW_GROUP_SIZE = 10_000
+
 
 def get_schema() -> dict[str, Any]:
     return {
@@ -43,6 +48,7 @@ def get_schema() -> dict[str, Any]:
 
 
 def process_files(files: list[Path], schema: dict[str, Any]) -> None:
+    shutil.rmtree(GCPT3_DIR, ignore_errors=True)
     dfs = [pl.read_json(file, schema=schema) for file in tqdm(files)]
     (
         pl.concat(dfs)
@@ -56,12 +62,46 @@ def process_files(files: list[Path], schema: dict[str, Any]) -> None:
             pl.col("representations").name.map_fields(lambda x: f"representations_{x}")
         )
         .unnest("representations")
-        .write_parquet(Paths.STAGING / "gcpt3.parquet")
+        .write_parquet(
+            GCPT3_DIR,
+            partition_by="representations_document",
+            statistics=True,
+            row_group_size=ROW_GROUP_SIZE,
+        )
+    )
+
+
+def scan_gcpt3() -> pl.LazyFrame:
+    """Lazily scans the partitioned staging data.
+
+    Filters on `representations_document` only open that document's partition,
+    and other filters and column selections are pushed into the parquet reader,
+    which skips row groups using their statistics.
+    """
+    return pl.scan_parquet(GCPT3_DIR / "**/*.parquet", hive_partitioning=True)
+
+
+def representations_documents() -> list[str]:
+    """Lists the consultation documents in the staging data, from partition paths."""
+    return (
+        scan_gcpt3()
+        .select("representations_document")
+        .drop_nulls()
+        .unique()
+        .collect()
+        .to_series()
+        .to_list()
     )
 
 
 def download_attachments():
-    df = pl.read_parquet(Paths.STAGING / "gcpt3.parquet")
+    df = (
+        scan_gcpt3()
+        .select("attachments_id", "attachments_url")
+        .drop_nulls(subset="attachments_id")
+        .unique(subset="attachments_id")
+        .collect()
+    )
 
     existing_files = {f.stem for f in (Paths.RAW / "pdfs").glob("*.pdf")}
 
@@ -71,12 +111,7 @@ def download_attachments():
         with open(failed_file_path, "r") as file:
             failed_files = set(file.read().splitlines())
 
-    for row in tqdm(
-        df.drop_nulls(subset="attachments_id")
-        .unique(subset="attachments_id")
-        .sample(shuffle=True, fraction=1)
-        .rows(named=True)
-    ):
+    for row in tqdm(df.sample(shuffle=True, fraction=1).rows(named=True)):
         if (
             row["attachments_url"].startswith(
                 ("https://egov.scambs.gov.uk", "http://egov.scambs.gov.uk")
@@ -0,0 +1,154 @@
+import time
+from functools import lru_cache
+
+import geopandas as gpd
+import polars as pl
+
+from planning_ai.common.utils import Paths
+from planning_ai.logging import logger
+
+GEOGRAPHY_DIR = Paths.STAGING / "geography"
+LADS = ["Cambridge", "South Cambridgeshire"]
+WARDS_FILE = Paths.RAW / "Wards_December_2021_GB_BFE_2022_7523259277605796091.zip"
+# Cambridge city wards, outlined by `fig_wards`
+WARDS = [
+    "E05013050",
+    "E05013051",
+    "E05013052",
+    "E05013053",
+    "E05013054",
+    "E05013055",
+    "E05013056",
+    "E05013057",
+    "E05013058",
+    "E05013059",
+    "E05013060",
+    "E05013061",
+    "E05013062",
+    "E05013063",
+]
+# margin in metres shown around the Cambridge wards by `fig_wards`
+BUFFER = 20_000
+
+
+def compile_oa() -> pl.DataFrame:
+    """Cambridge output areas with their OAC supergroup and population."""
+    oa_lookup = pl.read_csv(
+        Paths.RAW
+        / "Output_Area_to_Local_Authority_District_(April_2023)_Lookup_in_England_and_Wales.csv"
+    )
+    camb_oa = oa_lookup.filter(pl.col("LAD23NM").is_in(LADS))
+    oa_pop = (
+        pl.read_csv(Paths.RAW / "oa_populations.csv")
+        .join(camb_oa, left_on="Output Areas Code", right_on="OA21CD")
+        .group_by(pl.col("Output Areas Code"))
+        .sum()
+        .rename({"Output Areas Code": "OA2021", "Observation": "population"})
+        .select(["OA2021", "population"])
+    )
+    oac = pl.read_csv(Paths.RAW / "oac21ew.csv")
+    oac_names = pl.read_csv(Paths.RAW / "classification_codes_and_names.csv")
+    return (
+        oac.with_columns(pl.col("supergroup").cast(str))
+        .join(oac_names, left_on="supergroup", right_on="Classification Code")
+        .select(["oa21cd", "Classification Name", "supergroup"])
+        .rename({"Classification Name": "supergroup_name"})
+        .join(oa_pop, left_on="oa21cd", right_on="OA2021")
+    )
+
+
+def compile_lsoa() -> pl.DataFrame:
+    """Cambridge LSOAs with their IMD quintile and population."""
+    imd = pl.read_csv(
+        Paths.RAW / "uk_imd2019.csv", columns=["LSOA", "SOA_decile"]
+    ).with_columns(((pl.col("SOA_decile") - 1) // 2) + 1)
+    lsoa_lookup = pl.read_csv(Paths.RAW / "lsoa_lad_lookup.csv")[
+        ["LSOA11CD", "LAD11NM"]
+    ].unique()
+    lsoa_camb = lsoa_lookup.filter(pl.col("LAD11NM").is_in(LADS))
+    pops = pl.read_excel(
+        Paths.RAW / "sapelsoabroadage20112022.xlsx",
+        sheet_name="Mid-2022 LSOA 2021",
+        read_options={"header_row": 3},
+        columns=["LSOA 2021 Code", "Total"],
+    )
+    return imd.join(lsoa_camb, left_on="LSOA", right_on="LSOA11CD").join(
+        pops, left_on="LSOA", right_on="LSOA 2021 Code"
+    )
+
+
+def compile_postcodes(oa: pl.DataFrame, lsoa: pl.DataFrame) -> pl.DataFrame:
+    """Cambridge postcodes with their ward, OA, LSOA, OAC and IMD quintile."""
+    return (
+        pl.read_parquet(
+            Paths.RAW / "onspd_cambridge.parquet",
+            columns=["PCD", "OSWARD", "LSOA11", "OA21"],
+        )
+        .with_columns(pl.col("PCD").str.replace_all(" ", "").alias("postcode"))
+        .join(
+            oa.select(["oa21cd", "supergroup", "population"]),
+            left_on="OA21",
+            right_on="oa21cd",
+            how="left",
+        )
+        .join(
+            lsoa.select(["LSOA", "SOA_decile"]),
+            left_on="LSOA11",
+            right_on="LSOA",
+            how="left",
+        )
+    )
+
+
+def ward_extent(wards: gpd.GeoDataFrame, buffer: float = BUFFER) -> tuple:
+    """Bounds of the Cambridge `WARDS` in `wards`, widened by `buffer` on each side."""
+    minx, miny, maxx, maxy = wards[wards["WD21CD"].isin(WARDS)].total_bounds
+    return (minx - buffer, miny - buffer, maxx + buffer, maxy + buffer)
+
+
+def compile_wards() -> gpd.GeoDataFrame:
+    """Ward boundaries clipped to the extent drawn in `fig_wards`.
+
+    The extent comes from the Cambridge wards' own geometry, read first, so it
+    matches `ward_extent` on the stored boundaries.
+    """
+    codes = ", ".join(f"'{code}'" for code in WARDS)
+    cambridge = gpd.read_file(WARDS_FILE, where=f"WD21CD IN ({codes})")
+    wards = gpd.read_file(WARDS_FILE, bbox=ward_extent(cambridge))
+    return wards[["WD21CD", "WD21NM", "geometry"]]
+
+
+def build_geography():
+    """Compiles the raw geography inputs into the local store used by figures.
+
+    Only needs re-running when the files in `data/raw` change.
+    """
+    tic = time.perf_counter()
+    GEOGRAPHY_DIR.mkdir(parents=True, exist_ok=True)
+    oa = compile_oa()
+    lsoa = compile_lsoa()
+    oa.write_parquet(GEOGRAPHY_DIR / "oa.parquet")
+    lsoa.write_parquet(GEOGRAPHY_DIR / "lsoa.parquet")
+    compile_postcodes(oa, lsoa).write_parquet(GEOGRAPHY_DIR / "postcodes.parquet")
+    compile_wards().to_parquet(GEOGRAPHY_DIR / "wards.parquet")
+    logger.info(f"Built geography store in {time.perf_counter() - tic:.2f}s")
+
+
+@lru_cache
+def load_geography() -> dict:
+    """Loads the geography store once per process, building it if missing."""
+    if not (GEOGRAPHY_DIR / "wards.parquet").exists():
+        build_geography()
+    return {
+        "oa": pl.read_parquet(GEOGRAPHY_DIR / "oa.parquet"),
+        "lsoa": pl.read_parquet(GEOGRAPHY_DIR / "lsoa.parquet"),
+        "postcodes": pl.read_parquet(GEOGRAPHY_DIR / "postcodes.parquet"),
+        "wards": gpd.read_parquet(GEOGRAPHY_DIR / "wards.parquet"),
+    }
+
+
+if __name__ == "__main__":
+    build_geography()
+    tic = time.perf_counter()
+    load_geography()
+    logger.info(f"Loaded geography store in {time.perf_counter() - tic:.3f}s")
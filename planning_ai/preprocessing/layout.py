@@ -0,0 +1,220 @@
+from io import BytesIO
+from pathlib import Path
+
+import polars as pl
+from langchain_core.documents import Document
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
+
+from planning_ai.common.utils import Paths
+from planning_ai.logging import logger
+
+LAYOUT_DIR = Paths.PDFS_AZURE
+LAYOUT_SCHEMA = {
+    "page": pl.Int32,
+    "paragraph": pl.Int32,
+    "role": pl.String,
+    "text": pl.String,
+}
+LAYOUT_FILES_PER_SCAN = 256
+
+
+def layout_path(pdf_path: Path, layout_dir: Path = LAYOUT_DIR) -> Path:
+    return layout_dir / f"{Path(pdf_path).stem}.parquet"
+
+
+def layout_from_azure(result, pages: list[int] | None = None) -> pl.DataFrame:
+    """Flattens an Azure `AnalyzeResult` into one row per paragraph.
+
+    Paragraphs are kept in the order Azure returns them, which is reading order,
+    with their 0-based page and role (heading, footnote and so on, or null).
+    Results without paragraphs fall back to one row per line.
+
+    Args:
+        result (AnalyzeResult): The result of a `prebuilt-read` or
+            `prebuilt-layout` analysis.
+        pages (list[int] | None): 0-based pages of the original PDF that were
+            sent, in order, when only some pages were analysed.
+
+    Returns:
+        pl.DataFrame: `page`, `paragraph`, `role` and `text` columns.
+    """
+
+    def original_page(page_number: int) -> int:
+        return pages[page_number - 1] if pages else page_number - 1
+
+    rows = []
+    for paragraph in result.paragraphs or []:
+        regions = paragraph.bounding_regions or []
+        page = original_page(regions[0].page_number if regions else 1)
+        rows.append((page, paragraph.role, paragraph.content))
+    if not rows:
+        for page in result.pages or []:
+            for line in page.lines or []:
+                rows.append((original_page(page.page_number), None, line.content))
+    return pl.DataFrame(
+        [
+            {"page": page, "paragraph": idx, "role": role, "text": text}
+            for idx, (page, role, text) in enumerate(rows)
+        ],
+        schema=LAYOUT_SCHEMA,
+    )
+
+
+def layout_from_pdf(reader, pages: list[int] | None = None) -> pl.DataFrame:
+    """Builds the same layout from a PDF's embedded text layer, one row per block.
+
+    Args:
+        reader (PdfReader): The opened PDF.
+        pages (list[int] | None): 0-based pages to include; all pages if `None`.
+
+    Returns:
+        pl.DataFrame: `page`, `paragraph`, `role` and `text` columns.
+    """
+    rows = []
+    for page in range(len(reader.pages)) if pages is None else pages:
+        for block in (reader.pages[page].extract_text() or "").split("\n\n"):
+            if block.strip():
+                rows.append(
+                    {"page": page, "paragraph": len(rows), "role": None, "text": block}
+                )
+    return pl.DataFrame(rows, schema=LAYOUT_SCHEMA)
+
+
+def stitch_layouts(layouts: list[pl.DataFrame]) -> pl.DataFrame:
+    """Combines layouts of disjoint page ranges into one, in page order.
+
+    Paragraphs keep their reading order within each page and are renumbered
+    across the whole document.
+    """
+    return (
+        pl.concat([pl.DataFrame(schema=LAYOUT_SCHEMA), *layouts])
+        .sort("page", "paragraph", maintain_order=True)
+        .with_columns(paragraph=pl.int_range(pl.len(), dtype=pl.Int32))
+    )
+
+
+def page_text_density(reader) -> list[int]:
+    """Returns the number of characters in each page's embedded text layer."""
+    return [len((page.extract_text() or "").strip()) for page in reader.pages]
+
+
+def split_page_ranges(
+    reader, pages: list[int], max_bytes: int
+) -> list[tuple[list[int], bytes]]:
+    """Cuts `pages` into parts, each written as its own PDF.
+
+    Pages are taken in order and a part ends before its estimated size would
+    pass `max_bytes`; pages need not be consecutive. Sizes are estimated from
+    each page written on its own, which counts shared resources such as fonts
+    once per page, so estimates err large. A single page over `max_bytes` is
+    still sent as its own part.
+
+    Args:
+        reader (PdfReader): The opened PDF.
+        pages (list[int]): Sorted 0-based pages to split.
+        max_bytes (int): Target maximum size of each part.
+
+    Returns:
+        list[tuple[list[int], bytes]]: The pages of each part and its PDF bytes.
+    """
+    runs, run, run_bytes = [], [], 0
+    for page in pages:
+        page_bytes = len(_write_pages(reader, [page]))
+        if run and run_bytes + page_bytes > max_bytes:
+            runs.append(run)
+            run, run_bytes = [], 0
+        run.append(page)
+        run_bytes += page_bytes
+    if run:
+        runs.append(run)
+    return [(run, _write_pages(reader, run)) for run in runs]
+
+
+def _write_pages(reader, pages: list[int]) -> bytes:
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(reader.pages[page])
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def write_layout(layout: pl.DataFrame, out_path: Path):
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    layout.write_parquet(out_path)
+
+
+def migrate_searchable_pdfs(layout_dir: Path = LAYOUT_DIR) -> int:
+    """Writes a layout for each searchable PDF that has none.
+
+    Earlier runs stored Azure's output as searchable PDFs in the same directory.
+    Their text layer is converted once with `layout_from_pdf`, so those
+    documents are not lost or sent to Azure again. Later calls skip PDFs that
+    already have a layout.
+
+    Returns:
+        int: The number of PDFs converted.
+    """
+    converted = 0
+    for pdf_path in sorted(layout_dir.glob("*.pdf")):
+        out_path = layout_path(pdf_path, layout_dir)
+        if out_path.exists():
+            continue
+        try:
+            layout = layout_from_pdf(PdfReader(pdf_path))
+        except (PdfReadError, OSError) as e:
+            logger.error(f"Could not convert {pdf_path.name}: {e}")
+            continue
+        write_layout(layout, out_path)
+        converted += 1
+    if converted:
+        logger.info(f"Converted {converted} searchable PDFs to layouts.")
+    return converted
+
+
+def iter_layouts(
+    layout_dir: Path = LAYOUT_DIR, files_per_scan: int = LAYOUT_FILES_PER_SCAN
+):
+    """Yields every stored layout as one `Document` per page.
+
+    Paragraphs are joined in reading order with blank lines between them, and
+    metadata matches `PyPDFDirectoryLoader` (`source` and 0-based `page`), so
+    the documents replace its output directly. Layouts are read
+    `files_per_scan` files at a time, so only that many are in memory at once.
+    Searchable PDFs left by earlier runs are converted first with
+    `migrate_searchable_pdfs`.
+
+    Args:
+        layout_dir (Path): Directory of layouts written by `write_layout`.
+        files_per_scan (int): Number of layout files read per scan.
+
+    Yields:
+        Document: Pages with text, ordered by file and page.
+    """
+    migrate_searchable_pdfs(layout_dir)
+    files = sorted(layout_dir.glob("*.parquet"))
+    for start in range(0, len(files), files_per_scan):
+        pages = (
+            pl.scan_parquet(
+                files[start : start + files_per_scan], include_file_paths="source"
+            )
+            .filter(pl.col("text").str.strip_chars() != "")
+            .sort("source", "paragraph")
+            .group_by("source", "page", maintain_order=True)
+            .agg(pl.col("text").str.join("\n\n"))
+            .collect()
+        )
+        for row in pages.iter_rows(named=True):
+            yield Document(
+                page_content=row["text"],
+                metadata={
+                    "source": str(Path(row["source"]).with_suffix(".pdf")),
+                    "page": row["page"],
+                },
+            )
+
+
+def load_layouts(layout_dir: Path = LAYOUT_DIR) -> list[Document]:
+    """Loads every stored layout as a list; see `iter_layouts`."""
+    return list(iter_layouts(layout_dir))
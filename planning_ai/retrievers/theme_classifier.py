@@ -0,0 +1,83 @@
+from collections import Counter
+from functools import lru_cache
+
+from planning_ai.chains.themes_chain import Theme
+from planning_ai.logging import logger
+
+K = 10
+BATCH_SIZE = 256
+# share of the distance-weighted neighbour vote the top theme needs before the
+# `themes_chain` call is skipped
+CONFIDENCE_THRESHOLD = 0.6
+
+
+class ThemeClassifier:
+    """Assigns themes by a weighted vote of the nearest topic-paper pages.
+
+    Documents are embedded and queried against the `themes-chroma` collection in
+    batches. Each of the `k` neighbours votes for its page's `theme`, weighted by
+    `1 / (1 + distance)`. When the winning theme's share of the vote reaches
+    `threshold` the result is returned in the same shape as `retrieve_themes`
+    produces from `themes_chain`; otherwise `None` is returned so the caller can
+    fall back to the LLM.
+    """
+
+    def __init__(self, vectorstore, k: int = K, threshold=CONFIDENCE_THRESHOLD):
+        self.vectorstore = vectorstore
+        self.k = k
+        self.threshold = threshold
+
+    def vote(self, texts: list[str]) -> list[dict[str, float]]:
+        embeddings = self.vectorstore.embeddings.embed_documents(texts)
+        result = self.vectorstore._collection.query(
+            query_embeddings=embeddings,
+            n_results=self.k,
+            include=["metadatas", "distances"],
+        )
+        votes = []
+        for metadatas, distances in zip(result["metadatas"], result["distances"]):
+            weights = Counter()
+            for metadata, distance in zip(metadatas, distances):
+                weights[metadata["theme"]] += 1 / (1 + distance)
+            total = sum(weights.values())
+            votes.append({theme: weight / total for theme, weight in weights.items()})
+        return votes
+
+    def classify(self, texts: list[str], batch_size: int = BATCH_SIZE):
+        """Returns a list of theme scores per text, or `None` if not confident."""
+        out = []
+        for i in range(0, len(texts), batch_size):
+            for vote in self.vote(texts[i : i + batch_size]):
+                top = max(vote.values(), default=0)
+                if top < self.threshold:
+                    out.append(None)
+                    continue
+                out.append(
+                    [
+                        {"theme": Theme(theme), "score": round(5 * share / top)}
+                        for theme, share in sorted(
+                            vote.items(), key=lambda x: x[1], reverse=True
+                        )
+                    ]
+                )
+        return out
+
+
+@lru_cache
+def _load_theme_classifier() -> ThemeClassifier:
+    from planning_ai.retrievers.theme_retriever import create_db
+
+    return ThemeClassifier(create_db())
+
+
+def get_theme_classifier():
+    """Returns the shared classifier, or `None` if the index is unavailable.
+
+    Uses the shared `get_embeddings` backend. A failed load is not cached, so it
+    is retried the next time documents are classified.
+    """
+    try:
+        return _load_theme_classifier()
+    except Exception as e:
+        logger.warning(f"Theme index unavailable, theme prefilter off: {e}")
+        return None
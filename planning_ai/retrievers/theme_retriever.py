@@ -1,13 +1,15 @@
 import logging
 from pathlib import Path
 
+import requests
 from chromadb import PersistentClient
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import OpenAIEmbeddings
 from pydantic import BaseModel, Field
 
+from planning_ai.common.utils import Paths
+from planning_ai.llms.embeddings import EMBEDDINGS_BACKEND, get_embeddings
 from planning_ai.llms.llm import GPT4o
 
 # See: https://consultations.greatercambridgeplanning.org/greater-cambridge-local-plan-preferred-options/supporting-documents
@@ -30,31 +32,65 @@ class Grade(BaseModel):
     binary_score: str = Field(description="Relevance score 'yes' or 'no'")
 
 
-def create_db():
-    chroma_dir = Path("./chroma_themesdb")
-    if chroma_dir.exists():
-        persistent_client = PersistentClient(path="./chroma_themesdb")
+CHROMA_DIR = Path(f"./chroma_themesdb-{EMBEDDINGS_BACKEND}")
+TOPIC_PAPERS_DIR = Paths.RAW / "topic_papers"
+
+
+def load_topic_papers():
+    """Loads the topic papers in `PDFS`, downloading each one only once."""
+    TOPIC_PAPERS_DIR.mkdir(parents=True, exist_ok=True)
+    docs = []
+    for name, url in PDFS.items():
+        pdf_path = TOPIC_PAPERS_DIR / f"{name}.pdf"
+        if not pdf_path.exists():
+            logging.warning(f"Downloading topic paper: {name}")
+            response = requests.get(url, timeout=60)
+            response.raise_for_status()
+            with open(pdf_path, "wb") as f:
+                f.write(response.content)
+        doc = PyPDFLoader(str(pdf_path)).load()[5:]
+        for d in doc:
+            d.metadata["theme"] = name
+        docs.extend(doc)
+    return docs
+
+
+def create_db(embedding_function=None, persist_directory=CHROMA_DIR, docs=None):
+    """Loads the `themes-chroma` collection, building it on first use.
+
+    Args:
+        embedding_function (Embeddings, optional): Embeddings used for both the index
+            and queries. Defaults to the shared cached embeddings from
+            `get_embeddings`.
+        persist_directory (Path): Where the collection is stored. Indexes built with
+            different embedding functions must use different directories.
+        docs (list[Document], optional): Theme-labelled pages to index instead of
+            the topic papers in `PDFS`.
+
+    Returns:
+        Chroma: The theme vectorstore.
+    """
+    embedding_function = embedding_function or get_embeddings()
+    if Path(persist_directory).exists():
+        persistent_client = PersistentClient(path=str(persist_directory))
         vectorstore = Chroma(
             client=persistent_client,
             collection_name="themes-chroma",
-            embedding_function=OpenAIEmbeddings(),
+            embedding_function=embedding_function,
         )
 
     else:
-        docs = []
-        for name, pdf in PDFS.items():
-            doc = PyPDFLoader(pdf).load()[5:]
-            for d in doc:
-                d.metadata["theme"] = name
-            docs.extend(doc)
+        if docs is None:
+            docs = load_topic_papers()
 
         logging.warning(f"Building ChromaDB...")
         vectorstore = Chroma.from_documents(
             documents=docs,
             collection_name="themes-chroma",
-            embedding=OpenAIEmbeddings(),
-            persist_directory="./chroma_themesdb",
+            embedding=embedding_function,
+            persist_directory=str(persist_directory),
         )
+        logging.warning(f"Finished building ChromaDB...")
     return vectorstore
 
 
@@ -71,9 +107,10 @@ grade_template = PromptTemplate(
 SLLM = GPT4o.with_structured_output(Grade, strict=True)
 grade_chain = grade_template | SLLM
 
-vectorstore = create_db()
-theme_retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-logging.warning(f"Finished building ChromaDB...")
+
+def create_theme_retriever(**kwargs):
+    return create_db(**kwargs).as_retriever(search_kwargs={"k": 10})
+
 
 if __name__ == "__main__":
     test_content = """
@@ -81,4 +118,5 @@ if __name__ == "__main__":
     to solve the severance problems created by the M11 and A14.
     """
 
+    theme_retriever = create_theme_retriever()
     len(theme_retriever.invoke(input=test_content))
@@ -18,6 +18,7 @@ class DocumentState(TypedDict):
     themes: list[dict]
 
     summary: BaseModel
+    model: str
     hallucination: HallucinationChecker
 
     is_hallucinated: bool
@@ -0,0 +1,335 @@
+import functools
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import polars as pl
+from langchain_core.callbacks import BaseCallbackHandler
+
+from planning_ai.common.utils import Paths
+from planning_ai.llms.llm import estimate_cost, model_key
+from planning_ai.llms.router import DEFAULT_TIER, EXTRACTIVE, TIERS
+from planning_ai.logging import logger
+
+METRICS_FILE = Paths.OUT / "metrics.jsonl"
+LOG_EVERY = 50
+
+
+class RunMetrics:
+    """Collects node timings, LLM latency and token usage for a single graph run.
+
+    Every event is appended to `METRICS_FILE` as a JSON line so a long run can be
+    followed with `tail -f`, and `summary` aggregates them into a table at the end.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset("")
+
+    def reset(self, run: str, n_docs: int = 0):
+        with self.lock:
+            self.run = run
+            self.n_docs = n_docs
+            self.start = time.perf_counter()
+            self.node_timings = defaultdict(list)
+            self.node_errors = Counter()
+            self.in_flight = Counter()
+            self.llm_starts = {}
+            self.llm_latencies = []
+            self.llm_errors = 0
+            self.retries = 0
+            self.retried_latencies = []
+            self.retried_failures = 0
+            self.breaker_trips = 0
+            self.failures = Counter()
+            self.failed = set()
+            self.tokens = Counter()
+            self.model_tokens = defaultdict(Counter)
+            self.routes = Counter()
+            self.extractive_tokens = 0
+            self.dropped_policies = Counter()
+            self.processed = set()
+            self.attempts = {}
+            self.n_in_fix_loop = 0
+
+    def emit(self, event: str, **fields):
+        record = {
+            "run": self.run,
+            "event": event,
+            "elapsed": round(time.perf_counter() - self.start, 3),
+            **fields,
+        }
+        METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(METRICS_FILE, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def docs_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return len(self.processed) / elapsed if elapsed else 0.0
+
+    def in_fix_loop(self) -> int:
+        """Documents that have been checked at least once but are not yet done."""
+        return self.n_in_fix_loop
+
+    def _in_fix_loop(self, filename) -> bool:
+        return self.attempts.get(filename, 0) > 0 and filename not in self.processed
+
+    def _track_documents(self, output):
+        if not isinstance(output, dict):
+            return
+        for doc in output.get("documents", []) or []:
+            if "filename" not in doc:
+                continue
+            filename = doc["filename"]
+            was_in_loop = self._in_fix_loop(filename)
+            self.attempts[filename] = doc.get("refinement_attempts", 0)
+            if doc.get("processed"):
+                self.processed.add(filename)
+            if doc.get("failed"):
+                self.failed.add(filename)
+            # kept as a running count, so each update only looks at its own documents
+            self.n_in_fix_loop += self._in_fix_loop(filename) - was_in_loop
+
+    def node_started(self, node: str):
+        with self.lock:
+            self.in_flight[node] += 1
+
+    def node_finished(self, node: str, duration: float, output=None, error=None):
+        with self.lock:
+            self.in_flight[node] -= 1
+            self.node_timings[node].append(duration)
+            if error is not None:
+                self.node_errors[node] += 1
+            self._track_documents(output)
+            n_processed = len(self.processed)
+            queue_depth = self.in_flight[node]
+            in_fix_loop = self.in_fix_loop()
+        self.emit(
+            "node",
+            node=node,
+            duration=round(duration, 4),
+            error=error,
+            queue_depth=queue_depth,
+            processed=n_processed,
+            in_fix_loop=in_fix_loop,
+        )
+        if (
+            node == "check_hallucination"
+            and n_processed
+            and n_processed % LOG_EVERY == 0
+        ):
+            logger.info(
+                f"{n_processed}/{self.n_docs} documents processed "
+                f"({self.docs_per_second():.2f} docs/sec, {in_fix_loop} in fix loop)"
+            )
+
+    def llm_started(self, run_id):
+        with self.lock:
+            self.llm_starts[run_id] = time.perf_counter()
+
+    def llm_finished(
+        self, run_id, usage: dict | None = None, model: str | None = None, error=None
+    ):
+        with self.lock:
+            started = self.llm_starts.pop(run_id, None)
+            latency = time.perf_counter() - started if started else None
+            if latency is not None:
+                self.llm_latencies.append(latency)
+            if error is not None:
+                self.llm_errors += 1
+            for key, value in _flatten(usage or {}).items():
+                self.tokens[key] += value
+                if model is not None:
+                    self.model_tokens[model][key] += value
+        self.emit("llm", latency=latency, usage=usage, model=model, error=error)
+
+    def routed(self, tier: str, tokens: int = 0):
+        """Counts a summary or fix routed to `tier` by `planning_ai.llms.router`."""
+        with self.lock:
+            self.routes[tier] += 1
+            if tier == EXTRACTIVE:
+                self.extractive_tokens += tokens
+        self.emit("route", tier=tier)
+
+    def policies_dropped(self, policies: list[str]):
+        """Counts policies a summary assigned outside its document's themes."""
+        with self.lock:
+            self.dropped_policies.update(policies)
+        self.emit("policies_dropped", policies=policies)
+
+    def cached_ratio(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        return _cached_ratio(self.tokens)
+
+    def costs(self) -> dict:
+        """Estimated cost of the run against running every summary on `DEFAULT_TIER`.
+
+        Calls made on a routing tier are re-priced at `DEFAULT_TIER` for the
+        baseline, and extractive summaries are charged their document's tokens.
+        """
+        cost = 0.0
+        baseline = estimate_cost(DEFAULT_TIER, {"input_tokens": self.extractive_tokens})
+        for model, tokens in self.model_tokens.items():
+            name = model_key(model)
+            if name is None:
+                continue
+            cost += estimate_cost(name, tokens)
+            baseline += estimate_cost(DEFAULT_TIER if name in TIERS else name, tokens)
+        return {
+            "cost_usd": cost,
+            "baseline_usd": baseline,
+            "saved_usd": baseline - cost,
+        }
+
+    def retried(self):
+        with self.lock:
+            self.retries += 1
+        self.emit("retry")
+
+    def retried_call(self, latency: float, ok: bool):
+        """Records the total latency of a call that needed at least one retry."""
+        with self.lock:
+            self.retried_latencies.append(latency)
+            if not ok:
+                self.retried_failures += 1
+        self.emit("retried_call", latency=round(latency, 3), ok=ok)
+
+    def breaker_opened(self):
+        with self.lock:
+            self.breaker_trips += 1
+        self.emit("breaker_open")
+
+    def failed_call(self, stage: str, kind: str):
+        """Counts a chain call that failed for good, by stage and error kind."""
+        with self.lock:
+            self.failures[f"{stage}:{kind}"] += 1
+        self.emit("failed_call", stage=stage, kind=kind)
+
+    def summary(self) -> pl.DataFrame:
+        """Returns one row per node plus `llm` and `retried_llm` call latency rows."""
+        rows = []
+        for node, timings in self.node_timings.items():
+            rows.append(_timing_row(node, timings, self.node_errors[node]))
+        rows.append(_timing_row("llm", self.llm_latencies, self.llm_errors))
+        rows.append(
+            _timing_row("retried_llm", self.retried_latencies, self.retried_failures)
+        )
+        return pl.DataFrame(rows)
+
+    def log_summary(self):
+        elapsed = time.perf_counter() - self.start
+        summary = self.summary()
+        costs = self.costs()
+        self.emit(
+            "summary",
+            nodes=summary.to_dicts(),
+            tokens=dict(self.tokens),
+            routes=dict(self.routes),
+            dropped_policies=dict(self.dropped_policies),
+            cached_ratio=self.cached_ratio(),
+            **costs,
+            retries=self.retries,
+            breaker_trips=self.breaker_trips,
+            failed=len(self.failed),
+            failures=dict(self.failures),
+            processed=len(self.processed),
+            docs_per_second=self.docs_per_second(),
+        )
+        logger.info(
+            f"Run {self.run}: {len(self.processed)} documents in {elapsed / 60:.2f} "
+            f"minutes ({self.docs_per_second():.2f} docs/sec), "
+            f"{len(self.failed)} failed, {self.retries} retries "
+            f"({self.breaker_trips} circuit breaks), failed calls: "
+            f"{dict(self.failures)}\n"
+            f"Tokens: {dict(self.tokens)}, "
+            f"{self.cached_ratio():.1%} of prompt tokens cached\n"
+            f"Routes: {dict(self.routes)}, estimated cost ${costs['cost_usd']:.4f} "
+            f"vs ${costs['baseline_usd']:.4f} unrouted "
+            f"(saved ${costs['saved_usd']:.4f})\n"
+            f"Policies dropped outside document themes: "
+            f"{sum(self.dropped_policies.values())} {dict(self.dropped_policies)}\n"
+            f"{summary.to_pandas().to_markdown(index=False, floatfmt='.3f')}"
+        )
+
+
+def _flatten(usage: dict, prefix: str = "") -> dict:
+    """Integer token counts from usage metadata, with nested details as `a.b` keys."""
+    out = {}
+    for key, value in usage.items():
+        if isinstance(value, dict):
+            out.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, int):
+            out[f"{prefix}{key}"] = value
+    return out
+
+
+def _cached_ratio(tokens: dict) -> float:
+    # OpenAI `token_usage` or LangChain `usage_metadata` naming
+    prompt = tokens.get("prompt_tokens", tokens.get("input_tokens", 0))
+    cached = tokens.get(
+        "prompt_tokens_details.cached_tokens",
+        tokens.get("input_token_details.cache_read", 0),
+    )
+    return cached / prompt if prompt else 0.0
+
+
+def _timing_row(name, timings, errors):
+    calls = len(timings)
+    timings = np.array(timings) if timings else np.zeros(1)
+    return {
+        "name": name,
+        "calls": calls,
+        "errors": errors,
+        "total_s": float(timings.sum()),
+        "mean_s": float(timings.mean()),
+        "p50_s": float(np.percentile(timings, 50)),
+        "p95_s": float(np.percentile(timings, 95)),
+        "max_s": float(timings.max()),
+    }
+
+
+metrics = RunMetrics()
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """Records latency and token usage of every chat model call made by a chain."""
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        metrics.llm_started(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        metrics.llm_started(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("token_usage")
+        if usage is None and response.generations:
+            message = getattr(response.generations[0][0], "message", None)
+            usage = getattr(message, "usage_metadata", None)
+        metrics.llm_finished(run_id, usage=usage, model=llm_output.get("model_name"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        metrics.llm_finished(run_id, error=repr(error))
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        metrics.retried()
+
+
+def instrument_node(name, fn):
+    """Wraps a graph node so each call records its duration and output documents."""
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        metrics.node_started(name)
+        tic = time.perf_counter()
+        try:
+            output = fn(state)
+        except Exception as e:
+            metrics.node_finished(name, time.perf_counter() - tic, error=repr(e))
+            raise
+        metrics.node_finished(name, time.perf_counter() - tic, output=output)
+        return output
+
+    return wrapper